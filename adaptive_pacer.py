@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+自适应爬取节奏
+根据每页的实际信号（Cloudflare 验证、响应延迟、连续错误）调整翻页间隔：
+站点响应正常时逐步加速（加性减少间隔），一出现验证立即大幅退避（乘性增加间隔）。
+学到的节奏保存到状态文件，第二天的爬取直接从上次的节奏开始
+"""
+
+import json
+import os
+import time
+from typing import Optional
+
+from config import CONF
+
+# 节奏状态文件
+DEFAULT_STATE_FILE = './.crawl_pace.json'
+
+# 默认参数，可通过 config.json 的 crawl_pacing 覆盖
+DEFAULT_PACING = {
+    'initial_delay': 1.0,    # 没有历史状态时的初始间隔（秒）
+    'min_delay': 0.1,        # 最短间隔
+    'max_delay': 30.0,       # 最长间隔
+    'speedup_step': 0.1,     # 连续正常时每页减少的间隔
+    'clean_streak': 3,       # 连续多少页正常后开始加速
+    'challenge_factor': 4.0, # 遇到验证时间隔乘以该系数
+    'challenge_min': 5.0,    # 遇到验证后间隔至少为该值
+    'error_factor': 2.0,     # 出错时间隔乘以该系数
+    'slow_factor': 1.5,      # 响应明显变慢时间隔乘以该系数
+}
+
+# 延迟超过基线多少倍视为变慢
+SLOW_LATENCY_RATIO = 2.0
+
+# 延迟基线的指数移动平均权重
+EWMA_ALPHA = 0.2
+
+# 触发验证的节奏下限每天衰减的比例（让下一次运行可以重新试探更快的节奏）
+FLOOR_DECAY_PER_DAY = 0.8
+
+
+class AdaptivePacer:
+    """
+    AIMD 节奏控制器
+
+    用法：
+        pacer = AdaptivePacer('hot')
+        for page in pages:
+            ...抓取...
+            pacer.observe(latency, challenged=..., error=...)
+            pacer.wait()
+        pacer.save()
+    """
+
+    def __init__(self, key: str = 'default', state_file: str = DEFAULT_STATE_FILE):
+        self.key = key
+        self.state_file = state_file
+        self.config = dict(DEFAULT_PACING)
+        self.config.update(CONF.get('crawl_pacing', {}))
+
+        self.delay = self.config['initial_delay']
+        # 曾经触发验证的间隔，加速时不低于它
+        self.floor = self.config['min_delay']
+        self.latency_baseline: Optional[float] = None
+        self.streak = 0
+        self.stats = {
+            'pages': 0,
+            'challenges': 0,
+            'errors': 0,
+            'slowdowns': 0,
+            'total_sleep': 0.0,
+        }
+        self._load()
+
+    def _clamp(self, delay: float) -> float:
+        return min(self.config['max_delay'], max(self.config['min_delay'], delay))
+
+    def _load(self) -> None:
+        """读取上次学到的节奏"""
+        if not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f).get(self.key)
+        except (OSError, ValueError):
+            return
+        if not state:
+            return
+
+        days = max(0.0, (time.time() - state.get('updated_at', 0)) / 86400)
+        self.floor = self._clamp(state.get('floor', self.floor) * FLOOR_DECAY_PER_DAY ** days)
+        self.delay = self._clamp(max(state.get('delay', self.delay), self.floor))
+        self.latency_baseline = state.get('latency_baseline')
+
+    def save(self) -> None:
+        """保存学到的节奏"""
+        state = {}
+        if os.path.exists(self.state_file):
+            try:
+                with open(self.state_file, 'r', encoding='utf-8') as f:
+                    state = json.load(f)
+            except (OSError, ValueError):
+                state = {}
+
+        state[self.key] = {
+            'delay': round(self.delay, 3),
+            'floor': round(self.floor, 3),
+            'latency_baseline': self.latency_baseline,
+            'updated_at': time.time(),
+            'updated': time.strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        try:
+            with open(self.state_file, 'w', encoding='utf-8') as f:
+                json.dump(state, f, ensure_ascii=False, indent=2)
+        except OSError:
+            pass
+
+    def observe(self, latency: float, challenged: bool = False, error: bool = False) -> float:
+        """
+        记录一页的抓取结果并调整间隔
+
+        Args:
+            latency: 本页抓取耗时（秒，不含限速器排队）
+            challenged: 本页是否遇到 Cloudflare 验证
+            error: 本页是否抓取失败
+
+        Returns:
+            调整后的间隔
+        """
+        self.stats['pages'] += 1
+        config = self.config
+
+        if challenged:
+            # 第一次验证就大幅退避，并记住触发验证的节奏
+            self.stats['challenges'] += 1
+            self.floor = self._clamp(max(self.floor, self.delay + config['speedup_step']))
+            self.delay = self._clamp(max(self.delay * config['challenge_factor'], config['challenge_min']))
+            self.streak = 0
+            print(f"  [Pace] ⚠️  遇到 Cloudflare 验证，间隔调整为 {self.delay:.1f} 秒")
+        elif error:
+            self.stats['errors'] += 1
+            self.delay = self._clamp(self.delay * config['error_factor'])
+            self.streak = 0
+        elif self.latency_baseline and latency > self.latency_baseline * SLOW_LATENCY_RATIO:
+            self.stats['slowdowns'] += 1
+            self.delay = self._clamp(self.delay * config['slow_factor'])
+            self.streak = 0
+        else:
+            self.streak += 1
+            if self.streak >= config['clean_streak']:
+                self.delay = self._clamp(max(self.floor, self.delay - config['speedup_step']))
+
+        # 只用成功页的延迟更新基线
+        if not challenged and not error:
+            if self.latency_baseline is None:
+                self.latency_baseline = latency
+            else:
+                self.latency_baseline = EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * self.latency_baseline
+
+        return self.delay
+
+    def wait(self) -> float:
+        """按当前间隔等待"""
+        time.sleep(self.delay)
+        self.stats['total_sleep'] += self.delay
+        return self.delay
+
+    def print_stats(self) -> None:
+        """打印本次运行的节奏统计"""
+        stats = self.stats
+        if not stats['pages']:
+            return
+        print(f"  自适应节奏: 当前间隔 {self.delay:.2f} 秒，共等待 {stats['total_sleep']:.1f} 秒"
+              f"（验证 {stats['challenges']} 次，错误 {stats['errors']} 次，变慢 {stats['slowdowns']} 次）")
+
+
+if __name__ == '__main__':
+    # 简单自测：模拟一段正常 -> 验证 -> 恢复的过程
+    pacer = AdaptivePacer('selftest', state_file='/tmp/crawl_pace_selftest.json')
+    signals = [(1.0, False, False)] * 10 + [(1.0, True, False)] + [(1.0, False, False)] * 20
+    for latency, challenged, error in signals:
+        pacer.observe(latency, challenged=challenged, error=error)
+    print(f"间隔: {pacer.delay:.2f} 秒，下限: {pacer.floor:.2f} 秒")
+    pacer.print_stats()
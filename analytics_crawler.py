@@ -4,47 +4,48 @@
 负责从 https://jable.tv/hot/ 爬取视频数据和演员信息
 """
 
-import re
 import time
+from datetime import datetime, timedelta
 from typing import List, Dict, Optional, Tuple
-from bs4 import BeautifulSoup
 from progress_tracker import ProgressTracker
+import analytics_db
+from adaptive_pacer import AdaptivePacer
+from cloudflare_waiter import get_challenge_stats
+import fetch_backends
+import fetch_pool
+import fixture_store
+import html_cache
+import model_crawler
+import page_parser
+import rate_limiter
+import retry_policy
 
-# 预编译正则表达式（优化性能）
-WHITESPACE_PATTERN = re.compile(r'\s+')
-PAGE_NUMBER_PATTERN = re.compile(r'/hot/(\d+)/')
+# 页面获取统一走后端注册表（守护进程 / ScrapingAnt / 复用浏览器的 utils_fast / 原版 Playwright）
+USE_FAST_MODE = fetch_backends.is_backend_available('fast')
 
-# 使用优化版的 utils（复用浏览器，禁用资源，移除固定等待）
-try:
-    import utils_fast
-    USE_FAST_MODE = True
-    print("ℹ️  使用优化版爬虫（utils_fast）")
+# 单个视频详情页的平均获取耗时（秒），用于估算演员爬取时间
+VIDEO_PAGE_SECONDS = 2.5
 
-    def fetch_page(url: str, retry: int = 3) -> str:
-        """统一的页面获取接口（优化版）"""
-        return utils_fast.fast_requests_get(url, retry)
+# 完整抓取过的演员列表页在这段时间内不再重抓（天）；没抓完的进度超过这个时间也从第一页重新开始
+MODEL_LISTING_REFRESH_DAYS = 30
 
-    def cleanup_browser():
-        """清理浏览器实例"""
-        utils_fast.close_browser_instance()
+# 每次运行每个演员最多抓取的列表页数（页数多的演员分几次运行抓完）
+MODEL_LISTING_PAGES_PER_RUN = 5
 
-except ImportError:
-    import utils
-    USE_FAST_MODE = False
-    print("⚠️  优化版不可用，使用原版 utils")
 
-    def fetch_page(url: str, retry: int = 3) -> str:
-        """统一的页面获取接口（原版）"""
-        return utils.scrapingant_requests_get(url, retry)
+def fetch_page(url: str, retry: int = 3, kind: str = 'list') -> str:
+    """统一的页面获取接口"""
+    return fetch_backends.fetch(url, kind=kind, retry=retry)
 
-    def cleanup_browser():
-        """清理浏览器实例（原版无需清理）"""
-        pass
+
+def cleanup_browser():
+    """关闭本次运行共享的浏览器实例"""
+    fetch_backends.shutdown_backends()
 
 
 def extract_videos_from_page(html: str) -> List[Dict]:
     """
-    从页面 HTML 中提取视频信息
+    从页面 HTML 中提取视频信息（page_parser 的包装）
 
     Args:
         html: 页面 HTML 内容
@@ -52,80 +53,18 @@ def extract_videos_from_page(html: str) -> List[Dict]:
     Returns:
         视频列表，每项包含 {video_id, title, views, likes, url}
     """
-    # 使用 lxml 解析器（比 html.parser 快5-10倍）
-    try:
-        soup = BeautifulSoup(html, 'lxml')
-    except:
-        # 如果 lxml 未安装，回退到 html.parser
-        soup = BeautifulSoup(html, 'html.parser')
-    video_containers = soup.select('div.video-img-box')
-
-    videos = []
-
-    for container in video_containers:
-        try:
-            # 提取视频链接和 ID
-            link_tag = container.select_one('a[href*="/videos/"]')
-            if not link_tag:
-                continue
-
-            video_url = link_tag.get('href', '')
-            if not video_url:
-                continue
-
-            # 从 URL 中提取视频 ID
-            video_id = video_url.split('/')[-2] if '/' in video_url else ''
-            if not video_id:
-                continue
-
-            # 提取标题
-            title_tag = container.select_one('h6.title a')
-            title = title_tag.get_text(strip=True) if title_tag else ''
-
-            # 提取统计数据（观看数和点赞数）
-            sub_title = container.select_one('p.sub-title')
-
-            views = 0
-            likes = 0
-
-            if sub_title:
-                text = sub_title.get_text()
-
-                # 按行分割，提取每行的数字
-                lines = text.strip().split('\n')
-                numbers = []
-
-                for line in lines:
-                    line = line.strip()
-                    if line:
-                        # 去除所有空格和制表符（使用预编译正则）
-                        num_str = WHITESPACE_PATTERN.sub('', line)
-                        if num_str.isdigit():
-                            numbers.append(int(num_str))
-
-                # 第一个数字是观看数，第二个是点赞数
-                if len(numbers) >= 2:
-                    views = numbers[0]
-                    likes = numbers[1]
-
-            videos.append({
-                'video_id': video_id,
-                'title': title,
-                'views': views,
-                'likes': likes,
-                'url': video_url
-            })
-
-        except Exception as e:
-            print(f"⚠️  解析视频失败: {e}")
-            continue
-
-    return videos
+    return [{
+        'video_id': video.video_id,
+        'title': video.title,
+        'views': video.views,
+        'likes': video.likes,
+        'url': video.url
+    } for video in page_parser.parse_page(html).videos]
 
 
 def get_total_pages(html: str) -> int:
     """
-    从页面 HTML 中获取总页数
+    从页面 HTML 中获取总页数（page_parser 的包装）
 
     Args:
         html: 页面 HTML 内容
@@ -133,34 +72,7 @@ def get_total_pages(html: str) -> int:
     Returns:
         总页数
     """
-    # 使用 lxml 解析器
-    try:
-        soup = BeautifulSoup(html, 'lxml')
-    except:
-        soup = BeautifulSoup(html, 'html.parser')
-
-    # 查找所有分页链接
-    pagination_links = soup.select('ul.pagination li a[href*="/hot/"]')
-    max_page = 1
-
-    for link in pagination_links:
-        # 检查是否是"最後"链接
-        text = link.get_text(strip=True)
-        href = link.get('href', '')
-
-        # 如果是"最後"链接，优先使用
-        if '最後' in text or '»' in text:
-            match = PAGE_NUMBER_PATTERN.search(href)
-            if match:
-                return int(match.group(1))
-
-        # 否则，记录最大页码
-        match = PAGE_NUMBER_PATTERN.search(href)
-        if match:
-            page_num = int(match.group(1))
-            max_page = max(max_page, page_num)
-
-    return max_page
+    return page_parser.parse_page(html).last_page
 
 
 def crawl_hot_page(page_num: int = 1, retry: int = 3) -> Tuple[List[Dict], int]:
@@ -199,29 +111,39 @@ def crawl_hot_page(page_num: int = 1, retry: int = 3) -> Tuple[List[Dict], int]:
 
 def crawl_all_hot_pages(start_page: int = 1, end_page: Optional[int] = None,
                        page_delay: Optional[float] = None, task_type: str = 'update',
-                       resume: bool = True) -> List[Dict]:
+                       resume: bool = True, db_path: str = analytics_db.DEFAULT_DB_PATH,
+                       date: Optional[str] = None) -> int:
     """
     爬取所有（或指定范围）热门页面的视频数据
-    支持断点续传
+    每页解析完立即作为一个事务写入数据库（视频、每日统计和页面日志一起提交），
+    内存占用不随页数增长；断点续传以数据库中已写入的页为准，中断不会丢数据
 
     Args:
         start_page: 起始页码（默认 1）
         end_page: 结束页码（None 表示爬到最后一页）
-        page_delay: 每页之间的延迟（秒，None 则自动选择：优化版0.5秒，原版1.0秒）
+        page_delay: 每页之间的固定延迟（秒，None 则使用自适应节奏，根据验证/延迟/错误信号调整）
         task_type: 任务类型（init 或 update）
         resume: 是否启用断点续传（默认 True）
+        db_path: 数据库路径
+        date: 统计日期 (YYYY-MM-DD)，None 表示今天
 
     Returns:
-        所有视频的列表
+        本次运行写入的视频数
     """
-    all_videos = []
+    if date is None:
+        date = datetime.now().strftime('%Y-%m-%d')
+    log_task_id = f"analyze_{task_type}_{date}"
+
+    saved_videos = 0
     tracker = ProgressTracker() if resume else None
     task_id = None
-    pending_pages = None
+    resume_info = None
+    saved_pages = set()
 
-    # 智能延迟：优化版用0.5秒，原版用1.0秒
-    if page_delay is None:
-        page_delay = 0.5 if USE_FAST_MODE else 1.0
+    # 未指定固定延迟时使用自适应节奏（从上次运行学到的间隔开始）
+    pacer = AdaptivePacer('hot') if page_delay is None else None
+    if pacer:
+        page_delay = pacer.delay
 
     # 检查是否有未完成的任务（自动恢复，无需确认）
     if tracker and resume:
@@ -239,9 +161,28 @@ def crawl_all_hot_pages(start_page: int = 1, end_page: Optional[int] = None,
                 print(f"  失败页码: {resume_info['failed']}")
 
             task_id = resume_info['task_id']
-            pending_pages = resume_info['pending']
             print("")
 
+    # 数据已经落库的页才算真正完成（进度文件里标记完成、数据却没写入的页会重新爬取）；
+    # 新任务则清掉同名任务的旧页面日志，重新爬取全部页面
+    if task_id:
+        saved_pages = analytics_db.get_saved_pages(log_task_id, db_path)
+    else:
+        analytics_db.clear_saved_pages(log_task_id, db_path)
+
+    def save_page(page_num: int, videos: List[Dict]) -> bool:
+        nonlocal saved_videos
+        # 热门列表每页都有视频，空结果说明爬取或解析失败，不记为完成
+        if not videos:
+            if tracker and task_id:
+                tracker.update_page(task_id, page_num, success=False)
+            return False
+        analytics_db.save_page_batch(date, page_num, videos, log_task_id, db_path)
+        saved_videos += len(videos)
+        if tracker and task_id:
+            tracker.update_page(task_id, page_num, success=True)
+        return True
+
     # 先爬第一页获取总页数
     if not task_id:
         print("\n" + "=" * 80)
@@ -254,7 +195,7 @@ def crawl_all_hot_pages(start_page: int = 1, end_page: Optional[int] = None,
         print("❌ 无法获取总页数，爬取失败")
         if tracker and task_id:
             tracker.fail_task(task_id, "无法获取总页数")
-        return []
+        return 0
 
     print(f"\n✓ 总页数: {total_pages:,}")
 
@@ -267,16 +208,17 @@ def crawl_all_hot_pages(start_page: int = 1, end_page: Optional[int] = None,
     if not task_id and tracker:
         task_id = tracker.start_task(task_type, end_page)
 
+    # 第一页已经拿到，直接写入，不再重复请求
+    if start_page == 1 and 1 not in saved_pages and save_page(1, first_page_videos):
+        saved_pages.add(1)
+
     # 确定要爬取的页码列表
-    if pending_pages is not None:
-        # 断点续传：只爬未完成的页
-        pages_to_crawl = [p for p in pending_pages if start_page <= p <= end_page]
-        print(f"✓ 断点续传: 剩余 {len(pages_to_crawl)} 页待爬取")
+    pages_to_crawl = [p for p in range(start_page, end_page + 1) if p not in saved_pages]
+    if task_id and resume_info:
+        print(f"✓ 断点续传: 数据库中已有 {len(saved_pages)} 页，剩余 {len(pages_to_crawl)} 页待爬取")
     else:
-        # 新任务：爬所有页
-        pages_to_crawl = list(range(start_page, end_page + 1))
         print(f"✓ 爬取范围: 第 {start_page} 页 到 第 {end_page} 页")
-        print(f"✓ 预计视频数量: {len(pages_to_crawl) * 24:,} 个")
+        print(f"✓ 预计视频数量: {len(pages_to_crawl) * analytics_db.HOT_PAGE_SIZE:,} 个")
 
     # 使用优化版时预计耗时更少
     avg_time_per_page = 1.5 if USE_FAST_MODE else 5.0
@@ -285,36 +227,62 @@ def crawl_all_hot_pages(start_page: int = 1, end_page: Optional[int] = None,
     # 爬取页面
     total_to_crawl = len(pages_to_crawl)
     for idx, page_num in enumerate(pages_to_crawl, 1):
+        challenges_before = get_challenge_stats()['challenges']
+        limiter_wait_before = rate_limiter.get_limiter_stats()['total_wait']
+        cache_hits_before = html_cache.get_cache_stats()['hits']
+        page_start = time.time()
+        videos = []
         try:
             print(f"[{idx}/{total_to_crawl}] ", end="")
             videos, _ = crawl_hot_page(page_num, retry=3)
-            all_videos.extend(videos)
-
-            # 标记页面完成
-            if tracker and task_id:
-                tracker.update_page(task_id, page_num, success=True)
 
-            # 显示进度
-            progress = idx / total_to_crawl * 100
-            print(f"  ✓ 进度: {progress:.1f}% | 已爬取: {len(all_videos):,} 个视频")
+            # 整页数据和完成标记一起写入
+            if save_page(page_num, videos):
+                progress = idx / total_to_crawl * 100
+                print(f"  ✓ 进度: {progress:.1f}% | 本次已保存: {saved_videos:,} 个视频")
 
         except Exception as e:
-            print(f"  ✗ 第 {page_num} 页爬取失败: {str(e)[:50]}")
-            # 标记页面失败
+            print(f"  ✗ 第 {page_num} 页保存失败: {str(e)[:50]}")
             if tracker and task_id:
                 tracker.update_page(task_id, page_num, success=False)
 
-        # 延迟（避免请求过快）
-        if idx < total_to_crawl:
-            time.sleep(page_delay)
+        # 命中页面缓存时没有实际请求，不需要等待
+        from_cache = html_cache.get_cache_stats()['hits'] > cache_hits_before
 
+        # 延迟（避免请求过快）
+        if pacer and not from_cache:
+            # 耗时扣除共享限速器的排队时间，只反映站点本身的响应
+            latency = (time.time() - page_start
+                       - (rate_limiter.get_limiter_stats()['total_wait'] - limiter_wait_before))
+            pacer.observe(latency,
+                          challenged=get_challenge_stats()['challenges'] > challenges_before,
+                          error=not videos)
+        if idx < total_to_crawl and not from_cache:
+            if pacer:
+                pacer.wait()
+            else:
+                time.sleep(page_delay)
+
+    total_saved = analytics_db.count_daily_stats(date, db_path)
     print("\n" + "=" * 80)
-    print(f"✓ 爬取完成！共获取 {len(all_videos):,} 个视频")
+    print(f"✓ 爬取完成！本次保存 {saved_videos:,} 个视频，{date} 共 {total_saved:,} 个")
+    cf_stats = get_challenge_stats()
+    if cf_stats['challenges']:
+        print(f"  Cloudflare 验证: {cf_stats['challenges']} 次 "
+              f"(超时 {cf_stats['timeouts']} 次)，共等待 {cf_stats['total_wait']:.1f} 秒")
+    html_cache.print_cache_stats()
+    fixture_store.print_record_stats()
+    rate_limiter.print_limiter_stats()
+    if pacer:
+        pacer.print_stats()
+        pacer.save()
+    fetch_backends.print_backend_stats()
+    retry_policy.print_retry_metrics()
     print("=" * 80)
 
     # 标记任务完成
     if tracker and task_id:
-        tracker.update_stats(task_id, videos_count=len(all_videos), actors_count=0)
+        tracker.update_stats(task_id, videos_count=total_saved, actors_count=0)
         tracker.complete_task(task_id)
 
     # 清理浏览器实例（如果使用优化版）
@@ -322,12 +290,12 @@ def crawl_all_hot_pages(start_page: int = 1, end_page: Optional[int] = None,
         print("\n正在清理浏览器实例...")
         cleanup_browser()
 
-    return all_videos
+    return saved_videos
 
 
 def extract_actors_from_video_page(html: str) -> List[Dict]:
     """
-    从视频详情页提取演员信息
+    从视频详情页提取演员信息（page_parser 的包装）
 
     Args:
         html: 视频详情页 HTML 内容
@@ -335,52 +303,7 @@ def extract_actors_from_video_page(html: str) -> List[Dict]:
     Returns:
         演员列表，每项包含 {actor_id, actor_name}
     """
-    # 使用 lxml 解析器
-    try:
-        soup = BeautifulSoup(html, 'lxml')
-    except:
-        soup = BeautifulSoup(html, 'html.parser')
-
-    actors = []
-
-    # 查找演员容器
-    models_container = soup.select('div.models a.model')
-
-    for model_link in models_container:
-        try:
-            # 提取演员链接
-            href = model_link.get('href', '')
-            if not href or '/models/' not in href:
-                continue
-
-            # 从链接中提取演员 ID
-            actor_id = href.split('/')[-2] if '/' in href else ''
-            if not actor_id:
-                continue
-
-            # 提取演员名字（从 span 的 data-original-title 属性）
-            span_tag = model_link.select_one('span[data-original-title]')
-            actor_name = span_tag.get('data-original-title', '') if span_tag else ''
-
-            # 如果没有 data-original-title，尝试从 title 属性获取
-            if not actor_name:
-                actor_name = span_tag.get('title', '') if span_tag else ''
-
-            # 如果还是没有，使用显示的文本
-            if not actor_name:
-                actor_name = model_link.get_text(strip=True)
-
-            if actor_id and actor_name:
-                actors.append({
-                    'actor_id': actor_id,
-                    'actor_name': actor_name
-                })
-
-        except Exception as e:
-            print(f"  ⚠️  解析演员失败: {e}")
-            continue
-
-    return actors
+    return [actor._asdict() for actor in page_parser.parse_page(html).actors]
 
 
 def crawl_video_actors(video_id: str, video_url: Optional[str] = None, retry: int = 2) -> List[Dict]:
@@ -401,7 +324,7 @@ def crawl_video_actors(video_id: str, video_url: Optional[str] = None, retry: in
     print(f"  正在获取视频 {video_id} 的演员信息...")
 
     try:
-        html = fetch_page(video_url, retry=retry)
+        html = fetch_page(video_url, retry=retry, kind='video')
         actors = extract_actors_from_video_page(html)
 
         if actors:
@@ -417,36 +340,91 @@ def crawl_video_actors(video_id: str, video_url: Optional[str] = None, retry: in
         return []
 
 
-def crawl_multiple_video_actors(video_list: List[Dict], delay: float = 2.0) -> Dict[str, List[Dict]]:
+def _fetch_video_actors(video: Dict) -> List[Dict]:
+    """获取池的任务函数：获取视频详情页并解析演员（失败时抛出异常，由获取池记录）"""
+    video_url = video.get('url') or f"https://jable.tv/videos/{video['video_id']}/"
+    return extract_actors_from_video_page(fetch_page(video_url, retry=2, kind='video'))
+
+
+def estimate_actor_crawl_seconds(count: int, workers: Optional[int] = None) -> float:
+    """
+    估算并发爬取 count 个视频详情页的耗时：受站点限速和并发下的页面耗时两者中较慢的约束
+
+    Args:
+        count: 视频数
+        workers: 并发数（None 则使用 fetch_workers 配置）
+
+    Returns:
+        预计秒数
+    """
+    limit = rate_limiter.get_limit('jable.tv')
+    rate_bound = count / limit['rate'] if limit else 0.0
+    latency_bound = count * VIDEO_PAGE_SECONDS / fetch_pool.get_worker_count(workers)
+    return max(rate_bound, latency_bound)
+
+
+def crawl_multiple_video_actors(video_list: List[Dict], db_path: Optional[str] = None,
+                                workers: Optional[int] = None,
+                                skip_existing: bool = True) -> Dict[str, List[Dict]]:
     """
     批量爬取多个视频的演员信息
+    通过有界并发获取池抓取详情页，请求节奏由共享的 rate_limiter 统一控制；
+    指定 db_path 时跳过已有演员关联的视频，每个视频抓取完成立即写入数据库
 
     Args:
         video_list: 视频列表，每项包含 {video_id, url}
-        delay: 每个视频之间的延迟（秒）
+        db_path: 数据库路径（None 表示只返回结果，不读写数据库）
+        workers: 并发数（None 则使用 fetch_workers 配置）
+        skip_existing: 是否跳过数据库中已有演员信息（或最近确认过没有演员）的视频
 
     Returns:
-        字典：{video_id: [演员列表]}
+        字典：{video_id: [演员列表]}（只包含本次成功抓取的视频）
     """
+    # 去重（同一视频只抓一次）
+    videos = list({video['video_id']: video for video in video_list}.values())
+
+    skipped = 0
+    checked = set()
+    if db_path and skip_existing:
+        video_ids = [video['video_id'] for video in videos]
+        existing = analytics_db.get_videos_with_actors(video_ids, db_path)
+        checked = analytics_db.get_videos_checked_without_actors(video_ids, db_path) - existing
+        skipped = len(existing)
+        videos = [video for video in videos if video['video_id'] not in existing | checked]
+
     result = {}
-    total = len(video_list)
+    failed = []
+    total = len(videos)
 
     print("=" * 80)
-    print(f"开始爬取 {total} 个视频的演员信息")
+    print(f"开始爬取 {total} 个视频的演员信息（并发 {fetch_pool.get_worker_count(workers)}）")
+    if skipped:
+        print(f"  跳过已有演员信息的视频: {skipped} 个")
+    if checked:
+        print(f"  跳过最近确认没有演员信息的视频: {len(checked)} 个")
     print("=" * 80)
 
-    for i, video in enumerate(video_list, 1):
+    today = datetime.now().strftime('%Y-%m-%d')
+    done = 0
+    for video, actors, error in fetch_pool.fetch_all(_fetch_video_actors, videos, workers=workers,
+                                                     name='actor-page'):
+        done += 1
         video_id = video['video_id']
-        video_url = video.get('url')
 
-        print(f"\n[{i}/{total}] 视频: {video_id}")
+        if error is not None:
+            print(f"[{done}/{total}] {video_id}: ✗ 获取演员信息失败: {str(error)[:100]}")
+            failed.append(video_id)
+            continue
 
-        actors = crawl_video_actors(video_id, video_url, retry=2)
         result[video_id] = actors
-
-        # 延迟
-        if i < total:
-            time.sleep(delay)
+        if actors:
+            print(f"[{done}/{total}] {video_id}: ✓ {', '.join(a['actor_name'] for a in actors)}")
+            if db_path:
+                analytics_db.bulk_insert_video_actors(video_id, actors, db_path)
+        else:
+            print(f"[{done}/{total}] {video_id}: ⚠️  未找到演员信息")
+            if db_path:
+                analytics_db.mark_actors_checked([video_id], today, db_path)
 
     print("\n" + "=" * 80)
     print(f"✓ 完成！共获取 {len(result)} 个视频的演员信息")
@@ -454,12 +432,182 @@ def crawl_multiple_video_actors(video_list: List[Dict], delay: float = 2.0) -> D
     # 统计
     with_actors = sum(1 for actors in result.values() if actors)
     print(f"  有演员信息: {with_actors} 个")
-    print(f"  无演员信息: {total - with_actors} 个")
+    print(f"  无演员信息: {len(result) - with_actors} 个")
+    if failed:
+        print(f"  获取失败: {len(failed)} 个（下次运行会重新尝试）")
     print("=" * 80)
 
     return result
 
 
+def _crawl_model_listing(actor_id: str, max_pages: int, db_path: str,
+                         progress: Optional[Tuple[int, int, str]] = None,
+                         workers: Optional[int] = None) -> Tuple[int, List[str], bool]:
+    """
+    抓取演员列表页（本次最多 max_pages 页），把列表上已入库的视频关联到该演员
+    没抓完时记录进度，下次从下一页继续（列表页按发布时间排列，期间的新视频会让分页略有错位，
+    关联是幂等的，重复或漏掉的少数视频由详情页补充）
+
+    Args:
+        actor_id: 演员 ID
+        max_pages: 本次最多抓取的页数
+        db_path: 数据库路径
+        progress: 上次的进度 (下一页, 总页数, 日期)，None 表示从第一页开始
+        workers: 并发数
+
+    Returns:
+        (抓取的页数, 新关联的视频 ID, 是否抓完了全部页)
+    """
+    base_url = f'https://jable.tv/models/{actor_id}/'
+    today = datetime.now().strftime('%Y-%m-%d')
+    mapped = []
+    pages = 0
+
+    if progress:
+        # 继续上次的进度（演员已在库中，名字不会被覆盖）
+        first_page, last_page, _ = progress
+        actor_name, total_videos = actor_id, 0
+    else:
+        actor_name, last_page, total_videos, page_ids = model_crawler.parse_listing_page(
+            base_url, fetch_page(base_url, kind='list'))
+        actor_name = actor_name.strip() or actor_id
+        mapped += analytics_db.link_actor_videos(actor_id, actor_name, page_ids, db_path)
+        pages = 1
+        first_page = 2
+
+    def fetch_page_ids(page_num: int) -> List[str]:
+        return model_crawler.parse_page_video_ids(
+            fetch_page(model_crawler.get_page_url(base_url, page_num), kind='list'))
+
+    # 分页并发获取，每页到达即写入关联
+    end_page = min(last_page, first_page + max_pages - pages - 1)
+    failed_pages = []
+    for page_num, ids, error in fetch_pool.fetch_all(fetch_page_ids, range(first_page, end_page + 1),
+                                                     workers=workers, name='model-listing'):
+        pages += 1
+        if error is not None:
+            print(f"    ⚠️  {actor_name} 第 {page_num} 页抓取失败: {str(error)[:80]}")
+            failed_pages.append(page_num)
+            continue
+        mapped += analytics_db.link_actor_videos(actor_id, actor_name, ids, db_path)
+
+    complete = end_page >= last_page and not failed_pages
+    if complete:
+        analytics_db.record_model_listing(actor_id, today, pages, total_videos, db_path)
+    else:
+        # 下次从第一个失败的页（或本次之后的一页）继续
+        next_page = min(failed_pages) if failed_pages else end_page + 1
+        analytics_db.save_model_listing_progress(actor_id, next_page, last_page, today, db_path)
+    return pages, mapped, complete
+
+
+def crawl_actors_via_models(video_list: List[Dict], db_path: str,
+                            page_budget: Optional[int] = None,
+                            workers: Optional[int] = None) -> Dict[str, int]:
+    """
+    通过演员列表页反向建立视频-演员关联，只对剩下没关联上的视频逐个抓取详情页
+
+    一个 /models/<id>/ 列表页一次给出该演员的 24 个视频，比每个视频抓一次详情页省得多：
+    1. 与这批视频相关的已知演员（关联了 video_list 中视频的演员，按关联数排序）依次抓取列表页，
+       列表上所有已入库的视频一次关联
+    2. 相关演员用完后，抓取排名最靠前的未关联视频的详情页，发现的新演员排到最前面接着抓列表页
+    3. 页面预算用完后，剩余视频走 crawl_multiple_video_actors 逐个抓取详情页
+    每个演员每次最多抓 MODEL_LISTING_PAGES_PER_RUN 页，没抓完的记录进度，下次运行接着抓；
+    完整抓取过的演员列表页 MODEL_LISTING_REFRESH_DAYS 天内不再重复抓取（期间的新视频靠详情页补充）
+
+    Args:
+        video_list: 视频列表，每项包含 {video_id, url}（按优先级排序）；已有演员信息的视频不会再抓，
+                    但它们关联的演员决定列表页的抓取顺序
+        db_path: 数据库路径
+        page_budget: 列表页 + 发现用详情页的页数上限（None 表示与目标视频数相同，
+                     即不超过逐个抓取详情页的请求数）
+        workers: 并发数（None 则使用 fetch_workers 配置）
+
+    Returns:
+        统计 {targets, mapped, listing_pages, detail_pages, fallback_pages}
+    """
+    videos = list({video['video_id']: video for video in video_list}.values())
+    video_ids = [video['video_id'] for video in videos]
+    skip = (analytics_db.get_videos_with_actors(video_ids, db_path)
+            | analytics_db.get_videos_checked_without_actors(video_ids, db_path))
+    unmapped = {video['video_id']: video for video in videos if video['video_id'] not in skip}
+    target_ids = list(unmapped)
+
+    stats = {'targets': len(target_ids), 'mapped': 0, 'listing_pages': 0, 'detail_pages': 0, 'fallback_pages': 0}
+    budget = len(target_ids) if page_budget is None else page_budget
+
+    cutoff = (datetime.now() - timedelta(days=MODEL_LISTING_REFRESH_DAYS)).strftime('%Y-%m-%d')
+    crawled = {actor_id for actor_id, date in analytics_db.get_model_listing_dates(db_path).items()
+               if date >= cutoff}
+    progress = {actor_id: state for actor_id, state in analytics_db.get_model_listing_progress(db_path).items()
+                if state[2] >= cutoff}
+    link_counts = analytics_db.get_actor_link_counts(video_ids, db_path)
+    queue = sorted((actor_id for actor_id in link_counts if actor_id not in crawled),
+                   key=lambda actor_id: (-link_counts[actor_id], actor_id))
+
+    print("=" * 80)
+    print(f"通过演员列表页关联 {len(target_ids)} 个视频（相关演员 {len(queue)} 个，页面预算 {budget}）")
+    print("=" * 80)
+
+    fallback = []
+    while unmapped and budget > 0:
+        if queue:
+            actor_id = queue.pop(0)
+            crawled.add(actor_id)
+            try:
+                pages, mapped, _ = _crawl_model_listing(
+                    actor_id, min(budget, MODEL_LISTING_PAGES_PER_RUN), db_path,
+                    progress=progress.get(actor_id), workers=workers)
+            except Exception as e:
+                print(f"  ⚠️  演员 {actor_id} 列表页抓取失败: {str(e)[:80]}")
+                pages, mapped = 1, []
+
+            budget -= pages
+            stats['listing_pages'] += pages
+            hits = [video_id for video_id in mapped if unmapped.pop(video_id, None)]
+            print(f"  演员 {actor_id}: {pages} 页，新关联 {len(mapped)} 个视频"
+                  f"（目标 {len(hits)} 个），剩余 {len(unmapped)} 个")
+            continue
+
+        # 没有可抓的已知演员：抓排名最靠前的未关联视频详情页，发现新演员
+        video_id, video = next(iter(unmapped.items()))
+        del unmapped[video_id]
+        budget -= 1
+        stats['detail_pages'] += 1
+        try:
+            actors = _fetch_video_actors(video)
+        except Exception as e:
+            print(f"  ⚠️  视频 {video_id} 详情页抓取失败: {str(e)[:80]}")
+            fallback.append(video)
+            continue
+
+        if actors:
+            analytics_db.bulk_insert_video_actors(video_id, actors, db_path)
+            queue = [a['actor_id'] for a in actors if a['actor_id'] not in crawled] + queue
+            print(f"  视频 {video_id}: 发现演员 {', '.join(a['actor_name'] for a in actors)}")
+        else:
+            print(f"  视频 {video_id}: ⚠️  未找到演员信息")
+            analytics_db.mark_actors_checked([video_id], datetime.now().strftime('%Y-%m-%d'), db_path)
+
+    # 预算用完后剩下的视频逐个抓取详情页
+    fallback.extend(unmapped.values())
+    if fallback:
+        print(f"\n剩余 {len(fallback)} 个视频逐个抓取详情页")
+        crawl_multiple_video_actors(fallback, db_path=db_path, workers=workers, skip_existing=False)
+        stats['fallback_pages'] = len(fallback)
+
+    stats['mapped'] = len(analytics_db.get_videos_with_actors(target_ids, db_path))
+    fetches = stats['listing_pages'] + stats['detail_pages'] + stats['fallback_pages']
+
+    print("\n" + "=" * 80)
+    print(f"✓ 完成！{stats['mapped']}/{stats['targets']} 个视频已关联演员")
+    print(f"  列表页: {stats['listing_pages']}  发现用详情页: {stats['detail_pages']}  "
+          f"逐个抓取详情页: {stats['fallback_pages']}（共 {fetches} 次请求）")
+    print("=" * 80)
+
+    return stats
+
+
 if __name__ == '__main__':
     # 测试：爬取前 2 页
     print("测试爬虫模块")
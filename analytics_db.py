@@ -2,22 +2,125 @@
 """
 热门影片和演员分析数据库模块
 管理 SQLite 数据库的创建、读写操作
+每个线程复用一个持久连接（WAL + 预编译语句缓存），批量写入可用 transaction() 合并为一个事务
 """
 
+import atexit
 import sqlite3
 import os
-from datetime import datetime
+import threading
+from datetime import datetime, timedelta
 from typing import List, Dict, Optional, Tuple
 from contextlib import contextmanager
 
 # 默认数据库路径
 DEFAULT_DB_PATH = './analytics.db'
 
+# 连接参数：WAL 模式下读（生成榜单）和写（每日更新）互不阻塞；
+# synchronous=NORMAL 只在检查点时 fsync，不再每次提交都落盘
+CONNECTION_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA mmap_size=268435456',   # 256MB 内存映射读
+    'PRAGMA cache_size=-65536',     # 64MB 页缓存
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA foreign_keys=OFF',
+)
+
+# 每个连接缓存的预编译语句数
+CACHED_STATEMENTS = 256
+
+# 每个线程持有自己的连接（sqlite3 连接不能跨线程使用）
+_local = threading.local()
+_all_connections = []
+_all_connections_lock = threading.Lock()
+
+
+def _get_thread_state() -> Dict:
+    # fork 出的子进程不能沿用父进程的连接
+    if getattr(_local, 'pid', None) != os.getpid():
+        _local.pid = os.getpid()
+        _local.connections = {}
+        _local.depth = {}
+    return _local.__dict__
+
+
+def _open_connection(db_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path, timeout=30, cached_statements=CACHED_STATEMENTS)
+    conn.row_factory = sqlite3.Row  # 使查询结果可以像字典一样访问
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    with _all_connections_lock:
+        _all_connections.append(conn)
+    return conn
+
+
+def get_connection(db_path: str = DEFAULT_DB_PATH) -> sqlite3.Connection:
+    """
+    获取当前线程的持久连接（首次使用时创建并设置参数）
+
+    Args:
+        db_path: 数据库文件路径
+
+    Returns:
+        sqlite3.Connection: 数据库连接对象
+    """
+    state = _get_thread_state()
+    key = os.path.abspath(db_path)
+    conn = state['connections'].get(key)
+
+    # 数据库文件被删除（测试重建数据库）时重新连接
+    if conn is not None and db_path != ':memory:' and not os.path.exists(key):
+        close_db_connections(db_path)
+        conn = None
+
+    if conn is None:
+        conn = _open_connection(db_path)
+        state['connections'][key] = conn
+    return conn
+
+
+def close_db_connections(db_path: Optional[str] = None) -> None:
+    """
+    关闭当前线程的持久连接
+
+    Args:
+        db_path: 只关闭该数据库的连接（None 表示全部）
+    """
+    state = _get_thread_state()
+    keys = [os.path.abspath(db_path)] if db_path else list(state['connections'])
+    for key in keys:
+        conn = state['connections'].pop(key, None)
+        state['depth'].pop(key, None)
+        if conn is not None:
+            with _all_connections_lock:
+                if conn in _all_connections:
+                    _all_connections.remove(conn)
+            conn.close()
+
+
+@atexit.register
+def _close_all_connections() -> None:
+    # 进程退出时关闭所有连接，最后一个连接关闭时 SQLite 会合并 WAL
+    with _all_connections_lock:
+        connections = list(_all_connections)
+        _all_connections.clear()
+    for conn in connections:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
 
 @contextmanager
-def get_db_connection(db_path: str = DEFAULT_DB_PATH):
+def transaction(db_path: str = DEFAULT_DB_PATH):
     """
-    数据库连接上下文管理器
+    批量操作事务：块内的所有数据库调用共用一个事务，退出时统一提交（出错则整体回滚）
+    可以嵌套，只有最外层提交
+
+        with analytics_db.transaction(db_path):
+            for video_id, actors in actors_data.items():
+                analytics_db.bulk_insert_video_actors(video_id, actors, db_path)
 
     Args:
         db_path: 数据库文件路径
@@ -25,16 +128,161 @@ def get_db_connection(db_path: str = DEFAULT_DB_PATH):
     Yields:
         sqlite3.Connection: 数据库连接对象
     """
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row  # 使查询结果可以像字典一样访问
+    state = _get_thread_state()
+    conn = get_connection(db_path)
+    key = os.path.abspath(db_path)
+    depth = state['depth'].get(key, 0)
+    state['depth'][key] = depth + 1
     try:
         yield conn
-        conn.commit()
-    except Exception as e:
-        conn.rollback()
-        raise e
+        if depth == 0:
+            conn.commit()
+    except BaseException:
+        if depth == 0:
+            conn.rollback()
+        raise
     finally:
-        conn.close()
+        state['depth'][key] = depth
+
+
+@contextmanager
+def get_db_connection(db_path: str = DEFAULT_DB_PATH):
+    """
+    数据库连接上下文管理器（复用当前线程的持久连接）
+    在 transaction() 块内时并入外层事务，否则退出时提交
+
+    Args:
+        db_path: 数据库文件路径
+
+    Yields:
+        sqlite3.Connection: 数据库连接对象
+    """
+    with transaction(db_path) as conn:
+        yield conn
+
+
+# ==================== 存储布局 ====================
+# daily_stats 有两种布局：
+# - 原始布局：daily_stats 是普通表（TEXT video_id / TEXT date）
+# - 紧凑布局（analytics_migrate.py 迁移后）：数据在 video_keys + stats_compact（整数键、整数天），
+#   daily_stats 变成还原视图，供外部脚本读写
+# 本模块的读写按布局选择对应的 SQL，查询都能走索引
+
+# 1970-01-01 的儒略日，整数天 = julianday(date) - EPOCH_JULIAN_DAY
+EPOCH_JULIAN_DAY = 2440587.5
+
+_EPOCH_DATE = datetime(1970, 1, 1)
+
+_compact_layout: Dict[str, bool] = {}
+
+
+def date_to_day(date: str) -> int:
+    """YYYY-MM-DD -> 整数天（1970-01-01 为 0）"""
+    return (datetime.strptime(date, '%Y-%m-%d') - _EPOCH_DATE).days
+
+
+def day_to_date(day: int) -> str:
+    """整数天 -> YYYY-MM-DD"""
+    return (_EPOCH_DATE + timedelta(days=day)).strftime('%Y-%m-%d')
+
+
+def is_compact_layout(conn: sqlite3.Connection, db_path: str) -> bool:
+    """数据库是否已迁移到紧凑布局"""
+    key = os.path.abspath(db_path)
+    if key not in _compact_layout:
+        row = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'stats_compact'").fetchone()
+        _compact_layout[key] = row is not None
+    return _compact_layout[key]
+
+
+def reset_layout_cache(db_path: str) -> None:
+    """布局变化（迁移、重建数据库）后清除缓存"""
+    _compact_layout.pop(os.path.abspath(db_path), None)
+
+
+def _stats_on_date(conn: sqlite3.Connection, db_path: str, date: str,
+                   with_video_id: bool = True) -> Tuple[str, list]:
+    """
+    某天的统计数据子查询（列：key, video_id, views, likes, rank）
+    key 是布局内的视频键，两天的数据按 key 关联可以直接走主键
+
+    Args:
+        with_video_id: 是否需要 video_id 列（紧凑布局下不需要时省掉一次关联）
+
+    Returns:
+        (SQL 片段, 参数列表)
+    """
+    if is_compact_layout(conn, db_path):
+        if not with_video_id:
+            return '(SELECT vid AS key, views, likes, rank FROM stats_compact WHERE day = ?)', [date_to_day(date)]
+        return ('''(SELECT s.vid AS key, k.video_id, s.views, s.likes, s.rank
+                    FROM stats_compact s JOIN video_keys k ON k.vid = s.vid
+                    WHERE s.day = ?)''', [date_to_day(date)])
+    return '(SELECT video_id AS key, video_id, views, likes, rank FROM daily_stats WHERE date = ?)', [date]
+
+
+def _upsert_daily_stats(conn: sqlite3.Connection, db_path: str, rows: List[Tuple]) -> None:
+    """
+    写入或更新每日统计
+
+    Args:
+        rows: [(video_id, date, views, likes, rank), ...]
+    """
+    if is_compact_layout(conn, db_path):
+        conn.executemany('INSERT OR IGNORE INTO video_keys (video_id) VALUES (?)',
+                         [(row[0],) for row in rows])
+        conn.executemany('''
+            INSERT INTO stats_compact (vid, day, views, likes, rank)
+            SELECT vid, ?, ?, ?, ? FROM video_keys WHERE video_id = ?
+            ON CONFLICT(vid, day) DO UPDATE SET
+                views = excluded.views,
+                likes = excluded.likes,
+                rank = excluded.rank
+        ''', [(date_to_day(date), views, likes, rank, video_id)
+              for video_id, date, views, likes, rank in rows])
+    else:
+        conn.executemany('''
+            INSERT INTO daily_stats (video_id, date, views, likes, rank)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(video_id, date) DO UPDATE SET
+                views = excluded.views,
+                likes = excluded.likes,
+                rank = excluded.rank
+        ''', rows)
+
+    video_ids = {row[0] for row in rows}
+    dates = {row[1] for row in rows}
+    _update_video_growth(conn, db_path, video_ids, dates)
+    _mark_actors_dirty(conn, db_path, video_ids, dates)
+    _log_stats_changes(conn, {date_to_day(date) for date in dates})
+
+
+def _log_stats_changes(conn: sqlite3.Connection, days: set) -> None:
+    """记录被写入的日期（每次写入分配一个递增序号），分析引擎据此只重新加载变化过的日期"""
+    conn.executemany('''
+        INSERT INTO stats_changes (day, seq)
+        VALUES (?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM stats_changes))
+        ON CONFLICT(day) DO UPDATE SET seq = excluded.seq
+    ''', [(day,) for day in sorted(days)])
+
+
+def get_stats_changes_since(seq: int, db_path: str = DEFAULT_DB_PATH) -> Tuple[Optional[int], int]:
+    """
+    序号 seq 之后被写入过的最早日期
+
+    Args:
+        seq: 上次读取时的序号（0 表示从头）
+        db_path: 数据库路径
+
+    Returns:
+        (最早变化的整数天，没有变化时为 None, 当前最大序号)
+    """
+    with get_db_connection(db_path) as conn:
+        _ensure_derived_tables(conn, db_path)
+        first_day, last_seq = conn.execute(
+            'SELECT MIN(day), MAX(seq) FROM stats_changes WHERE seq > ?', (seq,)).fetchone()
+        return first_day, last_seq if last_seq is not None else seq
 
 
 def init_database(db_path: str = DEFAULT_DB_PATH) -> None:
@@ -55,11 +303,16 @@ def init_database(db_path: str = DEFAULT_DB_PATH) -> None:
                 video_id TEXT PRIMARY KEY,
                 title TEXT NOT NULL,
                 first_seen_date TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                actors_checked_date TEXT
             )
         ''')
 
-        # 2. 每日统计表（视频的观看数和点赞数快照）
+        # 旧数据库升级：actors_checked_date 记录最近一次抓取详情页确认没有演员信息的日期
+        if 'actors_checked_date' not in {row[1] for row in cursor.execute('PRAGMA table_info(videos)')}:
+            cursor.execute('ALTER TABLE videos ADD COLUMN actors_checked_date TEXT')
+
+        # 2. 每日统计表（视频的观看数和点赞数快照；紧凑布局下已是同名视图，这里不会重复创建）
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS daily_stats (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -109,15 +362,49 @@ def init_database(db_path: str = DEFAULT_DB_PATH) -> None:
             )
         ''')
 
+        # 6. 爬取页面日志（与该页数据在同一事务中写入，断点续传以此为准）
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS crawl_page_log (
+                task_id TEXT NOT NULL,
+                page_num INTEGER NOT NULL,
+                date TEXT NOT NULL,
+                video_count INTEGER NOT NULL DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (task_id, page_num)
+            )
+        ''')
+
+        # 7. 演员列表页抓取日志（从 /models/<id>/ 列表页反向建立视频-演员关联）
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS model_listing_log (
+                actor_id TEXT PRIMARY KEY,
+                crawled_date TEXT NOT NULL,
+                pages INTEGER NOT NULL DEFAULT 0,
+                video_count INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+
+        # 演员列表页的抓取进度（页数多的演员分几次运行抓完，下次从 next_page 继续）
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS model_listing_progress (
+                actor_id TEXT PRIMARY KEY,
+                next_page INTEGER NOT NULL,
+                last_page INTEGER NOT NULL,
+                updated_date TEXT NOT NULL
+            )
+        ''')
+
         # 创建索引以提升查询性能
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_daily_stats_date ON daily_stats(date)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_daily_stats_video_date ON daily_stats(video_id, date)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_daily_stats_likes ON daily_stats(likes DESC)')
+        if not is_compact_layout(conn, db_path):
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_daily_stats_date ON daily_stats(date)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_daily_stats_video_date ON daily_stats(video_id, date)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_daily_stats_likes ON daily_stats(likes DESC)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_actor_daily_stats_date ON actor_daily_stats(date)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_video_actors_video ON video_actors(video_id)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_video_actors_actor ON video_actors(actor_id)')
 
-        conn.commit()
+        # 8. 增长榜、待重算演员（入库时维护）
+        _ensure_derived_tables(conn, db_path)
 
     print("✓ 数据库初始化完成")
 
@@ -157,15 +444,7 @@ def insert_daily_stats(video_id: str, date: str, views: int, likes: int,
         db_path: 数据库路径
     """
     with get_db_connection(db_path) as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO daily_stats (video_id, date, views, likes, rank)
-            VALUES (?, ?, ?, ?, ?)
-            ON CONFLICT(video_id, date) DO UPDATE SET
-                views = excluded.views,
-                likes = excluded.likes,
-                rank = excluded.rank
-        ''', (video_id, date, views, likes, rank))
+        _upsert_daily_stats(conn, db_path, [(video_id, date, views, likes, rank)])
 
 
 def bulk_insert_daily_stats(stats_list: List[Dict], db_path: str = DEFAULT_DB_PATH) -> None:
@@ -189,14 +468,94 @@ def bulk_insert_daily_stats(stats_list: List[Dict], db_path: str = DEFAULT_DB_PA
         # 再插入统计数据
         stats_data = [(s['video_id'], s['date'], s['views'], s['likes'], s.get('rank'))
                      for s in stats_list]
+        _upsert_daily_stats(conn, db_path, stats_data)
+
+
+# 热门列表每页的视频数（用于按页码计算全局排名）
+HOT_PAGE_SIZE = 24
+
+
+def save_page_batch(date: str, page_num: int, videos: List[Dict], task_id: str,
+                    db_path: str = DEFAULT_DB_PATH) -> None:
+    """
+    保存一页爬取结果：视频、每日统计和页面日志在同一个事务中写入，
+    中途中断时要么整页都在，要么整页都不在
+
+    Args:
+        date: 日期 (YYYY-MM-DD)
+        page_num: 页码（从 1 开始）
+        videos: 该页的视频列表，每项包含 {video_id, title, views, likes}
+        task_id: 爬取任务 ID
+        db_path: 数据库路径
+    """
+    base_rank = (page_num - 1) * HOT_PAGE_SIZE
+
+    with get_db_connection(db_path) as conn:
+        cursor = conn.cursor()
+
         cursor.executemany('''
-            INSERT INTO daily_stats (video_id, date, views, likes, rank)
-            VALUES (?, ?, ?, ?, ?)
-            ON CONFLICT(video_id, date) DO UPDATE SET
-                views = excluded.views,
-                likes = excluded.likes,
-                rank = excluded.rank
-        ''', stats_data)
+            INSERT OR IGNORE INTO videos (video_id, title, first_seen_date)
+            VALUES (?, ?, ?)
+        ''', [(v['video_id'], v['title'], date) for v in videos])
+
+        _upsert_daily_stats(conn, db_path, [(v['video_id'], date, v['views'], v['likes'], base_rank + i)
+                                            for i, v in enumerate(videos, 1)])
+
+        cursor.execute('''
+            INSERT INTO crawl_page_log (task_id, page_num, date, video_count)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(task_id, page_num) DO UPDATE SET
+                video_count = excluded.video_count,
+                created_at = CURRENT_TIMESTAMP
+        ''', (task_id, page_num, date, len(videos)))
+
+
+def get_saved_pages(task_id: str, db_path: str = DEFAULT_DB_PATH) -> set:
+    """
+    获取某个爬取任务中数据已写入数据库的页码
+
+    Args:
+        task_id: 爬取任务 ID
+        db_path: 数据库路径
+
+    Returns:
+        页码集合
+    """
+    with get_db_connection(db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT page_num FROM crawl_page_log WHERE task_id = ?', (task_id,))
+        return {row['page_num'] for row in cursor.fetchall()}
+
+
+def clear_saved_pages(task_id: str, db_path: str = DEFAULT_DB_PATH) -> None:
+    """
+    清除某个爬取任务的页面日志（重新开始同名任务时使用，已保存的数据不受影响）
+
+    Args:
+        task_id: 爬取任务 ID
+        db_path: 数据库路径
+    """
+    with get_db_connection(db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM crawl_page_log WHERE task_id = ?', (task_id,))
+
+
+def count_daily_stats(date: str, db_path: str = DEFAULT_DB_PATH) -> int:
+    """
+    统计指定日期已保存的视频数
+
+    Args:
+        date: 日期 (YYYY-MM-DD)
+        db_path: 数据库路径
+
+    Returns:
+        视频数
+    """
+    with get_db_connection(db_path) as conn:
+        cursor = conn.cursor()
+        source, params = _stats_on_date(conn, db_path, date, with_video_id=False)
+        cursor.execute(f'SELECT COUNT(*) as count FROM {source}', params)
+        return cursor.fetchone()['count']
 
 
 # ==================== 演员相关操作 ====================
@@ -228,11 +587,7 @@ def link_video_actor(video_id: str, actor_id: str, db_path: str = DEFAULT_DB_PAT
         db_path: 数据库路径
     """
     with get_db_connection(db_path) as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT OR IGNORE INTO video_actors (video_id, actor_id)
-            VALUES (?, ?)
-        ''', (video_id, actor_id))
+        _link_actors(conn, db_path, video_id, [actor_id])
 
 
 def bulk_insert_video_actors(video_id: str, actors_list: List[Dict],
@@ -259,42 +614,492 @@ def bulk_insert_video_actors(video_id: str, actors_list: List[Dict],
         ''', actor_data)
 
         # 再关联视频和演员
-        link_data = [(video_id, a['actor_id']) for a in actors_list]
-        cursor.executemany('''
-            INSERT OR IGNORE INTO video_actors (video_id, actor_id)
-            VALUES (?, ?)
-        ''', link_data)
+        _link_actors(conn, db_path, video_id, [a['actor_id'] for a in actors_list])
+
+
+def link_actor_videos(actor_id: str, actor_name: str, video_ids: List[str],
+                      db_path: str = DEFAULT_DB_PATH) -> List[str]:
+    """
+    把演员关联到一批视频（来自演员列表页），只关联数据库中已有的视频
+
+    Args:
+        actor_id: 演员 ID
+        actor_name: 演员名字
+        video_ids: 演员列表页上的视频 ID
+        db_path: 数据库路径
+
+    Returns:
+        新建立关联的视频 ID 列表
+    """
+    with get_db_connection(db_path) as conn:
+        conn.execute('INSERT OR IGNORE INTO actors (actor_id, actor_name) VALUES (?, ?)', (actor_id, actor_name))
+
+        known = set()
+        for start in range(0, len(video_ids), _IN_CHUNK):
+            chunk = video_ids[start:start + _IN_CHUNK]
+            known.update(row[0] for row in conn.execute(
+                f"SELECT video_id FROM videos WHERE video_id IN ({','.join('?' * len(chunk))})", chunk))
+
+        return [video_id for video_id in dict.fromkeys(video_ids)
+                if video_id in known and _link_actors(conn, db_path, video_id, [actor_id])]
+
 
+def get_model_listing_dates(db_path: str = DEFAULT_DB_PATH) -> Dict[str, str]:
+    """
+    获取各演员列表页上次完整抓取的日期
+
+    Args:
+        db_path: 数据库路径
+
+    Returns:
+        {actor_id: crawled_date}
+    """
+    with get_db_connection(db_path) as conn:
+        return {row[0]: row[1] for row in conn.execute('SELECT actor_id, crawled_date FROM model_listing_log')}
+
+
+def record_model_listing(actor_id: str, date: str, pages: int, video_count: int,
+                         db_path: str = DEFAULT_DB_PATH) -> None:
+    """
+    记录一次演员列表页抓取
+
+    Args:
+        actor_id: 演员 ID
+        date: 抓取日期 (YYYY-MM-DD)
+        pages: 抓取的页数
+        video_count: 列表页上的视频数
+        db_path: 数据库路径
+    """
+    with get_db_connection(db_path) as conn:
+        conn.execute('''
+            INSERT OR REPLACE INTO model_listing_log (actor_id, crawled_date, pages, video_count)
+            VALUES (?, ?, ?, ?)
+        ''', (actor_id, date, pages, video_count))
+        conn.execute('DELETE FROM model_listing_progress WHERE actor_id = ?', (actor_id,))
+
+
+def get_model_listing_progress(db_path: str = DEFAULT_DB_PATH) -> Dict[str, Tuple[int, int, str]]:
+    """
+    获取没抓完的演员列表页的进度
+
+    Args:
+        db_path: 数据库路径
+
+    Returns:
+        {actor_id: (下一页, 总页数, 更新日期)}
+    """
+    with get_db_connection(db_path) as conn:
+        return {row[0]: (row[1], row[2], row[3]) for row in conn.execute(
+            'SELECT actor_id, next_page, last_page, updated_date FROM model_listing_progress')}
+
+
+def save_model_listing_progress(actor_id: str, next_page: int, last_page: int, date: str,
+                                db_path: str = DEFAULT_DB_PATH) -> None:
+    """
+    记录演员列表页抓到哪一页（下次运行从 next_page 继续）
+
+    Args:
+        actor_id: 演员 ID
+        next_page: 下一页页码
+        last_page: 总页数
+        date: 日期 (YYYY-MM-DD)
+        db_path: 数据库路径
+    """
+    with get_db_connection(db_path) as conn:
+        conn.execute('''
+            INSERT OR REPLACE INTO model_listing_progress (actor_id, next_page, last_page, updated_date)
+            VALUES (?, ?, ?, ?)
+        ''', (actor_id, next_page, last_page, date))
+
+
+def get_actor_link_counts(video_ids: List[str], db_path: str = DEFAULT_DB_PATH) -> Dict[str, int]:
+    """
+    统计每个演员关联了这批视频中的几个
+
+    Args:
+        video_ids: 视频 ID 列表
+        db_path: 数据库路径
 
-def update_actor_daily_stats(date: str, db_path: str = DEFAULT_DB_PATH) -> None:
+    Returns:
+        {actor_id: 关联的视频数}
+    """
+    counts: Dict[str, int] = {}
+    with get_db_connection(db_path) as conn:
+        for start in range(0, len(video_ids), _IN_CHUNK):
+            chunk = video_ids[start:start + _IN_CHUNK]
+            for actor_id, count in conn.execute(f'''
+                SELECT actor_id, COUNT(*) FROM video_actors
+                WHERE video_id IN ({','.join('?' * len(chunk))})
+                GROUP BY actor_id
+            ''', chunk):
+                counts[actor_id] = counts.get(actor_id, 0) + count
+    return counts
+
+
+# ==================== 演员聚合（增量） ====================
+# 每日统计写入时，把关联演员的 (演员, 日期) 记入 actor_dirty；新建演员关联时，
+# 把该视频有统计的所有日期记为待重算。聚合时只重算这些演员，工作量与当天的变化成正比
+
+def _mark_actors_dirty(conn: sqlite3.Connection, db_path: str, video_ids: set, dates: set) -> None:
+    """每日统计变化：这些视频关联的演员在这些日期需要重算"""
+    _ensure_derived_tables(conn, db_path)
+    video_ids = list(video_ids)
+    for start in range(0, len(video_ids), _IN_CHUNK):
+        chunk = video_ids[start:start + _IN_CHUNK]
+        id_params = ','.join('?' * len(chunk))
+        for date in dates:
+            conn.execute(f'''
+                INSERT OR IGNORE INTO actor_dirty (date, actor_id)
+                SELECT DISTINCT ?, actor_id FROM video_actors WHERE video_id IN ({id_params})
+            ''', [date] + chunk)
+
+
+def _link_actors(conn: sqlite3.Connection, db_path: str, video_id: str, actor_ids: List[str]) -> int:
+    """关联视频和演员；新关联的演员在该视频有统计的每一天都需要重算。返回新增的关联数"""
+    existing = {row[0] for row in conn.execute('SELECT actor_id FROM video_actors WHERE video_id = ?',
+                                               (video_id,))}
+    new_actor_ids = [actor_id for actor_id in dict.fromkeys(actor_ids) if actor_id not in existing]
+    if not new_actor_ids:
+        return 0
+
+    conn.executemany('INSERT OR IGNORE INTO video_actors (video_id, actor_id) VALUES (?, ?)',
+                     [(video_id, actor_id) for actor_id in new_actor_ids])
+
+    if is_compact_layout(conn, db_path):
+        dates = [day_to_date(row[0]) for row in conn.execute('''
+            SELECT s.day FROM stats_compact s JOIN video_keys k ON k.vid = s.vid WHERE k.video_id = ?
+        ''', (video_id,))]
+    else:
+        dates = [row[0] for row in conn.execute('SELECT date FROM daily_stats WHERE video_id = ?', (video_id,))]
+
+    _ensure_derived_tables(conn, db_path)
+    conn.executemany('INSERT OR IGNORE INTO actor_dirty (date, actor_id) VALUES (?, ?)',
+                     [(date, actor_id) for date in dates for actor_id in new_actor_ids])
+    return len(new_actor_ids)
+
+
+def _aggregate_actors_sql(source: str, dirty_only: bool) -> str:
+    """按演员聚合某天统计的 SELECT（dirty_only 时只聚合 actor_dirty 中的演员）"""
+    return f'''
+        SELECT
+            va.actor_id,
+            ? as date,
+            SUM(ds.views) as total_views,
+            SUM(ds.likes) as total_likes,
+            COUNT(DISTINCT ds.video_id) as video_count
+        FROM video_actors va
+        JOIN {source} ds ON va.video_id = ds.video_id
+        {'WHERE va.actor_id IN (SELECT actor_id FROM actor_dirty WHERE date = ?)' if dirty_only else ''}
+        GROUP BY va.actor_id
+    '''
+
+
+def update_actor_daily_stats(date: str, db_path: str = DEFAULT_DB_PATH, full: bool = False) -> int:
     """
     更新演员每日统计（从视频统计聚合）
+    默认只重算当天有变化的演员；当天从未聚合过或 full=True 时全量重算
 
     Args:
         date: 日期 (YYYY-MM-DD)
         db_path: 数据库路径
+        full: 是否全量重算
+
+    Returns:
+        重算的演员数
     """
     with get_db_connection(db_path) as conn:
         cursor = conn.cursor()
+        _ensure_derived_tables(conn, db_path)
+
+        if not full:
+            # 当天从未聚合过（例如外部脚本直接写入的日期），没有可增量的基础
+            full = cursor.execute('SELECT 1 FROM actor_daily_stats WHERE date = ? LIMIT 1',
+                                  (date,)).fetchone() is None
+
+        if not full and cursor.execute('SELECT 1 FROM actor_dirty WHERE date = ? LIMIT 1',
+                                       (date,)).fetchone() is None:
+            return 0
 
         # 聚合计算每个演员在指定日期的总点赞数、总观看数和视频数量
-        cursor.execute('''
+        source, params = _stats_on_date(conn, db_path, date)
+        cursor.execute(f'''
             INSERT INTO actor_daily_stats (actor_id, date, total_views, total_likes, video_count)
-            SELECT
-                va.actor_id,
-                ? as date,
-                SUM(ds.views) as total_views,
-                SUM(ds.likes) as total_likes,
-                COUNT(DISTINCT ds.video_id) as video_count
-            FROM video_actors va
-            JOIN daily_stats ds ON va.video_id = ds.video_id
-            WHERE ds.date = ?
-            GROUP BY va.actor_id
+            {_aggregate_actors_sql(source, dirty_only=not full)}
             ON CONFLICT(actor_id, date) DO UPDATE SET
                 total_views = excluded.total_views,
                 total_likes = excluded.total_likes,
                 video_count = excluded.video_count
-        ''', (date, date))
+        ''', [date] + params + ([] if full else [date]))
+        updated = cursor.rowcount
+
+        cursor.execute('DELETE FROM actor_dirty WHERE date = ?', (date,))
+
+        # 增长榜只保留最近的日期，补录更早的历史时不必重算
+        cutoff = (datetime.now() - timedelta(days=GROWTH_RETENTION_DAYS)).strftime('%Y-%m-%d')
+        if date >= cutoff:
+            _update_actor_growth(conn, db_path, date)
+
+        return updated
+
+
+def update_dirty_actor_stats(db_path: str = DEFAULT_DB_PATH) -> int:
+    """
+    重算所有待重算的 (演员, 日期)，例如补充演员信息后影响到的历史日期
+
+    Args:
+        db_path: 数据库路径
+
+    Returns:
+        重算的演员数（按日期累计）
+    """
+    with get_db_connection(db_path) as conn:
+        _ensure_derived_tables(conn, db_path)
+        dates = [row[0] for row in conn.execute('SELECT DISTINCT date FROM actor_dirty ORDER BY date')]
+
+    return sum(update_actor_daily_stats(date, db_path) for date in dates)
+
+
+def verify_actor_daily_stats(date: str, db_path: str = DEFAULT_DB_PATH) -> List[Dict]:
+    """
+    用全量聚合校验某天的演员统计（增量维护的结果应与全量重算一致）
+
+    Args:
+        date: 日期 (YYYY-MM-DD)
+        db_path: 数据库路径
+
+    Returns:
+        不一致的演员列表，每项包含 {actor_id, expected, stored}；一致时为空列表
+    """
+    with get_db_connection(db_path) as conn:
+        source, params = _stats_on_date(conn, db_path, date)
+        expected = {row[0]: tuple(row[2:]) for row in conn.execute(
+            _aggregate_actors_sql(source, dirty_only=False), [date] + params)}
+        stored = {row[0]: tuple(row[1:]) for row in conn.execute('''
+            SELECT actor_id, total_views, total_likes, video_count FROM actor_daily_stats WHERE date = ?
+        ''', (date,))}
+
+    return [{'actor_id': actor_id, 'expected': expected.get(actor_id), 'stored': stored.get(actor_id)}
+            for actor_id in sorted(set(expected) | set(stored))
+            if expected.get(actor_id) != stored.get(actor_id)]
+
+
+# ==================== 增长榜（入库时维护） ====================
+# video_growth / actor_growth 在写入每日统计时同步更新，保存每个视频（演员）在当天相对
+# 1 / 7 / 30 天前的点赞增长，并按 (date, growth DESC) 建索引：
+# 榜单查询是一次索引范围扫描，不再对两天的全部数据做自关联再排序
+
+# 预先计算的增长窗口（天）
+GROWTH_WINDOWS = (1, 7, 30)
+
+# 增长表只保留最近的天数，更早的日期查询时回退到自关联计算
+GROWTH_RETENTION_DAYS = 90
+
+# 每次 IN 查询的视频 ID 数（低于 SQLite 的参数个数上限）
+_IN_CHUNK = 500
+
+_growth_tables: Dict[str, bool] = {}
+_derived_tables: Dict[str, bool] = {}
+
+# 紧凑布局下 daily_stats 还原视图的写入触发器：外部脚本通过视图写入时，
+# 和 _upsert_daily_stats 一样作废受影响的增长行（当天行数对不上时榜单退回按原始数据计算）、
+# 标记待重算的演员、记录写入日期
+STATS_VIEW_TRIGGER = f'''CREATE TRIGGER daily_stats_insert INSTEAD OF INSERT ON daily_stats
+BEGIN
+    INSERT OR IGNORE INTO video_keys (video_id) VALUES (NEW.video_id);
+    INSERT INTO stats_compact (vid, day, views, likes, rank)
+        SELECT vid, CAST(julianday(NEW.date) - {EPOCH_JULIAN_DAY} AS INTEGER),
+               NEW.views, NEW.likes, NEW.rank
+        FROM video_keys WHERE video_id = NEW.video_id
+        ON CONFLICT(vid, day) DO UPDATE SET
+            views = excluded.views,
+            likes = excluded.likes,
+            rank = excluded.rank;
+    DELETE FROM video_growth
+        WHERE video_id = NEW.video_id
+          AND date IN (NEW.date{''.join(f", date(NEW.date, '+{w} days')" for w in GROWTH_WINDOWS)});
+    INSERT OR IGNORE INTO actor_dirty (date, actor_id)
+        SELECT NEW.date, actor_id FROM video_actors WHERE video_id = NEW.video_id;
+    INSERT INTO stats_changes (day, seq)
+        VALUES (CAST(julianday(NEW.date) - {EPOCH_JULIAN_DAY} AS INTEGER),
+                (SELECT COALESCE(MAX(seq), 0) + 1 FROM stats_changes))
+        ON CONFLICT(day) DO UPDATE SET seq = excluded.seq;
+END'''
+
+
+def _ensure_derived_tables(conn: sqlite3.Connection, db_path: str) -> None:
+    """创建入库时维护的派生表：增长榜和待重算演员（旧数据库首次写入时自动创建）"""
+    key = os.path.abspath(db_path)
+    if _derived_tables.get(key):
+        return
+
+    # 每日统计的写入日志：每个日期最后一次写入的序号（包括补录的历史日期）
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS stats_changes (
+            day INTEGER PRIMARY KEY,
+            seq INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_stats_changes_seq ON stats_changes(seq)')
+
+    # 每日统计或演员关联变化后，需要重新聚合的 (演员, 日期)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS actor_dirty (
+            date TEXT NOT NULL,
+            actor_id TEXT NOT NULL,
+            PRIMARY KEY (date, actor_id)
+        ) WITHOUT ROWID
+    ''')
+
+    windows = ', '.join(f'growth_{w}d INTEGER NOT NULL' for w in GROWTH_WINDOWS)
+    for table, id_column, likes_column in (('video_growth', 'video_id', 'likes'),
+                                           ('actor_growth', 'actor_id', 'total_likes')):
+        conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                date TEXT NOT NULL,
+                {id_column} TEXT NOT NULL,
+                {likes_column} INTEGER NOT NULL,
+                {windows},
+                PRIMARY KEY (date, {id_column})
+            ) WITHOUT ROWID
+        ''')
+        for w in GROWTH_WINDOWS:
+            conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_{w}d ON {table}(date, growth_{w}d DESC)')
+    if is_compact_layout(conn, db_path):
+        _ensure_stats_view_trigger(conn)
+    _derived_tables[key] = True
+    _growth_tables[key] = True
+
+
+def _ensure_stats_view_trigger(conn: sqlite3.Connection) -> None:
+    """安装（或升级旧版本的）还原视图写入触发器，依赖的派生表必须已经存在"""
+    row = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = 'daily_stats_insert'").fetchone()
+    if row is None or row[0] != STATS_VIEW_TRIGGER:
+        conn.execute('DROP TRIGGER IF EXISTS daily_stats_insert')
+        conn.execute(STATS_VIEW_TRIGGER)
+
+
+def _has_growth_tables(conn: sqlite3.Connection, db_path: str) -> bool:
+    key = os.path.abspath(db_path)
+    if key not in _growth_tables:
+        row = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'video_growth'").fetchone()
+        _growth_tables[key] = row is not None
+    return _growth_tables[key]
+
+
+def _growth_window(date: str, prev_date: str) -> Optional[int]:
+    """两个日期的间隔正好是预先计算的窗口时返回窗口天数"""
+    window = date_to_day(date) - date_to_day(prev_date)
+    return window if window in GROWTH_WINDOWS else None
+
+
+def _load_likes(conn: sqlite3.Connection, db_path: str, video_ids: List[str],
+                days: List[int]) -> Dict[Tuple[str, int], int]:
+    """读取若干视频在若干天的点赞数 {(video_id, day): likes}"""
+    likes = {}
+    day_params = ','.join('?' * len(days))
+    compact = is_compact_layout(conn, db_path)
+    date_values = days if compact else [day_to_date(day) for day in days]
+
+    for start in range(0, len(video_ids), _IN_CHUNK):
+        chunk = video_ids[start:start + _IN_CHUNK]
+        id_params = ','.join('?' * len(chunk))
+        if compact:
+            cursor = conn.execute(f'''
+                SELECT k.video_id, s.day, s.likes
+                FROM video_keys k JOIN stats_compact s ON s.vid = k.vid
+                WHERE k.video_id IN ({id_params}) AND s.day IN ({day_params})
+            ''', chunk + date_values)
+            likes.update(((row[0], row[1]), row[2]) for row in cursor)
+        else:
+            cursor = conn.execute(f'''
+                SELECT video_id, date, likes FROM daily_stats
+                WHERE video_id IN ({id_params}) AND date IN ({day_params})
+            ''', chunk + date_values)
+            likes.update(((row[0], date_to_day(row[1])), row[2]) for row in cursor)
+    return likes
+
+
+def _update_video_growth(conn: sqlite3.Connection, db_path: str, video_ids: set, dates: set) -> None:
+    """
+    重新计算受影响视频的增长：写入日期当天，以及以写入日期为基准的后续日期
+    （补录历史数据时，后面 1 / 7 / 30 天的增长也会变化）
+    """
+    _ensure_derived_tables(conn, db_path)
+    video_ids = list(video_ids)
+    written_days = {date_to_day(date) for date in dates}
+    targets = sorted({day + offset for day in written_days for offset in (0,) + GROWTH_WINDOWS})
+    needed = sorted({target - offset for target in targets for offset in (0,) + GROWTH_WINDOWS})
+    likes = _load_likes(conn, db_path, video_ids, needed)
+
+    rows = []
+    for video_id in video_ids:
+        for target in targets:
+            current = likes.get((video_id, target))
+            if current is None:
+                continue
+            rows.append((day_to_date(target), video_id, current)
+                        + tuple(current - likes.get((video_id, target - w), 0) for w in GROWTH_WINDOWS))
+
+    columns = ', '.join(f'growth_{w}d' for w in GROWTH_WINDOWS)
+    conn.executemany(f'''
+        INSERT OR REPLACE INTO video_growth (date, video_id, likes, {columns})
+        VALUES (?, ?, ?, {', '.join('?' * len(GROWTH_WINDOWS))})
+    ''', rows)
+
+
+def _update_actor_growth(conn: sqlite3.Connection, db_path: str, date: str) -> None:
+    """重新计算演员在 date 当天（以及以 date 为基准的后续日期）的增长"""
+    _ensure_derived_tables(conn, db_path)
+    columns = ', '.join(f'growth_{w}d' for w in GROWTH_WINDOWS)
+    growth_exprs = ', '.join(f'today.total_likes - COALESCE(p{w}.total_likes, 0)' for w in GROWTH_WINDOWS)
+    joins = '\n'.join(f'LEFT JOIN actor_daily_stats p{w} ON p{w}.actor_id = today.actor_id AND p{w}.date = ?'
+                      for w in GROWTH_WINDOWS)
+
+    day = date_to_day(date)
+    for target in sorted({day + offset for offset in (0,) + GROWTH_WINDOWS}):
+        target_date = day_to_date(target)
+        conn.execute('DELETE FROM actor_growth WHERE date = ?', (target_date,))
+        conn.execute(f'''
+            INSERT INTO actor_growth (date, actor_id, total_likes, {columns})
+            SELECT today.date, today.actor_id, today.total_likes, {growth_exprs}
+            FROM actor_daily_stats today
+            {joins}
+            WHERE today.date = ?
+        ''', [day_to_date(target - w) for w in GROWTH_WINDOWS] + [target_date])
+
+
+def prune_growth_tables(keep_days: int = GROWTH_RETENTION_DAYS, db_path: str = DEFAULT_DB_PATH) -> None:
+    """
+    删除超过保留天数的增长数据
+
+    Args:
+        keep_days: 保留天数
+        db_path: 数据库路径
+    """
+    cutoff = (datetime.now() - timedelta(days=keep_days)).strftime('%Y-%m-%d')
+    with get_db_connection(db_path) as conn:
+        _ensure_derived_tables(conn, db_path)
+        conn.execute('DELETE FROM video_growth WHERE date < ?', (cutoff,))
+        conn.execute('DELETE FROM actor_growth WHERE date < ?', (cutoff,))
+
+
+def rebuild_growth(date: str, db_path: str = DEFAULT_DB_PATH) -> None:
+    """
+    按每日统计重新计算某天的增长（用于旧数据补算，或外部脚本绕过本模块直接写入之后）
+
+    Args:
+        date: 日期 (YYYY-MM-DD)
+        db_path: 数据库路径
+    """
+    with get_db_connection(db_path) as conn:
+        source, params = _stats_on_date(conn, db_path, date)
+        video_ids = [row[0] for row in conn.execute(f'SELECT video_id FROM {source}', params)]
+        _ensure_derived_tables(conn, db_path)
+        conn.execute('DELETE FROM video_growth WHERE date = ?', (date,))
+        _update_video_growth(conn, db_path, set(video_ids), {date})
+        _update_actor_growth(conn, db_path, date)
 
 
 # ==================== 查询操作 ====================
@@ -314,14 +1119,14 @@ def get_top_videos_by_likes(date: str, limit: int = 200,
     """
     with get_db_connection(db_path) as conn:
         cursor = conn.cursor()
-        cursor.execute('''
+        source, params = _stats_on_date(conn, db_path, date)
+        cursor.execute(f'''
             SELECT v.video_id, v.title, ds.views, ds.likes
-            FROM daily_stats ds
+            FROM {source} ds
             JOIN videos v ON ds.video_id = v.video_id
-            WHERE ds.date = ?
             ORDER BY ds.likes DESC
             LIMIT ?
-        ''', (date, limit))
+        ''', params + [limit])
 
         return [dict(row) for row in cursor.fetchall()]
 
@@ -348,6 +1153,67 @@ def get_videos_without_actors(db_path: str = DEFAULT_DB_PATH) -> List[str]:
         return [row['video_id'] for row in cursor.fetchall()]
 
 
+def get_videos_with_actors(video_ids: List[str], db_path: str = DEFAULT_DB_PATH) -> set:
+    """
+    在给定视频中找出已经有演员信息的视频
+
+    Args:
+        video_ids: 视频 ID 列表
+        db_path: 数据库路径
+
+    Returns:
+        已有演员关联的视频 ID 集合
+    """
+    found = set()
+    with get_db_connection(db_path) as conn:
+        for start in range(0, len(video_ids), _IN_CHUNK):
+            chunk = video_ids[start:start + _IN_CHUNK]
+            found.update(row[0] for row in conn.execute(
+                f"SELECT DISTINCT video_id FROM video_actors WHERE video_id IN ({','.join('?' * len(chunk))})",
+                chunk))
+    return found
+
+
+# 确认没有演员信息的视频在这段时间内不再抓取详情页（天）
+ACTORS_RECHECK_DAYS = 30
+
+
+def mark_actors_checked(video_ids: List[str], date: str, db_path: str = DEFAULT_DB_PATH) -> None:
+    """
+    记录视频已抓取过详情页但没有演员信息
+
+    Args:
+        video_ids: 视频 ID 列表
+        date: 日期 (YYYY-MM-DD)
+        db_path: 数据库路径
+    """
+    with get_db_connection(db_path) as conn:
+        conn.executemany('UPDATE videos SET actors_checked_date = ? WHERE video_id = ?',
+                         [(date, video_id) for video_id in video_ids])
+
+
+def get_videos_checked_without_actors(video_ids: List[str], db_path: str = DEFAULT_DB_PATH) -> set:
+    """
+    在给定视频中找出最近 ACTORS_RECHECK_DAYS 天内确认过没有演员信息的视频
+
+    Args:
+        video_ids: 视频 ID 列表
+        db_path: 数据库路径
+
+    Returns:
+        视频 ID 集合
+    """
+    cutoff = (datetime.now() - timedelta(days=ACTORS_RECHECK_DAYS)).strftime('%Y-%m-%d')
+    found = set()
+    with get_db_connection(db_path) as conn:
+        for start in range(0, len(video_ids), _IN_CHUNK):
+            chunk = video_ids[start:start + _IN_CHUNK]
+            found.update(row[0] for row in conn.execute(
+                f"SELECT video_id FROM videos WHERE actors_checked_date >= ? "
+                f"AND video_id IN ({','.join('?' * len(chunk))})", [cutoff] + chunk))
+    return found
+
+
 def get_likes_growth(date: str, prev_date: str, limit: int = 50,
                     db_path: str = DEFAULT_DB_PATH) -> List[Dict]:
     """
@@ -364,22 +1230,43 @@ def get_likes_growth(date: str, prev_date: str, limit: int = 50,
     """
     with get_db_connection(db_path) as conn:
         cursor = conn.cursor()
-        cursor.execute('''
+
+        # 间隔是 1 / 7 / 30 天且当天的增长数据完整时，直接按索引读增长表
+        window = _growth_window(date, prev_date)
+        if window and _has_growth_tables(conn, db_path):
+            growth_count = cursor.execute('SELECT COUNT(*) FROM video_growth WHERE date = ?', (date,)).fetchone()[0]
+            if growth_count and growth_count == count_daily_stats(date, db_path):
+                cursor.execute(f'''
+                    SELECT
+                        v.video_id,
+                        v.title,
+                        g.likes as today_likes,
+                        g.likes - g.growth_{window}d as yesterday_likes,
+                        g.growth_{window}d as growth
+                    FROM video_growth g
+                    JOIN videos v ON g.video_id = v.video_id
+                    WHERE g.date = ?
+                    ORDER BY g.growth_{window}d DESC
+                    LIMIT ?
+                ''', (date, limit))
+                return [dict(row) for row in cursor.fetchall()]
+
+        today_source, today_params = _stats_on_date(conn, db_path, date)
+        prev_source, prev_params = _stats_on_date(conn, db_path, prev_date, with_video_id=False)
+        cursor.execute(f'''
             SELECT
                 v.video_id,
                 v.title,
                 today.likes as today_likes,
                 COALESCE(yesterday.likes, 0) as yesterday_likes,
                 (today.likes - COALESCE(yesterday.likes, 0)) as growth
-            FROM daily_stats today
+            FROM {today_source} today
             JOIN videos v ON today.video_id = v.video_id
-            LEFT JOIN daily_stats yesterday
-                ON today.video_id = yesterday.video_id
-                AND yesterday.date = ?
-            WHERE today.date = ?
+            LEFT JOIN {prev_source} yesterday
+                ON today.key = yesterday.key
             ORDER BY growth DESC
             LIMIT ?
-        ''', (prev_date, date, limit))
+        ''', today_params + prev_params + [limit])
 
         return [dict(row) for row in cursor.fetchall()]
 
@@ -400,6 +1287,29 @@ def get_actor_likes_growth(date: str, prev_date: str, limit: int = 50,
     """
     with get_db_connection(db_path) as conn:
         cursor = conn.cursor()
+
+        # 间隔是 1 / 7 / 30 天且当天的增长数据完整时，直接按索引读增长表
+        window = _growth_window(date, prev_date)
+        if window and _has_growth_tables(conn, db_path):
+            growth_count = cursor.execute('SELECT COUNT(*) FROM actor_growth WHERE date = ?', (date,)).fetchone()[0]
+            actor_count = cursor.execute('SELECT COUNT(*) FROM actor_daily_stats WHERE date = ?',
+                                         (date,)).fetchone()[0]
+            if growth_count and growth_count == actor_count:
+                cursor.execute(f'''
+                    SELECT
+                        a.actor_id,
+                        a.actor_name,
+                        g.total_likes as today_likes,
+                        g.total_likes - g.growth_{window}d as yesterday_likes,
+                        g.growth_{window}d as growth
+                    FROM actor_growth g
+                    JOIN actors a ON g.actor_id = a.actor_id
+                    WHERE g.date = ?
+                    ORDER BY g.growth_{window}d DESC
+                    LIMIT ?
+                ''', (date, limit))
+                return [dict(row) for row in cursor.fetchall()]
+
         cursor.execute('''
             SELECT
                 a.actor_id,
@@ -420,6 +1330,105 @@ def get_actor_likes_growth(date: str, prev_date: str, limit: int = 50,
         return [dict(row) for row in cursor.fetchall()]
 
 
+def get_stats_day_range(db_path: str = DEFAULT_DB_PATH) -> Optional[Tuple[int, int]]:
+    """
+    每日统计覆盖的整数天范围
+
+    Args:
+        db_path: 数据库路径
+
+    Returns:
+        (第一天, 最后一天)，没有数据时返回 None
+    """
+    with get_db_connection(db_path) as conn:
+        if is_compact_layout(conn, db_path):
+            first, last = conn.execute('SELECT MIN(day), MAX(day) FROM stats_compact').fetchone()
+            return None if first is None else (first, last)
+        first, last = conn.execute('SELECT MIN(date), MAX(date) FROM daily_stats').fetchone()
+        return None if first is None else (date_to_day(first), date_to_day(last))
+
+
+def get_stats_between(start_date: str, end_date: str,
+                      db_path: str = DEFAULT_DB_PATH) -> List[Tuple[str, int, int, int]]:
+    """
+    读取一段日期内（含两端）的全部每日统计，供批量分析使用
+
+    Args:
+        start_date: 开始日期 (YYYY-MM-DD)
+        end_date: 结束日期 (YYYY-MM-DD)
+        db_path: 数据库路径
+
+    Returns:
+        [(video_id, 整数天, views, likes), ...]
+    """
+    with get_db_connection(db_path) as conn:
+        if is_compact_layout(conn, db_path):
+            return conn.execute('''
+                SELECT k.video_id, s.day, s.views, s.likes
+                FROM stats_compact s JOIN video_keys k ON k.vid = s.vid
+                WHERE s.day BETWEEN ? AND ?
+            ''', (date_to_day(start_date), date_to_day(end_date))).fetchall()
+        return conn.execute(f'''
+            SELECT video_id, CAST(julianday(date) - {EPOCH_JULIAN_DAY} AS INTEGER), views, likes
+            FROM daily_stats
+            WHERE date BETWEEN ? AND ?
+        ''', (start_date, end_date)).fetchall()
+
+
+def get_video_actor_links(db_path: str = DEFAULT_DB_PATH) -> List[Tuple[str, str]]:
+    """
+    获取全部视频-演员关联
+
+    Args:
+        db_path: 数据库路径
+
+    Returns:
+        [(video_id, actor_id), ...]
+    """
+    with get_db_connection(db_path) as conn:
+        return conn.execute('SELECT video_id, actor_id FROM video_actors').fetchall()
+
+
+def get_video_titles(video_ids: List[str], db_path: str = DEFAULT_DB_PATH) -> Dict[str, str]:
+    """
+    批量获取视频标题
+
+    Args:
+        video_ids: 视频ID列表
+        db_path: 数据库路径
+
+    Returns:
+        {video_id: title}
+    """
+    titles = {}
+    with get_db_connection(db_path) as conn:
+        for start in range(0, len(video_ids), _IN_CHUNK):
+            chunk = video_ids[start:start + _IN_CHUNK]
+            titles.update(conn.execute(
+                f"SELECT video_id, title FROM videos WHERE video_id IN ({','.join('?' * len(chunk))})", chunk))
+    return titles
+
+
+def get_actor_names(actor_ids: List[str], db_path: str = DEFAULT_DB_PATH) -> Dict[str, str]:
+    """
+    批量获取演员名
+
+    Args:
+        actor_ids: 演员ID列表
+        db_path: 数据库路径
+
+    Returns:
+        {actor_id: actor_name}
+    """
+    names = {}
+    with get_db_connection(db_path) as conn:
+        for start in range(0, len(actor_ids), _IN_CHUNK):
+            chunk = actor_ids[start:start + _IN_CHUNK]
+            names.update(conn.execute(
+                f"SELECT actor_id, actor_name FROM actors WHERE actor_id IN ({','.join('?' * len(chunk))})", chunk))
+    return names
+
+
 def get_database_stats(db_path: str = DEFAULT_DB_PATH) -> Dict:
     """
     获取数据库统计信息
@@ -448,9 +1457,15 @@ def get_database_stats(db_path: str = DEFAULT_DB_PATH) -> Dict:
         stats['videos_with_actors'] = cursor.fetchone()['count']
 
         # 数据日期范围
-        cursor.execute('SELECT MIN(date) as min_date, MAX(date) as max_date FROM daily_stats')
-        row = cursor.fetchone()
-        stats['date_range'] = (row['min_date'], row['max_date'])
+        if is_compact_layout(conn, db_path):
+            cursor.execute('SELECT MIN(day) as min_day, MAX(day) as max_day FROM stats_compact')
+            row = cursor.fetchone()
+            stats['date_range'] = tuple(day_to_date(day) if day is not None else None
+                                        for day in (row['min_day'], row['max_day']))
+        else:
+            cursor.execute('SELECT MIN(date) as min_date, MAX(date) as max_date FROM daily_stats')
+            row = cursor.fetchone()
+            stats['date_range'] = (row['min_date'], row['max_date'])
 
         return stats
 
@@ -492,6 +1507,12 @@ if __name__ == '__main__':
     print("更新演员统计...")
     update_actor_daily_stats(today, test_db)
 
+    # 增量维护：新关联演员后只重算受影响的演员，结果应与全量聚合一致
+    link_video_actor('test-002', 'actor-001', test_db)
+    update_dirty_actor_stats(test_db)
+    mismatches = verify_actor_daily_stats(today, test_db)
+    print(f"增量聚合校验: {'✓ 一致' if not mismatches else mismatches}")
+
     # 查询统计
     print("\n数据库统计:")
     stats = get_database_stats(test_db)
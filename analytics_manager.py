@@ -7,15 +7,22 @@
 import os
 import time
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Sequence
 
 import analytics_db
-import analytics_crawler
-import telegram_notifier
+
+# analytics_crawler（bs4 / Playwright）、telegram_notifier（requests）和 analytics_engine（numpy）
+# 在用到时再导入，只生成榜单的 report 命令不需要加载它们
 
 
 DEFAULT_DB_PATH = './analytics.db'
 
+# "上升最快" 榜单的对比窗口：最近 7 天的增长减去之前 7 天的增长
+RISING_WINDOW = 7
+
+# Telegram 消息里多窗口榜单和上升榜只显示前几名（消息长度有限）
+TELEGRAM_EXTRA_TOP = 10
+
 
 def format_growth_report_for_telegram(report_data: Dict, top_n: int = 50) -> str:
     """
@@ -67,27 +74,75 @@ def format_growth_report_for_telegram(report_data: Dict, top_n: int = 50) -> str
 
     lines.append("```")
 
+    # 多窗口榜单
+    for window, board in report_data.get('window_boards', {}).items():
+        lines.append("")
+        lines.append(f"📈 *{window} 天点赞增长 Top {min(TELEGRAM_EXTRA_TOP, len(board['video_growth']))}*")
+        lines.append("```")
+        for i, video in enumerate(board['video_growth'][:TELEGRAM_EXTRA_TOP], 1):
+            lines.append(f"{i:2}. +{video['growth']:>6,}  👍{video['today_likes']:>7,}  {video['video_id']}")
+        for i, actor in enumerate(board['actor_growth'][:TELEGRAM_EXTRA_TOP], 1):
+            lines.append(f"{i:2}. +{actor['growth']:>7,}  👍{actor['today_likes']:>8,}  {actor['actor_name'][:20]}")
+        lines.append("```")
+
+    # 上升最快
+    rising = report_data.get('rising')
+    if rising and rising['video_growth']:
+        lines.append("")
+        lines.append(f"🚀 *上升最快（近 {rising['window']} 天 vs 前 {rising['window']} 天）*")
+        lines.append("```")
+        for i, video in enumerate(rising['video_growth'][:TELEGRAM_EXTRA_TOP], 1):
+            lines.append(f"{i:2}. +{video['growth']:>6,}  ↑{video['acceleration']:>6,}  {video['video_id']}")
+        lines.append("```")
+
     return '\n'.join(lines)
 
 
+def _enrich_actors(videos: List[Dict], db_path: str, via_models: bool) -> int:
+    """
+    为视频补充演员信息（抓取完成即入库）
+
+    Args:
+        videos: 视频列表，每项包含 {video_id, url}（按点赞数排序）
+        db_path: 数据库路径
+        via_models: 是否优先通过演员列表页批量关联（否则逐个抓取视频详情页）
+
+    Returns:
+        有演员信息的视频数
+    """
+    import analytics_crawler
+
+    if via_models:
+        print("最多请求与缺少演员信息的视频数相同的页面，通常远少于此（一个演员列表页可以关联 24 个视频）\n")
+        return analytics_crawler.crawl_actors_via_models(videos, db_path)['mapped']
+
+    print(f"预计耗时: {analytics_crawler.estimate_actor_crawl_seconds(len(videos)) / 60:.1f} 分钟（已有演员信息的视频会跳过）\n")
+    actors_data = analytics_crawler.crawl_multiple_video_actors(videos, db_path=db_path)
+    return sum(1 for actors in actors_data.values() if actors)
+
+
 def initialize_hot_videos_analysis(db_path: str = DEFAULT_DB_PATH,
                                    max_pages: Optional[int] = None,
-                                   top_n_for_actors: int = 200) -> None:
+                                   top_n_for_actors: int = 200,
+                                   actors_via_models: bool = True) -> None:
     """
     初始化热门影片分析
 
     步骤：
     1. 初始化数据库
-    2. 爬取所有热门页面的视频数据
-    3. 存入数据库
-    4. 爬取 Top N 影片的演员信息
+    2. 爬取所有热门页面的视频数据（每页解析后立即存入数据库）
+    3. 检查入库结果
+    4. 补充 Top N 影片的演员信息（优先通过演员列表页批量关联，剩余的逐个抓取详情页，抓取完成即入库）
     5. 更新演员统计
 
     Args:
         db_path: 数据库路径
         max_pages: 最大爬取页数（None 表示爬取所有页面）
         top_n_for_actors: 爬取演员信息的视频数量（按点赞数排序）
+        actors_via_models: 是否通过演员列表页批量关联演员（False 则逐个抓取视频详情页）
     """
+    import analytics_crawler
+
     print("\n" + "=" * 80)
     print("🚀 开始初始化热门影片分析系统")
     print("=" * 80)
@@ -104,60 +159,41 @@ def initialize_hot_videos_analysis(db_path: str = DEFAULT_DB_PATH,
     if max_pages:
         print(f"⚠️  限制爬取页数: {max_pages}")
 
-    all_videos = analytics_crawler.crawl_all_hot_pages(
+    today = datetime.now().strftime('%Y-%m-%d')
+
+    # 每页解析后立即写入数据库（断点续传不会丢失已爬取的页）
+    analytics_crawler.crawl_all_hot_pages(
         start_page=1,
         end_page=max_pages,
-        page_delay=1.0
+        page_delay=None,  # 自适应节奏
+        task_type='init',
+        db_path=db_path,
+        date=today
     )
 
-    if not all_videos:
-        print("❌ 爬取失败，没有获取到任何视频")
-        return
-
-    # 3. 存入数据库
-    print("\n【步骤 3/5】保存视频数据到数据库")
+    # 3. 确认数据已入库
+    print("\n【步骤 3/5】检查数据库中的视频数据")
     print("-" * 80)
 
-    today = datetime.now().strftime('%Y-%m-%d')
+    saved_count = analytics_db.count_daily_stats(today, db_path)
+    if not saved_count:
+        print("❌ 爬取失败，没有获取到任何视频")
+        return
 
-    # 准备批量插入的数据
-    stats_list = []
-    for rank, video in enumerate(all_videos, 1):
-        stats_list.append({
-            'video_id': video['video_id'],
-            'title': video['title'],
-            'date': today,
-            'views': video['views'],
-            'likes': video['likes'],
-            'rank': rank
-        })
-
-    # 批量插入
-    print(f"正在保存 {len(stats_list):,} 个视频的数据...")
-    analytics_db.bulk_insert_daily_stats(stats_list, db_path)
-    print(f"✓ 完成！共保存 {len(stats_list):,} 个视频")
+    print(f"✓ 爬取过程中已逐页保存，{today} 共 {saved_count:,} 个视频")
 
     # 4. 爬取 Top N 影片的演员信息
     print(f"\n【步骤 4/5】爬取 Top {top_n_for_actors} 影片的演员信息")
     print("-" * 80)
 
     # 按点赞数排序，取前 N 个
-    top_videos = sorted(all_videos, key=lambda x: x['likes'], reverse=True)[:top_n_for_actors]
+    top_videos = [
+        {**video, 'url': f"https://jable.tv/videos/{video['video_id']}/"}
+        for video in analytics_db.get_top_videos_by_likes(today, top_n_for_actors, db_path)
+    ]
 
     print(f"选出点赞数前 {len(top_videos)} 个视频")
-    print(f"预计耗时: {len(top_videos) * 2.5 / 60:.1f} 分钟\n")
-
-    # 爬取演员信息
-    actors_data = analytics_crawler.crawl_multiple_video_actors(top_videos, delay=2.0)
-
-    # 保存演员信息到数据库
-    print("\n正在保存演员信息到数据库...")
-    saved_count = 0
-
-    for video_id, actors in actors_data.items():
-        if actors:
-            analytics_db.bulk_insert_video_actors(video_id, actors, db_path)
-            saved_count += 1
+    saved_count = _enrich_actors(top_videos, db_path, actors_via_models)
 
     print(f"✓ 完成！共为 {saved_count} 个视频保存了演员信息")
 
@@ -165,7 +201,8 @@ def initialize_hot_videos_analysis(db_path: str = DEFAULT_DB_PATH,
     print(f"\n【步骤 5/5】更新演员每日统计")
     print("-" * 80)
 
-    analytics_db.update_actor_daily_stats(today, db_path)
+    analytics_db.update_actor_daily_stats(today, db_path, full=True)
+    analytics_db.update_dirty_actor_stats(db_path)
     print(f"✓ 完成！已更新演员每日统计")
 
     # 显示统计信息
@@ -183,22 +220,26 @@ def initialize_hot_videos_analysis(db_path: str = DEFAULT_DB_PATH,
 
 def daily_update_hot_videos(db_path: str = DEFAULT_DB_PATH,
                             max_pages: Optional[int] = None,
-                            top_n_for_new_actors: int = 200) -> None:
+                            top_n_for_new_actors: int = 200,
+                            actors_via_models: bool = True) -> None:
     """
     每日更新热门影片数据
 
     步骤：
-    1. 爬取所有热门页面的视频数据（只更新观看数和点赞数）
-    2. 存入数据库
+    1. 爬取所有热门页面的视频数据（只更新观看数和点赞数，每页解析后立即存入数据库）
+    2. 检查入库结果
     3. 检查是否有新进 Top N 的影片
-    4. 如果有，爬取其演员信息
+    4. 如果有，补充其演员信息（优先通过演员列表页批量关联，抓取完成即入库）
     5. 更新演员统计
 
     Args:
         db_path: 数据库路径
         max_pages: 最大爬取页数（None 表示爬取所有页面）
         top_n_for_new_actors: 检查新进榜的视频数量阈值
+        actors_via_models: 是否通过演员列表页批量关联演员（False 则逐个抓取视频详情页）
     """
+    import analytics_crawler
+
     print("\n" + "=" * 80)
     print("📅 开始每日更新热门影片数据")
     print("=" * 80)
@@ -212,35 +253,29 @@ def daily_update_hot_videos(db_path: str = DEFAULT_DB_PATH,
     if max_pages:
         print(f"⚠️  限制爬取页数: {max_pages}")
 
-    all_videos = analytics_crawler.crawl_all_hot_pages(
+    # 确保旧数据库也有页面日志表
+    analytics_db.init_database(db_path)
+
+    # 每页解析后立即写入数据库（断点续传不会丢失已爬取的页）
+    analytics_crawler.crawl_all_hot_pages(
         start_page=1,
         end_page=max_pages,
-        page_delay=1.0
+        page_delay=None,  # 自适应节奏
+        task_type='update',
+        db_path=db_path,
+        date=today
     )
 
-    if not all_videos:
+    # 2. 确认数据已入库
+    print("\n【步骤 2/4】检查数据库中的视频数据")
+    print("-" * 80)
+
+    saved_count = analytics_db.count_daily_stats(today, db_path)
+    if not saved_count:
         print("❌ 爬取失败，没有获取到任何视频")
         return
 
-    # 2. 存入数据库
-    print("\n【步骤 2/4】更新数据库")
-    print("-" * 80)
-
-    # 准备批量插入的数据
-    stats_list = []
-    for rank, video in enumerate(all_videos, 1):
-        stats_list.append({
-            'video_id': video['video_id'],
-            'title': video['title'],
-            'date': today,
-            'views': video['views'],
-            'likes': video['likes'],
-            'rank': rank
-        })
-
-    print(f"正在更新 {len(stats_list):,} 个视频的数据...")
-    analytics_db.bulk_insert_daily_stats(stats_list, db_path)
-    print(f"✓ 完成！")
+    print(f"✓ 爬取过程中已逐页保存，{today} 共 {saved_count:,} 个视频")
 
     # 3. 检查是否有新进 Top N 的影片（没有演员信息）
     print(f"\n【步骤 3/4】检查新进 Top {top_n_for_new_actors} 的影片")
@@ -248,36 +283,24 @@ def daily_update_hot_videos(db_path: str = DEFAULT_DB_PATH,
 
     # 获取点赞数前 N 的视频
     top_videos_db = analytics_db.get_top_videos_by_likes(today, top_n_for_new_actors, db_path)
-    top_video_ids = {v['video_id'] for v in top_videos_db}
+    top_video_ids = [v['video_id'] for v in top_videos_db]
 
-    # 获取没有演员信息的视频
-    videos_without_actors = set(analytics_db.get_videos_without_actors(db_path))
-
-    # 找出需要补充演员信息的视频（在 Top N 且没有演员信息）
-    need_actors = top_video_ids & videos_without_actors
+    # 找出需要补充演员信息的视频（在 Top N 且没有演员信息，按点赞数顺序；最近确认过没有演员的不再抓取）
+    with_actors = (analytics_db.get_videos_with_actors(top_video_ids, db_path)
+                   | analytics_db.get_videos_checked_without_actors(top_video_ids, db_path))
+    need_actors = [vid for vid in top_video_ids if vid not in with_actors]
 
     if need_actors:
         print(f"发现 {len(need_actors)} 个新进 Top {top_n_for_new_actors} 的视频需要补充演员信息")
 
-        # 准备爬取演员信息
+        # 准备爬取演员信息（走演员列表页时传入整个 Top N：已关联视频的演员决定列表页的抓取顺序，
+        # 两种方式都会跳过已有演员信息的视频）
         videos_to_crawl = [
             {'video_id': vid, 'url': f'https://jable.tv/videos/{vid}/'}
-            for vid in need_actors
+            for vid in (top_video_ids if actors_via_models else need_actors)
         ]
 
-        print(f"预计耗时: {len(videos_to_crawl) * 2.5 / 60:.1f} 分钟\n")
-
-        # 爬取演员信息
-        actors_data = analytics_crawler.crawl_multiple_video_actors(videos_to_crawl, delay=2.0)
-
-        # 保存到数据库
-        print("\n正在保存演员信息到数据库...")
-        saved_count = 0
-
-        for video_id, actors in actors_data.items():
-            if actors:
-                analytics_db.bulk_insert_video_actors(video_id, actors, db_path)
-                saved_count += 1
+        saved_count = _enrich_actors(videos_to_crawl, db_path, actors_via_models)
 
         print(f"✓ 完成！共为 {saved_count} 个视频保存了演员信息")
     else:
@@ -287,7 +310,10 @@ def daily_update_hot_videos(db_path: str = DEFAULT_DB_PATH,
     print(f"\n【步骤 4/4】更新演员每日统计")
     print("-" * 80)
 
+    # 只重算今天有变化的演员；新补充的演员关联会连带重算对应视频的历史日期
     analytics_db.update_actor_daily_stats(today, db_path)
+    analytics_db.update_dirty_actor_stats(db_path)
+    analytics_db.prune_growth_tables(db_path=db_path)
     print(f"✓ 完成！")
 
     # 显示统计信息
@@ -306,7 +332,9 @@ def daily_update_hot_videos(db_path: str = DEFAULT_DB_PATH,
 def send_growth_report_to_telegram(date: Optional[str] = None,
                                   prev_date: Optional[str] = None,
                                   top_n: int = 50,
-                                  db_path: str = DEFAULT_DB_PATH) -> bool:
+                                  db_path: str = DEFAULT_DB_PATH,
+                                  windows: Sequence[int] = (),
+                                  rising: bool = False) -> bool:
     """
     生成增量榜单并发送到 Telegram
 
@@ -315,12 +343,16 @@ def send_growth_report_to_telegram(date: Optional[str] = None,
         prev_date: 前一天日期 (YYYY-MM-DD)，None 表示昨天
         top_n: 榜单数量
         db_path: 数据库路径
+        windows: 额外的多天窗口榜单，例如 (7, 30)
+        rising: 是否附带上升最快榜单
 
     Returns:
         是否发送成功
     """
+    import telegram_notifier
+
     # 生成榜单
-    report_data = generate_growth_report(date, prev_date, top_n, db_path)
+    report_data = generate_growth_report(date, prev_date, top_n, db_path, windows, rising)
 
     # 格式化为 Telegram 消息
     message = format_growth_report_for_telegram(report_data, top_n)
@@ -340,21 +372,51 @@ def send_growth_report_to_telegram(date: Optional[str] = None,
     return success
 
 
+def _print_window_board(video_growth: List[Dict], actor_growth: List[Dict], prev_label: str) -> None:
+    """打印多窗口 / 上升榜单的前 10 名"""
+    if not video_growth:
+        print("  暂无数据")
+        return
+
+    print(f"\n排名  视频ID            当前点赞  {prev_label:>10}      增长    加速度")
+    print("-" * 80)
+    for i, video in enumerate(video_growth[:10], 1):
+        acceleration = video.get('acceleration')
+        acceleration = f"{acceleration:>+8,}" if acceleration is not None else f"{'-':>8}"
+        print(f"{i:<5} {video['video_id']:<15} {video['today_likes']:>10,}  {video['yesterday_likes']:>10,}  "
+              f"+{video['growth']:>8,}  {acceleration}")
+
+    if actor_growth:
+        print(f"\n排名  演员名                当前点赞  {prev_label:>10}      增长")
+        print("-" * 80)
+        for i, actor in enumerate(actor_growth[:10], 1):
+            print(f"{i:<5} {actor['actor_name']:<20} {actor['today_likes']:>10,}  {actor['yesterday_likes']:>10,}  "
+                  f"+{actor['growth']:>8,}")
+
+
 def generate_growth_report(date: Optional[str] = None,
                           prev_date: Optional[str] = None,
                           top_n: int = 50,
-                          db_path: str = DEFAULT_DB_PATH) -> Dict:
+                          db_path: str = DEFAULT_DB_PATH,
+                          windows: Sequence[int] = (),
+                          rising: bool = False) -> Dict:
     """
     生成增量榜单
 
+    多窗口榜单和上升榜单由 analytics_engine（numpy 列式计算）生成；
+    未安装 numpy 时多窗口榜单退回 SQL 查询，上升榜单跳过
+
     Args:
         date: 当前日期 (YYYY-MM-DD)，None 表示今天
         prev_date: 前一天日期 (YYYY-MM-DD)，None 表示昨天
         top_n: 榜单数量
         db_path: 数据库路径
+        windows: 额外的多天窗口榜单，例如 (7, 30)
+        rising: 是否生成上升最快榜单（近 RISING_WINDOW 天的增长比之前同样天数多得最多）
 
     Returns:
-        榜单数据 {video_growth: [...], actor_growth: [...]}
+        榜单数据 {video_growth: [...], actor_growth: [...],
+                  window_boards: {天数: {video_growth, actor_growth}}, rising: {window, video_growth, actor_growth}}
     """
     if date is None:
         date = datetime.now().strftime('%Y-%m-%d')
@@ -399,13 +461,51 @@ def generate_growth_report(date: Optional[str] = None,
     else:
         print("  暂无数据")
 
+    # 多窗口榜单 / 上升榜单
+    window_boards = {}
+    rising_board = None
+    engine = None
+    if windows or rising:
+        import analytics_engine
+        engine = analytics_engine.load_engine(db_path)
+        if engine is None:
+            print("\n⚠️  未安装 numpy，多窗口榜单使用 SQL 查询（pip install numpy 可启用分析引擎）")
+
+    for window in windows:
+        print(f"\n【{window} 天点赞增长榜】")
+        if engine is not None:
+            window_videos = engine.video_board(date, window, top_n)
+            window_actors = engine.actor_board(date, window, top_n)
+        else:
+            window_prev = (datetime.strptime(date, '%Y-%m-%d') - timedelta(days=window)).strftime('%Y-%m-%d')
+            window_videos = analytics_db.get_likes_growth(date, window_prev, top_n, db_path)
+            window_actors = analytics_db.get_actor_likes_growth(date, window_prev, top_n, db_path)
+
+        window_boards[window] = {'video_growth': window_videos, 'actor_growth': window_actors}
+        _print_window_board(window_videos, window_actors, f"{window}天前点赞")
+
+    if rising:
+        print(f"\n【上升最快榜（近 {RISING_WINDOW} 天 vs 前 {RISING_WINDOW} 天）】")
+        if engine is not None:
+            rising_board = {
+                'window': RISING_WINDOW,
+                'video_growth': engine.video_board(date, RISING_WINDOW, top_n, sort='acceleration'),
+                'actor_growth': engine.actor_board(date, RISING_WINDOW, top_n, sort='acceleration'),
+            }
+            _print_window_board(rising_board['video_growth'], rising_board['actor_growth'],
+                                f"{RISING_WINDOW}天前点赞")
+        else:
+            print("  跳过（需要 numpy）")
+
     print("\n" + "=" * 80)
 
     return {
         'date': date,
         'prev_date': prev_date,
         'video_growth': video_growth,
-        'actor_growth': actor_growth
+        'actor_growth': actor_growth,
+        'window_boards': window_boards,
+        'rising': rising_board
     }
 
 
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+分析数据库紧凑布局迁移工具
+
+原始布局的 daily_stats 每行都带 TEXT video_id、TEXT date、自增 id、created_at 和四个索引，
+每天约 3.4 万行，一年几百万行。紧凑布局：
+- video_keys：视频 ID 映射为整数键
+- stats_compact：(vid, day) 聚簇的 WITHOUT ROWID 表，日期存为整数天（1970-01-01 为 0）
+- daily_stats 改为同名还原视图（带 INSTEAD OF INSERT 触发器），外部脚本照常读写
+analytics_db 会自动识别布局，榜单查询直接走 stats_compact 的主键和按天索引
+
+用法：
+    python analytics_migrate.py --db ./analytics.db          # 迁移（迁移前请先备份）
+    python analytics_migrate.py --benchmark --days 730       # 用合成数据比较体积和查询耗时
+    python analytics_migrate.py --rebuild-growth 90          # 补算最近 90 天的增长榜
+    python analytics_migrate.py --self-test                  # 自测：迁移失败时数据库保持原样
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Dict
+
+import analytics_db
+
+COMPACT_SCHEMA = f'''
+    CREATE TABLE IF NOT EXISTS video_keys (
+        vid INTEGER PRIMARY KEY,
+        video_id TEXT NOT NULL UNIQUE
+    );
+
+    CREATE TABLE IF NOT EXISTS stats_compact (
+        vid INTEGER NOT NULL,
+        day INTEGER NOT NULL,
+        views INTEGER NOT NULL DEFAULT 0,
+        likes INTEGER NOT NULL DEFAULT 0,
+        rank INTEGER,
+        PRIMARY KEY (vid, day)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS idx_stats_compact_day ON stats_compact(day);
+
+    CREATE VIEW IF NOT EXISTS daily_stats AS
+        SELECT k.video_id AS video_id,
+               date(s.day + {analytics_db.EPOCH_JULIAN_DAY}) AS date,
+               s.views AS views,
+               s.likes AS likes,
+               s.rank AS rank
+        FROM stats_compact s JOIN video_keys k ON k.vid = s.vid;
+'''
+
+
+def _file_size(db_path: str) -> int:
+    return sum(os.path.getsize(path) for path in (db_path, db_path + '-wal') if os.path.exists(path))
+
+
+def migrate_to_compact(db_path: str = analytics_db.DEFAULT_DB_PATH, vacuum: bool = True) -> Dict:
+    """
+    把 daily_stats 迁移到紧凑布局（单个事务，失败时数据库保持原样）
+
+    Args:
+        db_path: 数据库路径
+        vacuum: 迁移后是否 VACUUM 回收空间
+
+    Returns:
+        {'rows': 迁移行数, 'videos': 视频键数, 'size_before': 字节, 'size_after': 字节}
+    """
+    analytics_db.init_database(db_path)
+    conn = analytics_db.get_connection(db_path)
+    if analytics_db.is_compact_layout(conn, db_path):
+        print("✓ 数据库已是紧凑布局，无需迁移")
+        return {}
+
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    size_before = _file_size(db_path)
+    print(f"正在迁移: {db_path} ({size_before / 1024 / 1024:.1f} MB)")
+    start = time.time()
+
+    with analytics_db.transaction(db_path) as conn:
+        # sqlite3 模块只在 DML 前隐式开启事务，ALTER / CREATE 会各自自动提交；
+        # 显式开启事务，出错时改名和建表也一起回滚
+        conn.execute('BEGIN IMMEDIATE')
+        # 旧表改名后腾出 daily_stats 给还原视图（旧表的索引随表一起删除）
+        conn.execute('ALTER TABLE daily_stats RENAME TO daily_stats_legacy')
+        # executescript 会先提交当前事务，这里逐条执行
+        for statement in _split_statements(COMPACT_SCHEMA):
+            conn.execute(statement)
+        # 视图的写入触发器（同时维护增长表和写入日志）定义在 analytics_db
+        analytics_db._ensure_stats_view_trigger(conn)
+
+        conn.execute('''
+            INSERT OR IGNORE INTO video_keys (video_id)
+            SELECT video_id FROM videos
+            UNION
+            SELECT DISTINCT video_id FROM daily_stats_legacy
+        ''')
+        rows = conn.execute(f'''
+            INSERT INTO stats_compact (vid, day, views, likes, rank)
+            SELECT k.vid, CAST(julianday(d.date) - {analytics_db.EPOCH_JULIAN_DAY} AS INTEGER),
+                   d.views, d.likes, d.rank
+            FROM daily_stats_legacy d JOIN video_keys k ON k.video_id = d.video_id
+            ORDER BY k.vid, d.date
+        ''').rowcount
+        conn.execute('DROP TABLE daily_stats_legacy')
+        videos = conn.execute('SELECT COUNT(*) FROM video_keys').fetchone()[0]
+
+    analytics_db.reset_layout_cache(db_path)
+
+    if vacuum:
+        print("正在回收空间（VACUUM）...")
+        conn = analytics_db.get_connection(db_path)
+        conn.execute('VACUUM')
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+
+    size_after = _file_size(db_path)
+    print(f"✓ 迁移完成: {rows:,} 行统计，{videos:,} 个视频，耗时 {time.time() - start:.1f} 秒")
+    print(f"  体积: {size_before / 1024 / 1024:.1f} MB -> {size_after / 1024 / 1024:.1f} MB")
+    return {'rows': rows, 'videos': videos, 'size_before': size_before, 'size_after': size_after}
+
+
+def _split_statements(script: str):
+    """把建表脚本拆成单条语句（触发器体内的分号不拆）"""
+    statements, current = [], ''
+    for line in script.splitlines(keepends=True):
+        current += line
+        if sqlite3.complete_statement(current):
+            statements.append(current.strip())
+            current = ''
+    return statements
+
+
+def rebuild_growth_history(days: int, db_path: str = analytics_db.DEFAULT_DB_PATH) -> None:
+    """
+    补算最近 days 天的增长榜（旧数据库升级后执行一次）
+
+    Args:
+        days: 天数
+        db_path: 数据库路径
+    """
+    analytics_db.init_database(db_path)
+    start = time.time()
+    for offset in range(days, -1, -1):
+        date = (datetime.now() - timedelta(days=offset)).strftime('%Y-%m-%d')
+        with analytics_db.transaction(db_path):
+            analytics_db.rebuild_growth(date, db_path)
+    print(f"✓ 已补算最近 {days} 天的增长榜，耗时 {time.time() - start:.1f} 秒")
+
+
+def run_self_test() -> None:
+    """自测：迁移中途失败时数据库保持原样，重新迁移后数据一致"""
+    workdir = tempfile.mkdtemp(prefix='analytics_migrate_test_')
+    db_path = os.path.join(workdir, 'test.db')
+    tables = "SELECT type, name FROM sqlite_master WHERE name NOT LIKE 'sqlite_%' ORDER BY name"
+
+    try:
+        fill_synthetic_data(db_path, days=5, videos=50)
+        conn = analytics_db.get_connection(db_path)
+        schema_before = conn.execute(tables).fetchall()
+        rows_before = conn.execute('SELECT video_id, date, views, likes, rank FROM daily_stats '
+                                   'ORDER BY video_id, date').fetchall()
+
+        # 在建好视图之后、搬数据之前注入失败
+        ensure_trigger = analytics_db._ensure_stats_view_trigger
+
+        def failing_trigger(conn):
+            raise RuntimeError('注入的迁移失败')
+
+        analytics_db._ensure_stats_view_trigger = failing_trigger
+        try:
+            migrate_to_compact(db_path, vacuum=False)
+            raise AssertionError('注入的失败没有抛出')
+        except RuntimeError:
+            pass
+        finally:
+            analytics_db._ensure_stats_view_trigger = ensure_trigger
+
+        analytics_db.reset_layout_cache(db_path)
+        conn = analytics_db.get_connection(db_path)
+        assert conn.execute(tables).fetchall() == schema_before, '失败后表结构发生了变化'
+        assert not analytics_db.is_compact_layout(conn, db_path), '失败后被识别为紧凑布局'
+        assert conn.execute('SELECT video_id, date, views, likes, rank FROM daily_stats '
+                            'ORDER BY video_id, date').fetchall() == rows_before, '失败后数据发生了变化'
+        print("✓ 迁移失败时数据库保持原样")
+
+        migrate_to_compact(db_path, vacuum=False)
+        conn = analytics_db.get_connection(db_path)
+        assert analytics_db.is_compact_layout(conn, db_path)
+        assert conn.execute('SELECT video_id, date, views, likes, rank FROM daily_stats '
+                            'ORDER BY video_id, date').fetchall() == rows_before, '迁移后数据不一致'
+        print("✓ 重新迁移后数据一致")
+    finally:
+        analytics_db.close_db_connections()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+# ==================== 合成数据对比 ====================
+
+def fill_synthetic_data(db_path: str, days: int, videos: int, seed: int = 42) -> None:
+    """
+    生成合成数据：每天所有视频一行，观看数和点赞数逐日增长
+
+    Args:
+        db_path: 数据库路径（原始布局）
+        days: 天数
+        videos: 每天的视频数
+        seed: 随机种子
+    """
+    rng = random.Random(seed)
+    start = datetime.now() - timedelta(days=days)
+    video_ids = [f'abc-{index:06d}' for index in range(videos)]
+    views = [rng.randint(1000, 100000) for _ in video_ids]
+    likes = [rng.randint(10, 5000) for _ in video_ids]
+
+    analytics_db.init_database(db_path)
+    with analytics_db.transaction(db_path) as conn:
+        conn.executemany('INSERT OR IGNORE INTO videos (video_id, title, first_seen_date) VALUES (?, ?, ?)',
+                         [(video_id, f'合成视频 {video_id}', start.strftime('%Y-%m-%d')) for video_id in video_ids])
+
+    for day in range(days):
+        date = (start + timedelta(days=day)).strftime('%Y-%m-%d')
+        rows = []
+        for index, video_id in enumerate(video_ids):
+            views[index] += rng.randint(0, 500)
+            likes[index] += rng.randint(0, 30)
+            rows.append((video_id, date, views[index], likes[index], index + 1))
+        with analytics_db.transaction(db_path) as conn:
+            analytics_db._upsert_daily_stats(conn, db_path, rows)
+
+
+def _time_query(func, repeat: int = 5) -> float:
+    """多次执行取最短耗时（毫秒）"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000
+
+
+def run_benchmark(days: int = 730, videos: int = 2000, workdir: str = None) -> None:
+    """
+    在合成数据上比较原始布局和紧凑布局的体积与榜单查询耗时
+
+    Args:
+        days: 天数
+        videos: 每天的视频数
+        workdir: 临时目录（None 则自动创建并在结束后删除）
+    """
+    cleanup = workdir is None
+    workdir = workdir or tempfile.mkdtemp(prefix='analytics_bench_')
+    legacy_db = os.path.join(workdir, 'legacy.db')
+    compact_db = os.path.join(workdir, 'compact.db')
+
+    try:
+        print(f"生成合成数据: {days} 天 × {videos:,} 个视频 = {days * videos:,} 行")
+        start = time.time()
+        fill_synthetic_data(legacy_db, days, videos)
+        analytics_db.get_connection(legacy_db).execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        analytics_db.close_db_connections(legacy_db)
+        print(f"✓ 生成完成，耗时 {time.time() - start:.1f} 秒\n")
+
+        shutil.copy(legacy_db, compact_db)
+        migrate_to_compact(compact_db)
+
+        last_date = (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d')
+        prev_date = (datetime.now() - timedelta(days=2)).strftime('%Y-%m-%d')
+        month_ago = (datetime.now() - timedelta(days=31)).strftime('%Y-%m-%d')
+
+        queries = [
+            ('日增长榜 get_likes_growth', lambda db: analytics_db.get_likes_growth(last_date, prev_date, 50, db)),
+            ('30 天增长榜', lambda db: analytics_db.get_likes_growth(last_date, month_ago, 50, db)),
+            ('当日点赞榜 get_top_videos_by_likes', lambda db: analytics_db.get_top_videos_by_likes(last_date, 200, db)),
+            ('当日行数 count_daily_stats', lambda db: analytics_db.count_daily_stats(last_date, db)),
+        ]
+
+        print("\n" + "=" * 80)
+        print(f"{'':<36} {'原始布局':>14} {'紧凑布局':>14} {'比例':>8}")
+        print("-" * 80)
+        legacy_size, compact_size = _file_size(legacy_db), _file_size(compact_db)
+        print(f"{'文件体积 (MB)':<36} {legacy_size / 1024 / 1024:>14.1f} {compact_size / 1024 / 1024:>14.1f} "
+              f"{compact_size / legacy_size:>8.2f}")
+        for label, query in queries:
+            assert query(legacy_db) == query(compact_db), f"{label} 结果不一致"
+            legacy_ms = _time_query(lambda: query(legacy_db))
+            compact_ms = _time_query(lambda: query(compact_db))
+            print(f"{label + ' (ms)':<36} {legacy_ms:>14.1f} {compact_ms:>14.1f} {compact_ms / legacy_ms:>8.2f}")
+        print("=" * 80)
+        print("✓ 两种布局的查询结果一致")
+    finally:
+        analytics_db.close_db_connections()
+        if cleanup:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="migrate analytics.db to the compact stats layout")
+    parser.add_argument("--db", type=str, default=analytics_db.DEFAULT_DB_PATH,
+                        help="database path (default: ./analytics.db)")
+    parser.add_argument("--no-vacuum", action='store_true',
+                        help="skip VACUUM after migrating")
+    parser.add_argument("--rebuild-growth", type=int, metavar='DAYS', default=None,
+                        help="recompute the growth tables for the last N days instead of migrating")
+    parser.add_argument("--benchmark", action='store_true',
+                        help="compare both layouts on synthetic data instead of migrating")
+    parser.add_argument("--self-test", action='store_true',
+                        help="check that a failed migration leaves the database unchanged")
+    parser.add_argument("--days", type=int, default=730,
+                        help="benchmark: number of days (default: 730)")
+    parser.add_argument("--videos", type=int, default=2000,
+                        help="benchmark: videos per day (default: 2000)")
+    args = parser.parse_args()
+
+    if args.self_test:
+        run_self_test()
+    elif args.benchmark:
+        run_benchmark(args.days, args.videos)
+    elif args.rebuild_growth is not None:
+        rebuild_growth_history(args.rebuild_growth, args.db)
+    else:
+        migrate_to_compact(args.db, vacuum=not args.no_vacuum)
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+离线爬取基准
+在进程内启动本地回放服务器（mock_jable_server.py），把页面获取指向它，
+用真实的爬取路径（后端选择、限速、重试、解析、入库）跑热门页和演员爬取，输出可复现的耗时。
+夹具先用录制模式从线上站点录一次：
+    JABLE_RECORD_FIXTURES=./fixtures python main.py analyze update --db /tmp/record.db
+
+使用：
+    python benchmark_crawl.py --pages 20                          # 热门页 1~20
+    python benchmark_crawl.py --pages 20 --actors 50 --latency 0.5 --jitter 0.3
+    python benchmark_crawl.py --pages 20 --challenge-rate 0.05 --error-rate 0.02 --seed 7 --runs 3
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+from config import CONF
+import analytics_crawler
+import analytics_db
+import fixture_store
+from mock_jable_server import MockJableServer
+
+
+def run_once(args, work_dir):
+    """在新数据库上跑一轮，返回各阶段耗时（秒）和保存的视频数"""
+    db_path = os.path.join(work_dir, f'bench_{time.time_ns()}.db')
+    date = time.strftime('%Y-%m-%d')
+    output = sys.stdout if args.verbose else io.StringIO()
+    timings = {}
+
+    with contextlib.redirect_stdout(output):
+        analytics_db.init_database(db_path)
+        start = time.perf_counter()
+        saved = analytics_crawler.crawl_all_hot_pages(1, args.pages, page_delay=args.page_delay,
+                                                      resume=False, db_path=db_path, date=date)
+        timings['hot'] = time.perf_counter() - start
+
+        if args.actors:
+            videos = [{'video_id': video['video_id']}
+                      for video in analytics_db.get_top_videos_by_likes(date, args.actors, db_path)]
+            start = time.perf_counter()
+            if args.actors_via_models:
+                analytics_crawler.crawl_actors_via_models(videos, db_path, workers=args.workers)
+            else:
+                analytics_crawler.crawl_multiple_video_actors(videos, db_path=db_path, workers=args.workers)
+            timings['actors'] = time.perf_counter() - start
+
+    analytics_db.close_db_connections(db_path)
+    timings['saved'] = saved
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="benchmark the crawl paths against the local replay server")
+    parser.add_argument("--fixtures", default=None,
+                        help=f"fixture directory (default: fixture_dir or {fixture_store.DEFAULT_FIXTURE_DIR})")
+    parser.add_argument("--pages", type=int, default=10, help="hot pages to crawl (default: 10)")
+    parser.add_argument("--actors", type=int, default=0, help="also crawl actors of the top N videos")
+    parser.add_argument("--actors-via-models", action="store_true",
+                        help="map actors through model listing pages instead of video pages")
+    parser.add_argument("--workers", type=int, default=None, help="concurrent fetch workers (default: fetch_workers)")
+    parser.add_argument("--page-delay", type=float, default=0.0, help="fixed delay between hot pages (default: 0)")
+    parser.add_argument("--rate", type=float, default=0.0,
+                        help="token bucket rate for the replay server host (default: 0 = unlimited)")
+    parser.add_argument("--latency", type=float, default=0.0, help="fixed delay per response in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random delay of 0..JITTER seconds")
+    parser.add_argument("--replay-latency", action="store_true",
+                        help="delay each page by the backend latency recorded with it")
+    parser.add_argument("--challenge-rate", type=float, default=0.0,
+                        help="probability of serving a Cloudflare challenge page")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="probability of an injected 503")
+    parser.add_argument("--seed", type=int, default=0, help="seed for injection and jitter (default: 0)")
+    parser.add_argument("--runs", type=int, default=1, help="repeat the benchmark (default: 1)")
+    parser.add_argument("--verbose", action="store_true", help="show crawler output")
+    args = parser.parse_args()
+
+    fixture_dir = args.fixtures or fixture_store.get_fixture_dir()
+    if not fixture_store.load_manifest(fixture_dir):
+        print(f"❌ 夹具目录 {fixture_dir} 中没有录制的页面，先用 JABLE_RECORD_FIXTURES 录制")
+        sys.exit(1)
+
+    # 所有请求发往回放服务器；关闭页面缓存，否则第二轮起全部命中缓存
+    os.environ.pop(fixture_store.RECORD_ENV, None)
+    CONF['fetch_policies'] = {}
+    CONF['html_cache_enabled'] = False
+    if args.workers:
+        CONF['fetch_workers'] = args.workers
+
+    # 后端统计、限速桶和页面缓存都放在临时目录：注入的错误不会让生产环境的后端熔断，
+    # 本地回放的延迟也不会混进生产环境的后端排序
+    work_dir = tempfile.mkdtemp(prefix='jable_bench_')
+    CONF['fetch_stats_path'] = os.path.join(work_dir, 'fetch_backend_stats.db')
+    CONF['rate_limit_path'] = os.path.join(work_dir, 'rate_limits.db')
+    CONF['html_cache_path'] = os.path.join(work_dir, 'html_cache.db')
+    results = []
+    try:
+        print("=" * 80)
+        print(f"离线爬取基准（热门页 {args.pages} 页，演员 {args.actors} 个，{args.runs} 轮）")
+        print("=" * 80)
+        for run in range(1, args.runs + 1):
+            # 每轮一个新服务器：注入序列从头开始，同样的参数得到同样的请求结果
+            server = MockJableServer(fixture_dir, port=0, latency=args.latency, jitter=args.jitter,
+                                     replay_latency=args.replay_latency,
+                                     challenge_rate=args.challenge_rate,
+                                     error_rate=args.error_rate, seed=args.seed)
+            server.start()
+            CONF['site_base_url'] = server.base_url
+            CONF['rate_limits'] = {server.host: {'rate': args.rate, 'burst': 1}}
+            try:
+                timings = run_once(args, work_dir)
+            finally:
+                server.stop()
+
+            results.append(timings)
+            line = (f"\n第 {run} 轮: 热门页 {timings['hot']:.2f}s "
+                    f"({timings['hot'] / max(args.pages, 1) * 1000:.0f} ms/页，保存 {timings['saved']:,} 个视频)")
+            if 'actors' in timings:
+                line += f"  演员 {timings['actors']:.2f}s"
+            print(line)
+            server.print_stats()
+
+        if args.runs > 1:
+            hot = [timings['hot'] for timings in results]
+            print(f"\n热门页中位数: {statistics.median(hot):.2f}s  最小: {min(hot):.2f}s  最大: {max(hot):.2f}s")
+            if args.actors:
+                actors = [timings['actors'] for timings in results]
+                print(f"演员中位数:   {statistics.median(actors):.2f}s  "
+                      f"最小: {min(actors):.2f}s  最大: {max(actors):.2f}s")
+        print("\n" + "=" * 80)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+页面解析耗时基准
+在保存的页面样本上比较原来的 BeautifulSoup 解析和 page_parser（lxml + 预编译 XPath，一次解析取出全部字段）
+的单页耗时，并核对两者解析出的视频 ID 一致
+
+使用：
+    python benchmark_parser.py                          # 默认使用 debug_model_page.html
+    python benchmark_parser.py page1.html page2.html --runs 50
+    python benchmark_parser.py ./fixtures --limit 20     # fixture_store 录制的夹具目录
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+from bs4 import BeautifulSoup
+
+import fixture_store
+import page_parser
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_FIXTURES = [os.path.join(PROJECT_DIR, 'debug_model_page.html')]
+
+
+def bs4_video_ids(html, features):
+    """原来的解析方式：整页建 soup，再用 CSS 选择器取视频卡片"""
+    soup = BeautifulSoup(html, features)
+    video_ids = []
+    for container in soup.select('div.video-img-box'):
+        link_tag = container.select_one('a[href*="/videos/"]')
+        if link_tag and link_tag.get('href'):
+            video_ids.append(link_tag['href'].split('/')[-2])
+        container.select_one('h6.title a')
+        container.select_one('p.sub-title')
+    soup.select('ul.pagination li a')
+    return video_ids
+
+
+def parser_video_ids(html):
+    """page_parser：一次解析取出全部字段（绕过缓存，测的是真实解析耗时）"""
+    return [video.video_id for video in page_parser.parse_page.__wrapped__(html).videos]
+
+
+def load_fixtures(paths, limit):
+    """读取样本：HTML 文件，或夹具目录中录制的页面（每个目录最多 limit 个）"""
+    for path in paths:
+        if not os.path.isdir(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                yield os.path.basename(path), f.read()
+            continue
+        for key in list(fixture_store.load_manifest(path))[:limit]:
+            html = fixture_store.load(key, path)
+            if html is not None:
+                yield key, html
+
+
+def time_parse(func, html, runs):
+    """多次解析，返回每次的耗时（毫秒）"""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func(html)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="benchmark HTML parsing per page")
+    parser.add_argument("fixtures", nargs='*', default=DEFAULT_FIXTURES,
+                        help="saved HTML pages or fixture directories (default: debug_model_page.html)")
+    parser.add_argument("--runs", type=int, default=30, help="parses per fixture and parser (default: 30)")
+    parser.add_argument("--limit", type=int, default=10, help="pages per fixture directory (default: 10)")
+    args = parser.parse_args()
+
+    parsers = [
+        ('bs4 html.parser', lambda html: bs4_video_ids(html, 'html.parser')),
+        ('bs4 lxml', lambda html: bs4_video_ids(html, 'lxml')),
+        ('page_parser', parser_video_ids),
+    ]
+
+    print("=" * 80)
+    print(f"页面解析耗时基准（每个样本每种解析 {args.runs} 次，取中位数）")
+    print("=" * 80)
+
+    mismatched = False
+    for name, html in load_fixtures(args.fixtures, args.limit):
+        print(f"\n{name}（{len(html) / 1024:.0f} KB）")
+        expected = bs4_video_ids(html, 'html.parser')
+        if parser_video_ids(html) != expected:
+            print("  ✗ page_parser 解析结果与 BeautifulSoup 不一致")
+            mismatched = True
+
+        baseline = None
+        for name, func in parsers:
+            median = statistics.median(time_parse(func, html, args.runs))
+            baseline = baseline or median
+            print(f"  {name:<16} {median:>8.2f} ms/页  {baseline / median:>5.1f}x")
+
+        record = page_parser.parse_page(html)
+        print(f"  解析结果: {len(record.videos)} 个视频, {len(record.actors)} 个演员, "
+              f"总页数 {record.last_page}, m3u8 {'有' if record.m3u8 else '无'}")
+
+    print("\n" + "=" * 80)
+    sys.exit(1 if mismatched else 0)
+
+
+if __name__ == '__main__':
+    main()
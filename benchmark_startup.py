@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+CLI 启动耗时基准
+cron 和包装脚本会频繁调用 main.py，这里跟踪常用轻量命令的墙钟时间，
+并列出导入耗时最高的模块，防止重量级依赖重新回到启动路径上
+
+使用：
+    python benchmark_startup.py                 # 默认每个命令跑 10 次
+    python benchmark_startup.py --runs 20 --max-ms 500
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 需要跟踪的命令
+COMMANDS = [
+    ['main.py', '--help'],
+    ['main.py', 'subscription', '--get'],
+]
+
+
+def time_command(args, runs):
+    """多次运行命令，返回每次的墙钟耗时（毫秒）"""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + args, cwd=PROJECT_DIR,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def top_imports(args, limit=10):
+    """用 -X importtime 找出导入耗时最高的顶层模块"""
+    result = subprocess.run([sys.executable, '-X', 'importtime'] + args, cwd=PROJECT_DIR,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line.split('|')
+        if not cumulative.strip().isdigit():
+            continue
+        # 只统计顶层导入（缩进为 1 个空格）
+        if name.startswith(' ') and not name.startswith('  '):
+            modules.append((int(cumulative) / 1000, name.strip()))
+    return sorted(modules, reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="benchmark CLI startup time")
+    parser.add_argument("--runs", type=int, default=10, help="runs per command (default: 10)")
+    parser.add_argument("--max-ms", type=float, default=None,
+                        help="fail if the median of any command exceeds this (ms)")
+    args = parser.parse_args()
+
+    # python 解释器本身的启动耗时作为基线
+    baseline = statistics.median(time_command(['-c', 'pass'], args.runs))
+
+    print("=" * 80)
+    print(f"CLI 启动耗时基准（每个命令 {args.runs} 次，解释器基线 {baseline:.0f} ms）")
+    print("=" * 80)
+
+    failed = False
+    for command in COMMANDS:
+        timings = time_command(command, args.runs)
+        median = statistics.median(timings)
+        print(f"\n$ python {' '.join(command)}")
+        print(f"  中位数: {median:.0f} ms  最小: {min(timings):.0f} ms  "
+              f"最大: {max(timings):.0f} ms  扣除基线: {median - baseline:.0f} ms")
+
+        print("  导入耗时 Top:")
+        for cumulative_ms, name in top_imports(command, limit=5):
+            print(f"    {cumulative_ms:>7.1f} ms  {name}")
+
+        if args.max_ms is not None and median > args.max_ms:
+            print(f"  ✗ 超过阈值 {args.max_ms:.0f} ms")
+            failed = True
+
+    print("\n" + "=" * 80)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
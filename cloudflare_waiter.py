@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Cloudflare 验证等待模块
+用 Playwright 的页面函数等待替代固定的 1 秒轮询：
+验证 iframe 一移除、标题不再是验证提示就立即返回
+"""
+
+import threading
+import time
+from typing import Tuple
+
+from config import CONF
+import retry_policy
+
+# Cloudflare 验证页面的特征文本
+CHALLENGE_MARKERS = ('Just a moment', 'Verify you are human', '請稍候')
+
+# 验证 iframe 已移除、标题不再是验证提示（验证通过后跳转中的空白页不算）
+CHALLENGE_GONE_JS = '''() => {
+    if (!document.body || document.readyState === 'loading') return false;
+    if (document.querySelector('iframe[src*="challenges.cloudflare.com"]')) return false;
+    const title = document.title || '';
+    return !['Just a moment', 'Verify you are human', '請稍候'].some(m => title.includes(m));
+}'''
+
+# 默认最长等待时间（秒），可通过 config.json 的 cf_challenge_timeout 覆盖
+DEFAULT_CHALLENGE_TIMEOUT = 60
+
+# 本进程内的验证等待统计
+_stats_lock = threading.Lock()
+CHALLENGE_STATS = {
+    'challenges': 0,      # 遇到验证的次数
+    'passed': 0,          # 验证通过次数
+    'timeouts': 0,        # 等待超时次数
+    'total_wait': 0.0,    # 等待验证的总耗时（秒）
+}
+
+
+def is_challenge_page(html: str) -> bool:
+    """判断 HTML 是否为 Cloudflare 验证页面"""
+    return any(marker in html for marker in CHALLENGE_MARKERS)
+
+
+def record_challenge(waited: float, passed: bool) -> None:
+    """记录一次验证等待（也供守护进程客户端回填远端的等待时间）"""
+    with _stats_lock:
+        CHALLENGE_STATS['challenges'] += 1
+        CHALLENGE_STATS['total_wait'] += waited
+        if passed:
+            CHALLENGE_STATS['passed'] += 1
+        else:
+            CHALLENGE_STATS['timeouts'] += 1
+
+
+def get_challenge_stats() -> dict:
+    """返回验证等待统计的快照"""
+    with _stats_lock:
+        return dict(CHALLENGE_STATS)
+
+
+def wait_until_ready(page, timeout: float = None, label: str = 'CF') -> Tuple[str, float]:
+    """
+    等待页面就绪并返回 HTML
+
+    CHALLENGE_GONE_JS 一成立就返回：没有遇到验证时立刻返回，遇到验证时跨越验证后的自动跳转等到验证消失。
+    不要求页面上有特定元素（404 等没有站点头部的页面也不会白等到超时）
+
+    Args:
+        page: Playwright Page 对象（已调用 goto）
+        timeout: 最长等待时间（秒），None 则读取配置 cf_challenge_timeout；不超过所在重试的剩余预算
+        label: 日志前缀
+
+    Returns:
+        (页面 HTML, 等待验证耗时秒数；未遇到验证时为 0)
+    """
+    from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+    if timeout is None:
+        timeout = CONF.get('cf_challenge_timeout', DEFAULT_CHALLENGE_TIMEOUT)
+    timeout = retry_policy.remaining_time(timeout)
+
+    start = time.time()
+    html = page.content()
+    challenged = is_challenge_page(html)
+    if challenged:
+        print(f"  [{label}] 检测到 Cloudflare 验证，等待页面就绪（最长 {timeout} 秒）...")
+
+    try:
+        page.wait_for_function(CHALLENGE_GONE_JS, timeout=timeout * 1000)
+        passed = True
+    except PlaywrightTimeoutError:
+        passed = False
+
+    if not challenged and passed:
+        return page.content(), 0.0
+
+    html = page.content()
+    waited = time.time() - start
+
+    record_challenge(waited, passed)
+    if passed:
+        print(f"  [{label}] ✓ Cloudflare 验证通过 (等待 {waited:.1f} 秒)")
+    else:
+        print(f"  [{label}] ⚠️  等待页面就绪超时 ({waited:.1f} 秒)")
+
+    return html, waited
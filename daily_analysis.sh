@@ -28,6 +28,23 @@ echo "========================================" >> "$LOG_FILE"
 # 开始计时
 START_TIME=$(date +%s)
 
+# ============================================================================
+# 0. 确保页面获取守护进程在运行（浏览器冷启动和 Cloudflare 验证每天只付一次）
+# ============================================================================
+if ! python3 main.py daemon --status > /dev/null 2>&1; then
+    echo "启动页面获取守护进程..." >> "$LOG_FILE"
+    if command -v xvfb-run > /dev/null 2>&1; then
+        nohup xvfb-run -a python3 main.py daemon >> "$PROJECT_DIR/logs/fetch_daemon.log" 2>&1 &
+    else
+        nohup python3 main.py daemon >> "$PROJECT_DIR/logs/fetch_daemon.log" 2>&1 &
+    fi
+    # 等待守护进程就绪（预热完成后才开始监听）
+    for _ in $(seq 1 90); do
+        python3 main.py daemon --status > /dev/null 2>&1 && break
+        sleep 2
+    done
+fi
+
 # ============================================================================
 # 1. 每日更新热门视频数据
 # ============================================================================
@@ -1,17 +1,16 @@
 import re
-import time
-import random
 
 import config
-import model_crawler
-import utils
-import video_crawler
-import hot_crawler
+
+# 爬虫、下载相关模块（bs4 / requests / m3u8 / pycryptodome / Playwright）在用到的函数里再导入，
+# 这样 subscription --get 等轻量命令无需加载它们
 
 CONF = config.CONF
 
 
 def _add_subscription(input_urls):
+    import model_crawler
+
     cur_subscription = []
     for input_url in input_urls:
         model_crawler.input_url_validator(input_url)
@@ -35,42 +34,6 @@ def _add_subscription(input_urls):
     print(cur_subscription)
 
 
-def get_need_sync_video_ids(sub):
-    """
-    获取需要同步的视频 ID 集合
-
-    Args:
-        sub: 订阅列表
-
-    Returns:
-        set: 需要同步的视频 ID 集合，失败时返回空集合
-    """
-    # first update cache
-    cache_info = utils.get_video_ids_map_from_cache()
-    try:
-        for item in sub:
-            url = item['url']
-            cached_video_ids = set(cache_info.get(url, set())) if cache_info else set()
-            remote_video_id_set = model_crawler.get_all_video_ids(url, cached_video_ids)
-            cache_info[url] = list(remote_video_id_set)
-    except Exception as e:
-        print(f"⚠️  获取视频列表失败: {str(e)[:100]}")
-        print(f"   使用缓存数据继续...")
-        # 不要 raise，使用缓存的数据继续
-    finally:
-        utils.update_video_ids_cache(cache_info)
-
-    # 如果没有任何数据，返回空集合
-    if not cache_info or sub[0]['url'] not in cache_info:
-        return set()
-
-    need_sync_video_ids = set(cache_info[sub[0]['url']])
-    for item in sub[1:]:
-        url = item['url']
-        need_sync_video_ids &= set(cache_info.get(url, set()))
-    return need_sync_video_ids
-
-
 def print_all_subs(all_subs, print_url=False):
     if not all_subs:
         print("当前无任何订阅内容")
@@ -95,6 +58,13 @@ def process_subscription(args):
         all_subs = CONF.get('subscriptions', [])
         print_all_subs(all_subs, print_url=True)
     elif args.sync_videos:
+        import html_cache
+        import job_queue
+        import rate_limiter
+        import retry_policy
+        import sync_planner
+        import utils
+
         all_subs = CONF.get('subscriptions', [])
         output_path = CONF.get("outputDir", './')
         if args.ids:
@@ -102,61 +72,34 @@ def process_subscription(args):
         local_video_id_set = utils.get_local_video_list(path=output_path)
         block_video_ids = {str.lower(video_id) for video_id in config.CONF.get("videoIdBlockList", [])}
         ignore_video_ids = local_video_id_set | block_video_ids
-        base_url = "https://jable.tv/videos/"
+        if job_queue.use_job_queue(args):
+            # 其他主机已经下载完成的视频（共享片库）也不再入队
+            ignore_video_ids |= set(job_queue.get_job_queue().get_library_ids())
 
-        download_inerval = CONF.get("downloadInterval", 1)
         print_all_subs(all_subs)
 
-        for subs in all_subs:
-            subs_name = '-'.join([foo['name'] for foo in subs])
-            print("\n===================================")
-            print("  同步订阅:\t%s" % subs_name)
-            print("===================================\n")
-
-            try:
-                remote_video_id_set = get_need_sync_video_ids(subs)
-
-                # 如果获取失败（返回空集合）且没有缓存，跳过这个订阅
-                if not remote_video_id_set:
-                    print("⚠️  该订阅无可用数据，跳过")
-                    continue
-
-                need_sync_video_ids = remote_video_id_set - ignore_video_ids
-                need_sync_number = len(need_sync_video_ids)
-                print("该订阅远端 %s 个 / 本地已存在 %s 个 " %
-                      (len(remote_video_id_set), len(remote_video_id_set & ignore_video_ids)))
-
-                if need_sync_number == 0:
-                    print("✓ 所有视频已下载，跳过")
-                    continue
-
-                # 将 set 转换为 list 并随机打乱顺序
-                need_sync_video_list = list(need_sync_video_ids)
-                random.shuffle(need_sync_video_list)
-                print("🔀 已随机打乱下载顺序")
-
-                print("开始同步 %s 的远端视频到本地..." % '-'.join([foo['name'] for foo in subs]))
-
-                for index, video_id in enumerate(need_sync_video_list):
-                    print("\n该订阅需同步视频 %s 个 / 剩余 %s 个 " % (need_sync_number, need_sync_number - index))
-                    download_url = base_url + video_id + '/'
-                    # print(download_url)
-                    video_crawler.download_by_video_url(download_url)
-
-                    ignore_video_ids.add(video_id)
-                    if index < len(need_sync_video_list) - 1:
-                        time.sleep(download_inerval)
+        # 先全局规划：每个链接只刷新一次，所有订阅合并成一个去重、排好优先级的下载队列
+        plan = sync_planner.build_plan(all_subs, ignore_video_ids)
+        plan.print_report()
 
-                print("订阅 %s 同步完成" % subs_name)
+        if getattr(args, 'dry_run', False):
+            print("\n（--dry-run：只生成计划，不下载）")
+        elif job_queue.use_job_queue(args):
+            sync_planner.enqueue_plan(plan)
+        else:
+            sync_planner.execute_plan(plan)
 
-            except Exception as e:
-                print(f"\n✗ 订阅 {subs_name} 同步失败: {str(e)[:100]}")
-                print(f"   继续处理下一个订阅...")
-                continue
+        html_cache.print_cache_stats()
+        rate_limiter.print_limiter_stats()
+        retry_policy.print_retry_metrics()
         print("\n==所有订阅同步完成==\n")
 
 
 def process_videos(args):
+    import job_queue
+    import utils
+    import video_crawler
+
     video_urls = []
     for url in args.urls:
         if "videos" not in url:
@@ -174,6 +117,10 @@ def process_videos(args):
     # 修正正则：匹配完整的视频 ID，包括所有后缀（如 -c, -cn 等）
     re_extractor = re.compile(r"[a-zA-Z0-9]{2,}-\d{3,}(?:-[a-zA-Z0-9]+)?")
 
+    if job_queue.use_job_queue(args):
+        job_queue.enqueue_urls(video_urls, source='videos')
+        return
+
     for video_url in video_urls:
         re_res = re_extractor.search(video_url)
         if re_res:
@@ -185,6 +132,33 @@ def process_videos(args):
         video_crawler.download_by_video_url(video_url)
 
 
+def process_serve(args):
+    """
+    处理下载服务命令
+
+    Args:
+        args: 命令行参数
+            - workers: 工作循环数
+            - status: 只查看队列状态
+            - retry_failed: 把失败任务重新入队
+            - exit_when_empty: 队列为空时退出
+            - listen: 作为队列服务监听的地址（多主机共享队列）
+    """
+    import job_queue
+
+    if args.listen:
+        import job_queue_remote
+        job_queue_remote.QueueServer(args.listen).serve()
+        return
+    if args.status:
+        job_queue.print_queue_status()
+        return
+    if args.retry_failed:
+        print(f"✓ 已重新入队 {job_queue.get_job_queue().retry_failed()} 个失败任务")
+        return
+    job_queue.serve(workers=max(1, args.workers), exit_when_empty=args.exit_when_empty)
+
+
 def process_hot(args):
     """
     处理热门视频下载命令
@@ -194,7 +168,10 @@ def process_hot(args):
             - top: 下载数量（默认 4）
             - min_likes: 最小点赞数（默认 2000）
     """
+    import hot_crawler
+    import job_queue
+
     top_n = args.top if hasattr(args, 'top') and args.top else 4
     min_likes = args.min_likes if hasattr(args, 'min_likes') and args.min_likes else 2000
 
-    hot_crawler.download_hot_videos(top_n=top_n, min_likes=min_likes)
+    hot_crawler.download_hot_videos(top_n=top_n, min_likes=min_likes, enqueue=job_queue.use_job_queue(args))
@@ -0,0 +1,455 @@
+#!/usr/bin/env python3
+"""
+页面获取后端注册表
+统一的页面获取入口：按调用场景（列表页/视频页）选择后端顺序，
+记录每个后端的成功率和延迟；连续失败或明显变慢的后端会被熔断，
+请求自动转到下一个后端，而不是在同一个坏后端上耗完整个重试阶梯
+"""
+
+import importlib.util
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+from config import CONF
+from cloudflare_waiter import is_challenge_page
+import fixture_store
+import html_cache
+import rate_limiter
+import retry_policy
+
+# 后端统计数据库（所有进程共享熔断状态和延迟统计），可通过 config.json 的 fetch_stats_path 覆盖
+DEFAULT_STATS_PATH = './.fetch_backend_stats.db'
+
+_STATS_COLUMNS = ('calls', 'successes', 'failures', 'consecutive_failures', 'avg_latency', 'open_until',
+                  'last_error')
+
+# 连续失败多少次后熔断
+FAILURE_THRESHOLD = 3
+
+# 熔断持续时间（秒）
+COOLDOWN_SECONDS = 300
+
+# 平均延迟超过多少秒视为慢后端（排到其他健康后端之后），可通过 fetch_slow_seconds 覆盖
+DEFAULT_SLOW_SECONDS = 60
+
+# 延迟指数移动平均的权重
+EWMA_ALPHA = 0.3
+
+# 各调用场景的默认后端顺序，可通过 config.json 的 fetch_policies 覆盖
+DEFAULT_POLICIES = {
+    'list': ['daemon', 'scrapingant', 'fast', 'simple'],
+    'video': ['daemon', 'scrapingant', 'simple', 'fast'],
+    'default': ['daemon', 'scrapingant', 'simple', 'fast'],
+}
+
+# 线上站点地址；设置 site_base_url（或环境变量 JABLE_SITE_URL）后，所有页面请求改发到该地址，
+# 例如本地回放服务器 mock_jable_server.py
+SITE_URL = 'https://jable.tv'
+SITE_URL_ENV = 'JABLE_SITE_URL'
+
+# 站点地址被覆盖且没有配置 fetch_policies 时使用的后端顺序（本地回放服务器没有 Cloudflare，直接 HTTP 请求）
+OVERRIDE_POLICY = ['http']
+
+_BACKENDS: 'OrderedDict[str, Dict]' = OrderedDict()
+
+
+def register_backend(name: str, func: Callable[[str, int], Optional[str]],
+                     available: Optional[Callable[[], bool]] = None,
+                     release: Optional[Callable[[], None]] = None,
+                     shutdown: Optional[Callable[[], None]] = None) -> None:
+    """
+    注册页面获取后端
+
+    Args:
+        name: 后端名称
+        func: 获取函数 func(url, retry) -> html；返回 None 表示本次不处理（不计为失败）
+        available: 是否可用的检查函数（例如依赖是否安装、token 是否配置）
+        release: 释放当前线程持有的资源（例如到共享浏览器的连接），工作线程退出时调用
+        shutdown: 关闭进程内共享的资源（例如共享的浏览器进程），整个运行结束时调用一次
+    """
+    _BACKENDS[name] = {
+        'func': func,
+        'available': available or (lambda: True),
+        'release': release,
+        'shutdown': shutdown,
+    }
+
+
+def _new_stats() -> Dict:
+    return {
+        'calls': 0,
+        'successes': 0,
+        'failures': 0,
+        'consecutive_failures': 0,
+        'avg_latency': 0.0,
+        'open_until': 0.0,
+        'last_error': '',
+    }
+
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(CONF.get('fetch_stats_path', DEFAULT_STATS_PATH), timeout=30,
+                           isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS backend_stats (
+            name TEXT PRIMARY KEY,
+            calls INTEGER NOT NULL,
+            successes INTEGER NOT NULL,
+            failures INTEGER NOT NULL,
+            consecutive_failures INTEGER NOT NULL,
+            avg_latency REAL NOT NULL,
+            open_until REAL NOT NULL,
+            last_error TEXT NOT NULL
+        )
+    ''')
+    return conn
+
+
+def _load_all_stats() -> Dict[str, Dict]:
+    """读取所有后端的统计（统计数据库不可用时返回空字典，相当于所有后端都健康）"""
+    try:
+        conn = _connect()
+        try:
+            rows = conn.execute(f"SELECT name, {', '.join(_STATS_COLUMNS)} FROM backend_stats").fetchall()
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return {}
+    return {row[0]: dict(zip(_STATS_COLUMNS, row[1:])) for row in rows}
+
+
+def _update_stats(name: str, update: Callable[[Dict], None]) -> Dict:
+    """
+    跨进程原子地读-改-写一个后端的统计
+
+    Args:
+        name: 后端名称
+        update: 就地修改统计字典的函数
+
+    Returns:
+        修改后的统计
+    """
+    try:
+        conn = _connect()
+    except sqlite3.Error:
+        stats = _new_stats()
+        update(stats)
+        return stats
+
+    stats = _new_stats()
+    try:
+        # BEGIN IMMEDIATE 在读之前就拿到写锁，多个进程同时记录也不会互相覆盖
+        conn.execute('BEGIN IMMEDIATE')
+        row = conn.execute(f"SELECT {', '.join(_STATS_COLUMNS)} FROM backend_stats WHERE name = ?",
+                           (name,)).fetchone()
+        if row:
+            stats = dict(zip(_STATS_COLUMNS, row))
+        update(stats)
+        conn.execute(f"INSERT OR REPLACE INTO backend_stats (name, {', '.join(_STATS_COLUMNS)}) "
+                     f"VALUES (?, {', '.join('?' * len(_STATS_COLUMNS))})",
+                     [name] + [stats[column] for column in _STATS_COLUMNS])
+        conn.execute('COMMIT')
+    except sqlite3.Error:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+    finally:
+        conn.close()
+    return stats
+
+
+def _record_success(name: str, latency: float) -> None:
+    def update(stats):
+        stats['calls'] += 1
+        stats['successes'] += 1
+        stats['consecutive_failures'] = 0
+        stats['open_until'] = 0.0
+        if stats['avg_latency']:
+            stats['avg_latency'] = EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * stats['avg_latency']
+        else:
+            stats['avg_latency'] = latency
+
+    _update_stats(name, update)
+
+
+def _record_failure(name: str, error: str) -> None:
+    def update(stats):
+        stats['calls'] += 1
+        stats['failures'] += 1
+        stats['consecutive_failures'] += 1
+        stats['last_error'] = error[:200]
+        if stats['consecutive_failures'] >= FAILURE_THRESHOLD:
+            stats['open_until'] = time.time() + COOLDOWN_SECONDS
+
+    stats = _update_stats(name, update)
+    if stats['consecutive_failures'] >= FAILURE_THRESHOLD:
+        print(f"  [Fetch] ⚠️  后端 {name} 连续失败 {stats['consecutive_failures']} 次，"
+              f"熔断 {COOLDOWN_SECONDS} 秒")
+
+
+def get_site_override() -> str:
+    """覆盖的站点地址（环境变量优先），没有覆盖时返回空字符串"""
+    return (os.environ.get(SITE_URL_ENV) or CONF.get('site_base_url') or '').rstrip('/')
+
+
+def rewrite_site_url(url: str) -> str:
+    """站点地址被覆盖时，把线上站点的 URL 改写到覆盖的地址（路径和查询参数不变）"""
+    override = get_site_override()
+    if override and url.startswith(SITE_URL):
+        return override + url[len(SITE_URL):]
+    return url
+
+
+def get_policy(kind: str) -> List[str]:
+    """获取调用场景对应的后端顺序"""
+    if get_site_override() and not CONF.get('fetch_policies'):
+        return OVERRIDE_POLICY
+    policies = dict(DEFAULT_POLICIES)
+    policies.update(CONF.get('fetch_policies', {}))
+    return policies.get(kind, policies['default'])
+
+
+def is_backend_available(name: str) -> bool:
+    """后端是否已注册且依赖可用"""
+    backend = _BACKENDS.get(name)
+    if not backend:
+        return False
+    try:
+        return bool(backend['available']())
+    except Exception:
+        return False
+
+
+def get_candidates(kind: str = 'default') -> List[str]:
+    """
+    按策略、健康状态和延迟排出本次尝试的后端顺序
+
+    熔断中的后端被跳过；慢后端排到健康后端之后；
+    如果所有后端都在熔断中，则按策略顺序全部尝试（半开）
+    """
+    slow_seconds = CONF.get('fetch_slow_seconds', DEFAULT_SLOW_SECONDS)
+    now = time.time()
+
+    policy = [name for name in get_policy(kind) if is_backend_available(name)]
+
+    all_stats = _load_all_stats()
+    stats = {name: all_stats.get(name) or _new_stats() for name in policy}
+    closed = [name for name in policy if stats[name]['open_until'] <= now]
+    healthy = [name for name in closed if stats[name]['avg_latency'] <= slow_seconds]
+    slow = [name for name in closed if name not in healthy]
+
+    return (healthy + slow) or policy
+
+
+def fetch(url: str, kind: str = 'default', retry: int = 3, use_cache: bool = True) -> str:
+    """
+    统一的页面获取入口
+
+    先查页面缓存；未命中时每一轮按 get_candidates() 的顺序逐个后端尝试一次，共 retry 轮。
+    每次调用后端前先从共享限速器取令牌，轮次之间的等待和总耗时由 retry_policy 的 page 策略控制。
+    站点地址被覆盖时请求改发到覆盖的地址；录制模式下拿到的页面同时保存为夹具（fixture_store）
+
+    Args:
+        url: 页面 URL
+        kind: 调用场景（list / video / default），决定后端顺序
+        retry: 轮数
+        use_cache: 是否使用页面缓存
+
+    Returns:
+        页面 HTML
+    """
+    url = rewrite_site_url(url)
+    # 回放服务器返回的页面不再录制，避免覆盖线上录到的夹具
+    recording = fixture_store.is_recording() and not get_site_override()
+
+    if use_cache:
+        html = html_cache.get(url)
+        if html is not None:
+            # 缓存中的页面只补录还没有的夹具，不覆盖带后端耗时的录制
+            if recording and not fixture_store.exists(url):
+                fixture_store.record(url, html, backend='cache')
+            return html
+
+    errors = []
+
+    def fetch_round(attempt):
+        candidates = get_candidates(kind)
+        if not candidates:
+            raise retry_policy.PermanentError(f"No fetch backend available for {kind}: {url}")
+
+        # 服务端要求的等待时间（所有后端中最长的），下一轮按它退避
+        retry_after = None
+        for name in candidates:
+            # 所有进程共享的按站点限速，每次实际请求前取一个令牌
+            rate_limiter.acquire(url)
+            start = time.time()
+            try:
+                html = _BACKENDS[name]['func'](url, 1)
+            except retry_policy.PermanentError:
+                # 页面本身不存在（404/410 等），换后端或重试都没有意义，也不算后端的失败
+                raise
+            except Exception as e:
+                _record_failure(name, str(e))
+                if getattr(e, 'retry_after', None) is not None:
+                    retry_after = max(retry_after or 0.0, e.retry_after)
+                errors.append(f"{name}: {str(e)[:100]}")
+                print(f"  [Fetch] ✗ 后端 {name} 失败 (第 {attempt}/{retry} 轮): {str(e)[:100]}")
+                continue
+
+            if html is None:
+                continue
+
+            if is_challenge_page(html):
+                _record_failure(name, 'cloudflare challenge not passed')
+                errors.append(f"{name}: cloudflare challenge not passed")
+                print(f"  [Fetch] ✗ 后端 {name} 未通过 Cloudflare 验证 (第 {attempt}/{retry} 轮)")
+                continue
+
+            latency = time.time() - start
+            _record_success(name, latency)
+            if recording:
+                fixture_store.record(url, html, backend=name, seconds=latency)
+            if use_cache:
+                html_cache.put(url, html)
+            return html
+
+        raise retry_policy.TransientError('所有后端均失败', retry_after=retry_after)
+
+    def on_retry(attempt, error, delay):
+        print(f"  [Fetch] ⏳ 所有后端均失败，{delay:.0f} 秒后重试...")
+
+    # 轮次之间按 page 策略退避，单个页面的总耗时受 deadline 约束
+    policy = retry_policy.get_policy('page').with_attempts(retry)
+    try:
+        return retry_policy.retry_call(fetch_round, op='page', policy=policy, on_retry=on_retry)
+    except retry_policy.PermanentError:
+        raise
+    except Exception as e:
+        raise Exception(f"{url} fetch failed after {retry} rounds: "
+                        f"{'; '.join(errors[-3:]) or str(e)}") from e
+
+
+def release_thread_resources() -> None:
+    """释放当前线程在各后端持有的资源（例如到共享浏览器的连接），共享的浏览器继续供其他线程使用"""
+    for backend in _BACKENDS.values():
+        if backend['release']:
+            backend['release']()
+
+
+def shutdown_backends() -> None:
+    """关闭各后端在进程内共享的资源（例如共享的浏览器进程），只在整个运行结束时调用"""
+    release_thread_resources()
+    for backend in _BACKENDS.values():
+        if backend['shutdown']:
+            backend['shutdown']()
+
+
+def get_backend_stats() -> Dict[str, Dict]:
+    """返回各后端统计的快照"""
+    all_stats = _load_all_stats()
+    return {name: all_stats.get(name) or _new_stats() for name in _BACKENDS}
+
+
+def print_backend_stats() -> None:
+    """打印各后端统计"""
+    now = time.time()
+    print(f"\n{'后端':<12} {'调用':>6} {'成功':>6} {'失败':>6} {'平均延迟':>9}  状态")
+    print("-" * 60)
+    for name, stats in get_backend_stats().items():
+        if not stats['calls']:
+            continue
+        state = '熔断中' if stats['open_until'] > now else '正常'
+        print(f"{name:<12} {stats['calls']:>6} {stats['successes']:>6} {stats['failures']:>6} "
+              f"{stats['avg_latency']:>8.2f}s  {state}")
+
+
+# ==================== 内置后端 ====================
+
+def _module_available(module_name: str) -> bool:
+    return importlib.util.find_spec(module_name) is not None
+
+
+def _daemon_get(url: str, retry: int) -> Optional[str]:
+    import fetch_daemon
+    return fetch_daemon.daemon_get(url, retry)
+
+
+def _daemon_available() -> bool:
+    import fetch_daemon
+    return os.path.exists(fetch_daemon.get_socket_path())
+
+
+def _scrapingant_get(url: str, retry: int) -> str:
+    import utils
+    return utils.scrapingant_api_get(url, retry)
+
+
+def _fast_get(url: str, retry: int) -> str:
+    import utils_fast
+    return utils_fast.fast_requests_get(url, retry)
+
+
+def _fast_release() -> None:
+    import sys
+    if 'utils_fast' in sys.modules:
+        sys.modules['utils_fast'].release_thread_browser()
+
+
+def _fast_shutdown() -> None:
+    import sys
+    if 'utils_fast' in sys.modules:
+        sys.modules['utils_fast'].close_browser_instance()
+
+
+def _simple_get(url: str, retry: int) -> str:
+    import utils
+    return utils.get_response_from_playwright_simple(url, retry)
+
+
+def _advanced_get(url: str, retry: int) -> str:
+    import utils_advanced
+    return utils_advanced.get_response_from_playwright(url, retry)
+
+
+def _stealth_get(url: str, retry: int) -> str:
+    import utils_stealth
+    return utils_stealth.get_response_from_playwright_stealth(url, retry)
+
+
+_http_local = threading.local()
+
+
+def _http_get(url: str, retry: int) -> str:
+    """直接 HTTP 请求（每个线程复用一个连接），只用于没有 Cloudflare 的本地回放服务器"""
+    import requests
+    session = getattr(_http_local, 'session', None)
+    if session is None:
+        session = _http_local.session = requests.Session()
+    response = session.get(url, headers=CONF.get('headers'), timeout=retry_policy.remaining_time(30))
+    # 验证页面原样返回，由 fetch() 识别并计入验证失败
+    if response.status_code == 403 and is_challenge_page(response.text):
+        return response.text
+    # 404/410 抛 PermanentError 立即失败，429/503 等带上 Retry-After
+    retry_policy.check_response(response)
+    return response.text
+
+
+def _http_release() -> None:
+    session = getattr(_http_local, 'session', None)
+    if session is not None:
+        session.close()
+        _http_local.session = None
+
+
+register_backend('daemon', _daemon_get, available=_daemon_available)
+register_backend('scrapingant', _scrapingant_get, available=lambda: bool(CONF.get('sa_token')))
+register_backend('fast', _fast_get, available=lambda: _module_available('playwright'),
+                 release=_fast_release, shutdown=_fast_shutdown)
+register_backend('simple', _simple_get, available=lambda: _module_available('playwright'))
+register_backend('advanced', _advanced_get, available=lambda: _module_available('playwright'))
+register_backend('stealth', _stealth_get, available=lambda: _module_available('playwright_stealth'))
+register_backend('http', _http_get, available=lambda: bool(get_site_override()), release=_http_release)
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+本地页面获取守护进程
+常驻一个已预热的浏览器（复用 utils_fast 的浏览器实例和 Cloudflare 验证状态），
+通过 Unix socket 为 cron 任务、订阅同步等短命进程提供页面获取服务。
+浏览器冷启动和首次验证的代价每天只付一次，而不是每次调用都付。
+
+协议：每个连接发送一行 JSON 请求，返回一行 JSON 响应
+    {"op": "get", "url": "...", "retry": 3}  ->  {"ok": true, "html": "...", "challenge_wait": 0.0, "challenge_timeouts": 0}
+    {"op": "ping"}                           ->  {"ok": true}
+    {"op": "stats"}                          ->  {"ok": true, "stats": {...}}
+    {"op": "shutdown"}                       ->  {"ok": true}
+
+使用：
+    xvfb-run -a python3 main.py daemon            # 前台运行守护进程
+    python3 main.py daemon --status               # 查看状态
+    python3 main.py daemon --stop                 # 停止
+"""
+
+import json
+import os
+import socket
+import socketserver
+import time
+from typing import Dict, Optional
+
+from config import CONF
+import cloudflare_waiter
+import retry_policy
+
+# 默认 socket 路径（相对于工作目录），可通过 config.json 的 fetch_daemon_socket 覆盖
+DEFAULT_SOCKET_PATH = './jable_fetch.sock'
+
+# 浏览器状态文件（Cookie 等），守护进程重启后仍可复用验证结果
+DEFAULT_STATE_FILE = './.jable_fetch_state.json'
+
+# 浏览器最长存活时间（小时），超过后重启浏览器
+DEFAULT_MAX_AGE_HOURS = 24
+
+# 预热访问的页面
+WARMUP_URL = 'https://jable.tv/'
+
+
+def get_socket_path() -> str:
+    """获取守护进程 socket 路径"""
+    return CONF.get('fetch_daemon_socket', DEFAULT_SOCKET_PATH)
+
+
+def _send_request(payload: Dict, timeout: float, socket_path: Optional[str] = None) -> Dict:
+    """向守护进程发送一个请求并读取响应"""
+    socket_path = socket_path or get_socket_path()
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socket_path)
+        sock.sendall(json.dumps(payload, ensure_ascii=False).encode('utf-8') + b'\n')
+
+        chunks = []
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            if chunk.endswith(b'\n'):
+                break
+
+    return json.loads(b''.join(chunks).decode('utf-8'))
+
+
+def is_daemon_running(socket_path: Optional[str] = None) -> bool:
+    """检查守护进程是否在运行"""
+    socket_path = socket_path or get_socket_path()
+    if not os.path.exists(socket_path):
+        return False
+    try:
+        return _send_request({'op': 'ping'}, timeout=5, socket_path=socket_path).get('ok', False)
+    except (OSError, ValueError):
+        return False
+
+
+def daemon_get(url: str, retry: int = 3) -> Optional[str]:
+    """
+    通过守护进程获取页面
+
+    守护进程未运行时返回 None，由调用方回退到本地获取。
+
+    Args:
+        url: 页面 URL
+        retry: 守护进程内部的重试次数
+
+    Returns:
+        页面 HTML；守护进程不可用（未运行、无响应或响应不完整）时返回 None
+    """
+    socket_path = get_socket_path()
+    if not os.path.exists(socket_path):
+        return None
+
+    timeout = CONF.get('cf_challenge_timeout', cloudflare_waiter.DEFAULT_CHALLENGE_TIMEOUT) + 180
+    # 不超过所在重试的剩余预算，卡住的守护进程不会拖过整个页面的时限
+    timeout = retry_policy.remaining_time(timeout)
+    try:
+        response = _send_request({'op': 'get', 'url': url, 'retry': retry}, timeout=timeout)
+    except (ConnectionRefusedError, FileNotFoundError):
+        # socket 文件残留但守护进程已退出
+        return None
+    except (OSError, ValueError) as e:
+        # 守护进程卡住（socket.timeout）、连接中断或响应被截断，回退到本地获取
+        print(f"  [Daemon] ⚠️  守护进程无响应，回退到本地获取: {str(e)[:100]}")
+        return None
+
+    if not response.get('ok'):
+        raise Exception(f"Daemon request failed: {response.get('error', 'unknown error')}")
+
+    if response.get('challenge_wait'):
+        # 守护进程中等待超时的验证记为失败，不能算作通过
+        cloudflare_waiter.record_challenge(response['challenge_wait'], not response.get('challenge_timeouts'))
+
+    return response['html']
+
+
+class _FetchRequestHandler(socketserver.StreamRequestHandler):
+    """处理单个客户端连接（守护进程串行处理，浏览器始终在主线程中使用）"""
+
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline().decode('utf-8'))
+            response = self.server.fetch_daemon.dispatch(request)
+        except Exception as e:
+            response = {'ok': False, 'error': str(e)[:500]}
+
+        self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8') + b'\n')
+
+
+class FetchDaemon:
+    """
+    页面获取守护进程
+
+    - 浏览器实例常驻，超过 max_age_hours 自动重启
+    - 每次成功获取后保存浏览器状态，重启后复用 Cloudflare 验证结果
+    """
+
+    def __init__(self, socket_path: Optional[str] = None,
+                 state_file: str = DEFAULT_STATE_FILE,
+                 max_age_hours: float = DEFAULT_MAX_AGE_HOURS):
+        self.socket_path = socket_path or get_socket_path()
+        self.state_file = state_file
+        self.max_age = max_age_hours * 3600
+        self.browser_started_at = None
+        self.stopping = False
+        self.stats = {
+            'started_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'requests': 0,
+            'errors': 0,
+            'busy_seconds': 0.0,
+            'browser_restarts': 0,
+        }
+
+    def _ensure_browser(self):
+        """确保浏览器已启动且未超过最长存活时间"""
+        import utils_fast
+
+        if self.browser_started_at and time.time() - self.browser_started_at > self.max_age:
+            print("  [Daemon] 浏览器已运行超过最长存活时间，正在重启...")
+            utils_fast.save_browser_state(self.state_file)
+            utils_fast.close_browser_instance()
+            self.browser_started_at = None
+            self.stats['browser_restarts'] += 1
+
+        if self.browser_started_at is None:
+            utils_fast.get_browser_instance(storage_state=self.state_file)
+            self.browser_started_at = time.time()
+
+    def fetch(self, url: str, retry: int = 3) -> Dict:
+        """在常驻浏览器中获取页面"""
+        import utils_fast
+
+        self._ensure_browser()
+
+        before = cloudflare_waiter.get_challenge_stats()
+        start = time.time()
+        try:
+            html = utils_fast.fast_requests_get(url, retry)
+        finally:
+            self.stats['requests'] += 1
+            self.stats['busy_seconds'] += time.time() - start
+
+        after = cloudflare_waiter.get_challenge_stats()
+        utils_fast.save_browser_state(self.state_file)
+
+        return {'ok': True, 'html': html,
+                'challenge_wait': after['total_wait'] - before['total_wait'],
+                'challenge_timeouts': after['timeouts'] - before['timeouts']}
+
+    def dispatch(self, request: Dict) -> Dict:
+        """分发请求"""
+        op = request.get('op')
+
+        if op == 'ping':
+            return {'ok': True}
+
+        if op == 'stats':
+            stats = dict(self.stats)
+            stats['challenges'] = cloudflare_waiter.get_challenge_stats()
+            stats['browser_age'] = time.time() - self.browser_started_at if self.browser_started_at else 0
+            return {'ok': True, 'stats': stats}
+
+        if op == 'shutdown':
+            self.stopping = True
+            return {'ok': True}
+
+        if op == 'get':
+            try:
+                return self.fetch(request['url'], int(request.get('retry', 3)))
+            except Exception as e:
+                self.stats['errors'] += 1
+                return {'ok': False, 'error': str(e)[:500]}
+
+        return {'ok': False, 'error': f'unknown op: {op}'}
+
+    def serve(self, warmup: bool = True):
+        """运行守护进程（阻塞，直到收到 shutdown 请求或 Ctrl+C）"""
+        import utils_fast
+
+        if is_daemon_running(self.socket_path):
+            print(f"⚠️  守护进程已在运行: {self.socket_path}")
+            return
+
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+        print("=" * 80)
+        print(f"🚀 页面获取守护进程启动: {self.socket_path}")
+        print("=" * 80)
+
+        if warmup:
+            print(f"  [Daemon] 预热浏览器: {WARMUP_URL}")
+            try:
+                self.fetch(WARMUP_URL, retry=2)
+            except Exception as e:
+                print(f"  [Daemon] ⚠️  预热失败（不影响后续请求）: {str(e)[:100]}")
+
+        server = socketserver.UnixStreamServer(self.socket_path, _FetchRequestHandler)
+        server.fetch_daemon = self
+        server.timeout = 1.0
+
+        try:
+            while not self.stopping:
+                server.handle_request()
+        except KeyboardInterrupt:
+            print("\n  [Daemon] 收到中断信号")
+        finally:
+            server.server_close()
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+            utils_fast.save_browser_state(self.state_file)
+            utils_fast.close_browser_instance()
+            print(f"✓ 守护进程已停止（共处理 {self.stats['requests']} 个请求）")
+
+
+def stop_daemon() -> bool:
+    """请求守护进程退出"""
+    if not is_daemon_running():
+        print("守护进程未运行")
+        return False
+    _send_request({'op': 'shutdown'}, timeout=10)
+    print("✓ 已请求守护进程退出")
+    return True
+
+
+def print_daemon_status() -> bool:
+    """打印守护进程状态"""
+    if not is_daemon_running():
+        print(f"守护进程未运行（socket: {get_socket_path()}）")
+        return False
+
+    stats = _send_request({'op': 'stats'}, timeout=10)['stats']
+    print(f"✓ 守护进程运行中（socket: {get_socket_path()}）")
+    print(f"  启动时间: {stats['started_at']}")
+    print(f"  浏览器已运行: {stats['browser_age'] / 3600:.1f} 小时（重启 {stats['browser_restarts']} 次）")
+    print(f"  已处理请求: {stats['requests']}（失败 {stats['errors']}）")
+    if stats['requests']:
+        print(f"  平均耗时: {stats['busy_seconds'] / stats['requests']:.2f} 秒")
+    print(f"  Cloudflare 验证: {stats['challenges']['challenges']} 次，"
+          f"共等待 {stats['challenges']['total_wait']:.1f} 秒")
+    return True
+
+
+if __name__ == '__main__':
+    FetchDaemon().serve()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+有界并发的页面获取池
+固定数量的工作线程从任务队列取任务，结果按完成顺序返回；调用方可以随时 stop()，
+尚未开始的任务直接丢弃。每个工作线程退出时释放自己在各后端持有的资源
+（Playwright 对象绑定创建它的线程，必须在同一线程关闭）
+"""
+
+import queue
+import threading
+from typing import Any, Callable, Iterable, Iterator, Optional, Tuple
+
+from config import CONF
+import fetch_backends
+
+# 默认并发数，可通过 config.json 的 fetch_workers 覆盖
+DEFAULT_WORKERS = 3
+
+_DONE = object()
+
+
+def get_worker_count(workers: Optional[int] = None) -> int:
+    """获取并发数（至少为 1）"""
+    return max(1, workers or CONF.get('fetch_workers', DEFAULT_WORKERS))
+
+
+class FetchPool:
+    """
+    有界并发获取池
+
+    用法：
+        pool = FetchPool(func, workers=3)
+        for item, result, error in pool.run(items):
+            ...
+            if enough:
+                pool.stop()
+    """
+
+    def __init__(self, func: Callable[[Any], Any], workers: Optional[int] = None, name: str = 'fetch'):
+        """
+        Args:
+            func: 任务函数 func(item) -> result，在工作线程中执行
+            workers: 工作线程数，None 则使用 fetch_workers 配置
+            name: 线程名前缀
+        """
+        self.func = func
+        self.workers = get_worker_count(workers)
+        self.name = name
+        self.stop_event = threading.Event()
+        self._tasks: 'queue.Queue' = queue.Queue()
+        self._results: 'queue.Queue' = queue.Queue()
+
+    def stop(self) -> None:
+        """停止派发新任务（正在执行的任务会执行完，但结果被丢弃）"""
+        self.stop_event.set()
+
+    def _worker(self) -> None:
+        try:
+            while not self.stop_event.is_set():
+                try:
+                    item = self._tasks.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    self._results.put((item, self.func(item), None))
+                except Exception as e:
+                    self._results.put((item, None, e))
+        finally:
+            try:
+                fetch_backends.release_thread_resources()
+            except Exception as e:
+                print(f"  [Pool] ⚠️  释放线程资源失败: {str(e)[:80]}")
+            self._results.put(_DONE)
+
+    def run(self, items: Iterable) -> Iterator[Tuple[Any, Any, Optional[Exception]]]:
+        """
+        执行所有任务，按完成顺序产出 (item, result, error)
+
+        error 不为 None 表示该任务失败；调用 stop() 后不再产出结果
+        """
+        items = list(items)
+        for item in items:
+            self._tasks.put(item)
+
+        threads = []
+        for i in range(min(self.workers, len(items))):
+            thread = threading.Thread(target=self._worker, name=f"{self.name}-{i + 1}", daemon=True)
+            thread.start()
+            threads.append(thread)
+
+        running = len(threads)
+        try:
+            while running:
+                result = self._results.get()
+                if result is _DONE:
+                    running -= 1
+                    continue
+                if not self.stop_event.is_set():
+                    yield result
+        finally:
+            # 调用方提前结束迭代时也要让工作线程退出
+            self.stop_event.set()
+            for thread in threads:
+                thread.join()
+
+
+def fetch_all(func: Callable[[Any], Any], items: Iterable, workers: Optional[int] = None,
+              name: str = 'fetch') -> Iterator[Tuple[Any, Any, Optional[Exception]]]:
+    """便捷函数：用一个新的获取池执行所有任务"""
+    return FetchPool(func, workers=workers, name=name).run(items)
+
+
+if __name__ == '__main__':
+    # 简单自测：模拟不同耗时的任务，拿到 5 个结果后停止
+    import random
+    import time
+
+    def slow_square(n):
+        time.sleep(random.uniform(0.01, 0.1))
+        if n == 3:
+            raise ValueError('模拟失败')
+        return n * n
+
+    pool = FetchPool(slow_square, workers=4)
+    got = 0
+    for item, result, error in pool.run(range(20)):
+        print(f"{item}: {result if error is None else error}")
+        got += 1
+        if got == 5:
+            pool.stop()
+    print(f"共 {got} 个结果")
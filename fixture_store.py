@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+页面夹具（fixture）存储
+录制模式下，fetch_backends.fetch() 通过任何后端拿到的真实页面都会按 URL 路径保存到夹具目录，
+之后由 mock_jable_server.py 在本地回放，爬取和下载路径不必经过线上站点和 Cloudflare 就能复现地测速
+
+目录布局（页面 gzip 压缩，可以直接 zcat 查看）：
+    fixtures/manifest.jsonl                 每录制一个页面追加一行（同一页面以最后一行为准）
+    fixtures/hot/index.html.gz              https://jable.tv/hot/
+    fixtures/hot/2/index.html.gz            https://jable.tv/hot/2/
+    fixtures/models/<id>/from=2.html.gz     https://jable.tv/models/<id>/?from=2
+    fixtures/videos/<id>/index.html.gz      https://jable.tv/videos/<id>/
+
+启用录制：
+    JABLE_RECORD_FIXTURES=./fixtures python main.py analyze update --db analytics.db
+或在 config.json 中设置 "fixture_record": true（目录由 fixture_dir 指定，默认 ./fixtures）
+"""
+
+import gzip
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import quote, urlsplit
+
+from config import CONF
+import html_cache
+
+# 夹具目录，可通过 config.json 的 fixture_dir 覆盖
+DEFAULT_FIXTURE_DIR = './fixtures'
+
+MANIFEST_FILE = 'manifest.jsonl'
+
+# 环境变量：设置后开启录制，值为夹具目录（设为 1 时使用 fixture_dir）
+RECORD_ENV = 'JABLE_RECORD_FIXTURES'
+
+_lock = threading.Lock()
+RECORD_STATS = {
+    'recorded': 0,
+    'bytes': 0,
+}
+
+
+def get_fixture_dir() -> str:
+    """当前的夹具目录（录制环境变量中的目录优先）"""
+    env_value = os.environ.get(RECORD_ENV, '')
+    if env_value and env_value.lower() not in ('1', 'true', 'yes'):
+        return env_value
+    return CONF.get('fixture_dir', DEFAULT_FIXTURE_DIR)
+
+
+def is_recording() -> bool:
+    """是否处于录制模式"""
+    return bool(os.environ.get(RECORD_ENV) or CONF.get('fixture_record', False))
+
+
+def fixture_key(url: str) -> str:
+    """
+    夹具键：规范化后的路径 + 查询参数，不含 scheme 和主机名
+    例如 https://jable.tv/models/abc?from=2 -> /models/abc/?from=2；
+    线上站点和本地回放服务器上的同一页面对应同一个键
+    """
+    parts = urlsplit(html_cache.normalize_url(url))
+    return parts.path + (f'?{parts.query}' if parts.query else '')
+
+
+def fixture_file(key: str) -> str:
+    """夹具键对应的相对文件路径"""
+    path, _, query = key.partition('?')
+    segments = [quote(segment, safe='-_.') for segment in path.strip('/').split('/') if segment]
+    name = quote(query, safe='=-_.') if query else 'index'
+    return os.path.join(*segments, f'{name}.html.gz') if segments else f'{name}.html.gz'
+
+
+def record(url: str, html: str, backend: str = '', seconds: Optional[float] = None,
+           fixture_dir: Optional[str] = None) -> str:
+    """
+    保存一个页面
+
+    Args:
+        url: 页面 URL
+        html: 页面 HTML
+        backend: 获取该页面的后端名称（来自页面缓存时为 cache）
+        seconds: 后端获取耗时（回放服务器可以按录制的耗时模拟延迟）
+        fixture_dir: 夹具目录（None 表示 get_fixture_dir()）
+
+    Returns:
+        夹具键
+    """
+    fixture_dir = fixture_dir or get_fixture_dir()
+    key = fixture_key(url)
+    relative_path = fixture_file(key)
+    path = os.path.join(fixture_dir, relative_path)
+    data = html.encode('utf-8')
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with gzip.open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+    entry = {
+        'key': key,
+        'url': url,
+        'file': relative_path,
+        'backend': backend,
+        'seconds': round(seconds, 3) if seconds is not None else None,
+        'bytes': len(data),
+        'fingerprint': html_cache.content_fingerprint(html),
+        'recorded_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+    # 清单只追加，多个线程或进程同时录制也不会互相覆盖
+    with _lock:
+        with open(os.path.join(fixture_dir, MANIFEST_FILE), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        RECORD_STATS['recorded'] += 1
+        RECORD_STATS['bytes'] += len(data)
+    return key
+
+
+def load_manifest(fixture_dir: Optional[str] = None) -> Dict[str, Dict]:
+    """
+    读取清单
+
+    Returns:
+        {夹具键: 最后一次录制的条目}
+    """
+    path = os.path.join(fixture_dir or get_fixture_dir(), MANIFEST_FILE)
+    manifest = {}
+    if not os.path.exists(path):
+        return manifest
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # 录制被中断时最后一行可能不完整
+                continue
+            manifest[entry['key']] = entry
+    return manifest
+
+
+def exists(url: str, fixture_dir: Optional[str] = None) -> bool:
+    """页面是否已经录制过"""
+    return os.path.exists(os.path.join(fixture_dir or get_fixture_dir(), fixture_file(fixture_key(url))))
+
+
+def load(url_or_key: str, fixture_dir: Optional[str] = None) -> Optional[str]:
+    """
+    读取一个页面
+
+    Args:
+        url_or_key: 页面 URL 或夹具键
+        fixture_dir: 夹具目录
+
+    Returns:
+        页面 HTML，没有录制过时返回 None
+    """
+    key = url_or_key if url_or_key.startswith('/') else fixture_key(url_or_key)
+    path = os.path.join(fixture_dir or get_fixture_dir(), fixture_file(key))
+    if not os.path.exists(path):
+        return None
+    with gzip.open(path, 'rb') as f:
+        return f.read().decode('utf-8')
+
+
+def import_file(url: str, html_path: str, fixture_dir: Optional[str] = None) -> str:
+    """把保存的 HTML 文件（例如 debug_model_page.html）作为 url 的夹具导入"""
+    with open(html_path, 'r', encoding='utf-8') as f:
+        return record(url, f.read(), backend='import', fixture_dir=fixture_dir)
+
+
+def print_record_stats() -> None:
+    """打印本次运行的录制统计"""
+    with _lock:
+        stats = dict(RECORD_STATS)
+    if stats['recorded']:
+        print(f"  夹具录制: {stats['recorded']} 个页面，{stats['bytes'] / 1024 / 1024:.1f} MB "
+              f"-> {get_fixture_dir()}")
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="manage recorded page fixtures")
+    parser.add_argument("--dir", default=None, help=f"fixture directory (default: {DEFAULT_FIXTURE_DIR})")
+    parser.add_argument("--import", dest="import_page", nargs=2, metavar=("URL", "HTML_FILE"),
+                        help="import a saved HTML file as the fixture for URL")
+    args = parser.parse_args()
+
+    fixture_dir = args.dir or get_fixture_dir()
+    if args.import_page:
+        url, html_path = args.import_page
+        key = import_file(url, html_path, fixture_dir)
+        print(f"✓ 已导入 {key} <- {html_path}")
+
+    manifest = load_manifest(fixture_dir)
+    counts = {}
+    for key in manifest:
+        route = key.strip('/').split('/')[0] or '/'
+        counts[route] = counts.get(route, 0) + 1
+    total_bytes = sum(entry['bytes'] for entry in manifest.values())
+    print(f"夹具目录: {fixture_dir}")
+    print(f"共 {len(manifest)} 个页面，{total_bytes / 1024 / 1024:.1f} MB（未压缩）")
+    for route, count in sorted(counts.items()):
+        print(f"  /{route}/: {count}")
@@ -5,9 +5,8 @@
 """
 
 import os
-import re
-from bs4 import BeautifulSoup
 
+import page_parser
 import utils
 import video_crawler
 from config import CONF
@@ -29,86 +28,28 @@ def get_hot_videos(min_likes=2000):
     print(f"正在获取热门页面: {url}")
 
     try:
-        html = utils.scrapingant_requests_get(url, retry=5)
+        html = utils.scrapingant_requests_get(url, retry=5, kind='list')
         print(f"✓ 页面获取成功")
     except Exception as e:
         print(f"✗ 页面获取失败: {e}")
         return []
 
-    soup = BeautifulSoup(html, 'html.parser')
+    cards = page_parser.parse_page(html).videos
 
-    # 查找所有视频容器
-    video_containers = soup.select('div.video-img-box')
-
-    if not video_containers:
+    if not cards:
         print("⚠️  未找到视频容器")
         return []
 
-    print(f"找到 {len(video_containers)} 个视频")
-
-    videos = []
-
-    for container in video_containers:
-        try:
-            # 提取视频链接
-            link_tag = container.select_one('a[href*="/videos/"]')
-            if not link_tag:
-                continue
-
-            video_url = link_tag.get('href', '')
-            if not video_url:
-                continue
-
-            # 提取视频 ID
-            video_id = video_url.split('/')[-2] if '/' in video_url else ''
-            if not video_id:
-                continue
-
-            # 提取标题
-            title_tag = container.select_one('h6.title a')
-            title = title_tag.get_text(strip=True) if title_tag else ''
-
-            # 提取统计数据（观看数和点赞数）
-            sub_title = container.select_one('p.sub-title')
-
-            views = 0
-            likes = 0
-
-            if sub_title:
-                text = sub_title.get_text()
-
-                # 按行分割，提取每行的数字
-                lines = text.strip().split('\n')
-                numbers = []
-
-                for line in lines:
-                    line = line.strip()
-                    if line:
-                        # 去除所有空格和制表符
-                        num_str = re.sub(r'\s+', '', line)
-                        if num_str.isdigit():
-                            numbers.append(int(num_str))
-
-                # 第一个数字是观看数，第二个是点赞数
-                if len(numbers) >= 2:
-                    views = numbers[0]
-                    likes = numbers[1]
-
-            # 过滤低于阈值的视频
-            if likes < min_likes:
-                continue
-
-            videos.append({
-                'id': video_id,
-                'url': video_url,
-                'title': title,
-                'likes': likes,
-                'views': views
-            })
+    print(f"找到 {len(cards)} 个视频")
 
-        except Exception as e:
-            print(f"⚠️  解析视频失败: {e}")
-            continue
+    # 过滤低于阈值的视频
+    videos = [{
+        'id': card.video_id,
+        'url': card.url,
+        'title': card.title,
+        'likes': card.likes,
+        'views': card.views
+    } for card in cards if card.likes >= min_likes]
 
     # 按点赞数降序排列
     videos.sort(key=lambda x: x['likes'], reverse=True)
@@ -154,13 +95,14 @@ def check_video_downloaded(video_id):
         return False
 
 
-def download_hot_videos(top_n=4, min_likes=2000):
+def download_hot_videos(top_n=4, min_likes=2000, enqueue=False):
     """
     下载热门视频中点赞数最高的前 N 个
 
     Args:
         top_n: 下载数量（默认 4）
         min_likes: 最小点赞数阈值（默认 2000）
+        enqueue: 只加入下载任务队列，由下载服务执行
     """
     print("\n" + "=" * 80)
     print(f"开始下载热门视频（Top {top_n}，最小点赞数 {min_likes:,}）")
@@ -185,6 +127,12 @@ def download_hot_videos(top_n=4, min_likes=2000):
         print(f"{i}. {video['id']:<15} 👍 {video['likes']:>6,}   {title_short}")
     print("-" * 80)
 
+    if enqueue:
+        import job_queue
+        pending = [video['url'] for video in top_videos if not check_video_downloaded(video['id'])]
+        job_queue.enqueue_urls(pending, source='hot')
+        return
+
     # 开始下载
     downloaded_count = 0
     skipped_count = 0
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+页面 HTML 磁盘缓存
+按规范化 URL 缓存压缩后的 HTML，按页面类型设置有效期，并记录内容指纹。
+fetch_backends.fetch() 在调用任何后端之前先查缓存，
+同一次运行（以及有效期内的后续运行）不会为同一个受 Cloudflare 保护的页面付两次代价
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, Optional
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from config import CONF
+
+# 缓存数据库路径，可通过 config.json 的 html_cache_path 覆盖
+DEFAULT_CACHE_PATH = './.html_cache.db'
+
+# 各页面类型的默认有效期（秒），可通过 html_cache_ttl 覆盖
+# 视频页包含带时间戳的 m3u8 链接，有效期要短；下载视频时不读缓存，缓存的视频页只用于解析演员等元数据
+DEFAULT_TTL = {
+    'video': 600,
+    'list': 3600,
+    'default': 300,
+}
+
+LIST_PATH_PREFIXES = ('/models/', '/tags/', '/categories/', '/search/', '/hot/', '/latest-updates/')
+
+_stats_lock = threading.Lock()
+CACHE_STATS = {
+    'hits': 0,
+    'misses': 0,
+    'stores': 0,
+    'bytes_saved': 0,
+}
+
+_pruned = False
+
+
+def is_enabled() -> bool:
+    """缓存是否启用（config.json 的 html_cache_enabled，默认启用）"""
+    return CONF.get('html_cache_enabled', True)
+
+
+def normalize_url(url: str) -> str:
+    """
+    规范化 URL：小写 scheme/host，路径补全结尾斜杠，查询参数排序，去掉锚点
+    例如 https://JABLE.tv/models/abc?from=2 -> https://jable.tv/models/abc/?from=2
+    """
+    parts = urlsplit(url.strip())
+    path = parts.path or '/'
+    if not path.endswith('/'):
+        path += '/'
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, query, ''))
+
+
+def classify_url(url: str) -> str:
+    """判断页面类型：video / list / default"""
+    path = urlsplit(url).path
+    if path.startswith('/videos/'):
+        return 'video'
+    if path == '/' or path.startswith(LIST_PATH_PREFIXES):
+        return 'list'
+    return 'default'
+
+
+def get_ttl(page_class: str) -> float:
+    ttl = dict(DEFAULT_TTL)
+    ttl.update(CONF.get('html_cache_ttl', {}))
+    return ttl.get(page_class, ttl['default'])
+
+
+def content_fingerprint(html: str) -> str:
+    """HTML 内容指纹"""
+    return hashlib.sha1(html.encode('utf-8')).hexdigest()
+
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(CONF.get('html_cache_path', DEFAULT_CACHE_PATH), timeout=30)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS pages (
+            url TEXT PRIMARY KEY,
+            page_class TEXT NOT NULL,
+            fetched_at REAL NOT NULL,
+            content_hash TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            body BLOB NOT NULL
+        )
+    ''')
+    return conn
+
+
+def _count(key: str, value: int = 1) -> None:
+    with _stats_lock:
+        CACHE_STATS[key] += value
+
+
+def get(url: str, max_age: Optional[float] = None) -> Optional[str]:
+    """
+    读取缓存
+
+    Args:
+        url: 页面 URL
+        max_age: 最长缓存时间（秒），None 则按页面类型的有效期
+
+    Returns:
+        缓存的 HTML；未命中或已过期返回 None
+    """
+    if not is_enabled():
+        return None
+
+    key = normalize_url(url)
+    if max_age is None:
+        max_age = get_ttl(classify_url(key))
+
+    conn = _connect()
+    try:
+        row = conn.execute('SELECT fetched_at, size, body FROM pages WHERE url = ?', (key,)).fetchone()
+    finally:
+        conn.close()
+
+    if not row or time.time() - row[0] > max_age:
+        _count('misses')
+        return None
+
+    _count('hits')
+    _count('bytes_saved', row[1])
+    return zlib.decompress(row[2]).decode('utf-8')
+
+
+def put(url: str, html: str) -> str:
+    """
+    写入缓存
+
+    Returns:
+        内容指纹
+    """
+    global _pruned
+
+    fingerprint = content_fingerprint(html)
+    if not is_enabled():
+        return fingerprint
+
+    key = normalize_url(url)
+    body = zlib.compress(html.encode('utf-8'), 6)
+
+    conn = _connect()
+    try:
+        with conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO pages (url, page_class, fetched_at, content_hash, size, body)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (key, classify_url(key), time.time(), fingerprint, len(html), body))
+
+            # 每个进程清理一次过期很久的条目，避免缓存无限增长
+            if not _pruned:
+                _pruned = True
+                max_ttl = max(get_ttl(c) for c in DEFAULT_TTL)
+                conn.execute('DELETE FROM pages WHERE fetched_at < ?', (time.time() - max_ttl * 24,))
+    finally:
+        conn.close()
+
+    _count('stores')
+    return fingerprint
+
+
+def get_fingerprint(url: str) -> Optional[str]:
+    """读取缓存中页面的内容指纹（不检查有效期）"""
+    if not is_enabled():
+        return None
+    conn = _connect()
+    try:
+        row = conn.execute('SELECT content_hash FROM pages WHERE url = ?', (normalize_url(url),)).fetchone()
+    finally:
+        conn.close()
+    return row[0] if row else None
+
+
+def invalidate(url: str) -> None:
+    """删除某个页面的缓存"""
+    if not is_enabled():
+        return
+    conn = _connect()
+    try:
+        with conn:
+            conn.execute('DELETE FROM pages WHERE url = ?', (normalize_url(url),))
+    finally:
+        conn.close()
+
+
+def get_cache_stats() -> Dict:
+    """返回本次运行的缓存统计"""
+    with _stats_lock:
+        return dict(CACHE_STATS)
+
+
+def print_cache_stats() -> None:
+    """打印本次运行的缓存命中情况"""
+    stats = get_cache_stats()
+    total = stats['hits'] + stats['misses']
+    if not total:
+        return
+    print(f"  页面缓存: 命中 {stats['hits']}/{total} ({stats['hits'] / total * 100:.1f}%)，"
+          f"节省 {stats['bytes_saved'] / 1024:.0f} KB 页面获取")
@@ -0,0 +1,459 @@
+#!/usr/bin/env python3
+"""
+持久化下载任务队列
+视频下载任务保存在 SQLite 中（状态、尝试次数、最后错误、优先级、租约到期时间），
+subscription --sync-videos / videos / hot 加 --enqueue 后只入队，由 serve 模式的 K 个工作循环消费。
+进程崩溃不会丢任务：正在执行的任务租约到期后会被其他工作循环重新领取，
+视频本身的断点续传仍由下载目录里的 .log 记录负责
+
+多台主机共享队列：一台运行 `serve --listen 0.0.0.0:8765` 作为队列服务，
+其他主机把 job_queue_backend 设为 "tcp://<队列服务地址>:8765" 后运行 `serve --workers N`
+
+使用：
+    python main.py subscription --sync-videos --enqueue   # 只入队
+    python main.py serve --workers 2                      # 启动下载服务
+    python main.py serve --status                         # 查看队列状态
+"""
+
+import os
+import socket
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+from config import CONF
+
+# 队列数据库路径，可通过 config.json 的 job_queue_path 覆盖
+DEFAULT_QUEUE_PATH = './jable_jobs.db'
+
+# 租约时长（秒）：工作循环每 LEASE_SECONDS / 3 续约一次，超过租约未续约的任务视为执行者已死
+LEASE_SECONDS = 120
+
+# 单个任务最多尝试次数
+MAX_ATTEMPTS = 5
+
+# 失败后重新可领取前的等待（秒），按尝试次数指数增长
+RETRY_BASE_DELAY = 60
+RETRY_MAX_DELAY = 3600
+
+# 队列为空时的轮询间隔（秒）
+POLL_INTERVAL = 10
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS jobs (
+        id INTEGER PRIMARY KEY,
+        video_id TEXT NOT NULL UNIQUE,
+        url TEXT NOT NULL,
+        source TEXT,
+        priority INTEGER NOT NULL DEFAULT 0,
+        state TEXT NOT NULL DEFAULT 'pending',      -- pending / running / done / failed
+        attempts INTEGER NOT NULL DEFAULT 0,
+        max_attempts INTEGER NOT NULL,
+        last_error TEXT,
+        lease_owner TEXT,
+        lease_expires REAL,
+        available_at REAL NOT NULL,
+        created_at REAL NOT NULL,
+        updated_at REAL NOT NULL,
+        finished_at REAL
+    );
+    CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs(state, priority DESC, id);
+
+    -- 共享片库：各主机完成的下载，规划同步时一并视为「已有」
+    CREATE TABLE IF NOT EXISTS library (
+        video_id TEXT PRIMARY KEY,
+        host TEXT NOT NULL,
+        path TEXT,
+        size INTEGER,
+        finished_at REAL NOT NULL
+    );
+'''
+
+JOB_STATES = ('pending', 'running', 'done', 'failed')
+
+
+def video_id_from_url(url: str) -> str:
+    return url.rstrip('/').split('/')[-1].lower()
+
+
+def _row_to_job(row: sqlite3.Row) -> Dict:
+    return dict(row) if row else None
+
+
+class JobQueue:
+    """SQLite 下载任务队列（跨进程共享，每次操作独立连接）"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or CONF.get('job_queue_path', DEFAULT_QUEUE_PATH)
+        conn = self._connect()
+        conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.executescript(SCHEMA)
+        return conn
+
+    def enqueue(self, url: str, priority: int = 0, source: str = '',
+                max_attempts: int = MAX_ATTEMPTS) -> bool:
+        """
+        加入下载任务；同一个视频已在队列中时只提升优先级，已失败的任务重新置为待领取
+
+        Returns:
+            是否新增或重新激活了任务
+        """
+        video_id = video_id_from_url(url)
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('SELECT state FROM jobs WHERE video_id = ?', (video_id,)).fetchone()
+            if row is None:
+                conn.execute('''
+                    INSERT INTO jobs (video_id, url, source, priority, max_attempts, available_at, created_at, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (video_id, url, source, priority, max_attempts, now, now, now))
+                changed = True
+            elif row['state'] == 'failed':
+                conn.execute('''
+                    UPDATE jobs SET state = 'pending', attempts = 0, priority = MAX(priority, ?),
+                                    available_at = ?, updated_at = ?
+                    WHERE video_id = ?
+                ''', (priority, now, now, video_id))
+                changed = True
+            else:
+                conn.execute('UPDATE jobs SET priority = MAX(priority, ?), updated_at = ? WHERE video_id = ?',
+                             (priority, now, video_id))
+                changed = False
+            conn.execute('COMMIT')
+        except Exception:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+        return changed
+
+    def claim(self, worker_id: str, lease_seconds: float = LEASE_SECONDS) -> Optional[Dict]:
+        """
+        领取一个任务：待领取的任务，或者租约已过期（执行者已死）的任务
+
+        Returns:
+            任务字典；没有可领取的任务时返回 None
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            # 反复导致执行者崩溃的任务（租约过期且已用完尝试次数）直接标记失败
+            conn.execute('''
+                UPDATE jobs SET state = 'failed', last_error = 'lease expired too many times',
+                                lease_owner = NULL, lease_expires = NULL, updated_at = ?
+                WHERE state = 'running' AND lease_expires < ? AND attempts >= max_attempts
+            ''', (now, now))
+            row = conn.execute('''
+                SELECT * FROM jobs
+                WHERE (state = 'pending' AND available_at <= ?)
+                   OR (state = 'running' AND lease_expires < ?)
+                ORDER BY priority DESC, id
+                LIMIT 1
+            ''', (now, now)).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return None
+
+            if row['state'] == 'running':
+                print(f"  [Queue] ♻️  {row['video_id']} 的租约已过期（原执行者 {row['lease_owner']}），重新分配")
+
+            conn.execute('''
+                UPDATE jobs SET state = 'running', attempts = attempts + 1, lease_owner = ?,
+                                lease_expires = ?, updated_at = ?
+                WHERE id = ?
+            ''', (worker_id, now + lease_seconds, now, row['id']))
+            conn.execute('COMMIT')
+        except Exception:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+        job = _row_to_job(row)
+        job.update(state='running', attempts=row['attempts'] + 1, lease_owner=worker_id)
+        return job
+
+    def heartbeat(self, job_id: int, worker_id: str, lease_seconds: float = LEASE_SECONDS) -> bool:
+        """续约；返回 False 表示任务已被重新分配给其他执行者"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            cursor = conn.execute('''
+                UPDATE jobs SET lease_expires = ?, updated_at = ?
+                WHERE id = ? AND lease_owner = ? AND state = 'running'
+            ''', (now + lease_seconds, now, job_id, worker_id))
+            return cursor.rowcount == 1
+        finally:
+            conn.close()
+
+    def complete(self, job_id: int, worker_id: str) -> bool:
+        """标记任务完成"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            cursor = conn.execute('''
+                UPDATE jobs SET state = 'done', lease_owner = NULL, lease_expires = NULL,
+                                last_error = NULL, finished_at = ?, updated_at = ?
+                WHERE id = ? AND lease_owner = ?
+            ''', (now, now, job_id, worker_id))
+            return cursor.rowcount == 1
+        finally:
+            conn.close()
+
+    def fail(self, job_id: int, worker_id: str, error: str) -> str:
+        """
+        记录任务失败：未达最大尝试次数时退避后重新待领取，否则标记为 failed
+
+        Returns:
+            任务的新状态
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('SELECT attempts, max_attempts FROM jobs WHERE id = ? AND lease_owner = ?',
+                               (job_id, worker_id)).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return 'lost'
+
+            if row['attempts'] >= row['max_attempts']:
+                state, available_at = 'failed', now
+            else:
+                state = 'pending'
+                available_at = now + min(RETRY_BASE_DELAY * 2 ** (row['attempts'] - 1), RETRY_MAX_DELAY)
+
+            conn.execute('''
+                UPDATE jobs SET state = ?, last_error = ?, lease_owner = NULL, lease_expires = NULL,
+                                available_at = ?, updated_at = ?
+                WHERE id = ?
+            ''', (state, error[:500], available_at, now, job_id))
+            conn.execute('COMMIT')
+        except Exception:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+        return state
+
+    def retry_failed(self) -> int:
+        """把所有 failed 任务重新置为待领取，返回数量"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            return conn.execute('''
+                UPDATE jobs SET state = 'pending', attempts = 0, available_at = ?, updated_at = ?
+                WHERE state = 'failed'
+            ''', (now, now)).rowcount
+        finally:
+            conn.close()
+
+    def get_stats(self) -> Dict[str, int]:
+        """各状态的任务数"""
+        conn = self._connect()
+        try:
+            counts = dict(conn.execute('SELECT state, COUNT(*) FROM jobs GROUP BY state').fetchall())
+        finally:
+            conn.close()
+        return {state: counts.get(state, 0) for state in JOB_STATES}
+
+    def report_finished(self, video_id: str, host: str, path: Optional[str] = None,
+                        size: Optional[int] = None) -> None:
+        """把完成的下载登记到共享片库"""
+        conn = self._connect()
+        try:
+            conn.execute('''
+                INSERT OR REPLACE INTO library (video_id, host, path, size, finished_at)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (video_id.lower(), host, path, size, time.time()))
+        finally:
+            conn.close()
+
+    def get_library_ids(self) -> List[str]:
+        """共享片库中的所有视频 ID"""
+        conn = self._connect()
+        try:
+            return [row[0] for row in conn.execute('SELECT video_id FROM library')]
+        finally:
+            conn.close()
+
+    def list_jobs(self, state: Optional[str] = None, limit: int = 20) -> List[Dict]:
+        """列出任务（按优先级）"""
+        conn = self._connect()
+        try:
+            if state:
+                rows = conn.execute('SELECT * FROM jobs WHERE state = ? ORDER BY priority DESC, id LIMIT ?',
+                                    (state, limit)).fetchall()
+            else:
+                rows = conn.execute('SELECT * FROM jobs ORDER BY priority DESC, id LIMIT ?', (limit,)).fetchall()
+        finally:
+            conn.close()
+        return [_row_to_job(row) for row in rows]
+
+
+def use_job_queue(args=None) -> bool:
+    """命令是否只入队（--enqueue 参数或 config.json 的 use_job_queue）"""
+    return bool(getattr(args, 'enqueue', False) or CONF.get('use_job_queue', False))
+
+
+def get_job_queue():
+    """
+    按 config.json 的 job_queue_backend 选择队列后端：
+    - "sqlite"（默认）：本机 SQLite 文件
+    - "tcp://host:port"：连接 `serve --listen` 启动的队列服务，多台主机共享同一个队列
+    """
+    backend = CONF.get('job_queue_backend', 'sqlite')
+    if backend.startswith('tcp://'):
+        import job_queue_remote
+        return job_queue_remote.RemoteJobQueue(backend)
+    return JobQueue()
+
+
+def enqueue_urls(urls: List[str], source: str = '', priority: int = 0) -> int:
+    """
+    批量入队，列表中靠前的优先级更高
+
+    Returns:
+        新增（或重新激活）的任务数
+    """
+    queue = get_job_queue()
+    added = 0
+    for index, url in enumerate(urls):
+        added += queue.enqueue(url, priority=priority + len(urls) - index, source=source)
+    stats = queue.get_stats()
+    print(f"✓ 已入队 {added} 个新任务（队列中待处理 {stats['pending']}，执行中 {stats['running']}）")
+    print("   使用 `python main.py serve --workers N` 启动下载服务")
+    return added
+
+
+# ==================== 下载服务 ====================
+
+def _make_worker_id(index: int) -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{index}"
+
+
+def run_worker(queue, worker_id: str, stop_event: threading.Event,
+               exit_when_empty: bool = False) -> None:
+    """
+    单个工作循环：领取任务 -> 下载（后台线程定期续约） -> 完成/失败
+
+    Args:
+        queue: 任务队列
+        worker_id: 执行者标识
+        stop_event: 停止信号
+        exit_when_empty: 队列为空时退出（否则持续轮询）
+    """
+    import fetch_backends
+    import video_crawler
+
+    download_interval = CONF.get("downloadInterval", 1)
+    try:
+        while not stop_event.is_set():
+            job = queue.claim(worker_id)
+            if job is None:
+                if exit_when_empty:
+                    break
+                stop_event.wait(POLL_INTERVAL)
+                continue
+
+            print(f"\n[{worker_id}] ▶ {job['video_id']}（第 {job['attempts']} 次尝试）")
+
+            # 下载期间定期续约，防止长时间下载被当作死任务重新分配
+            done = threading.Event()
+
+            def keep_alive():
+                while not done.wait(LEASE_SECONDS / 3):
+                    try:
+                        alive = queue.heartbeat(job['id'], worker_id)
+                    except Exception as e:
+                        # 队列服务暂时不可达时继续下载，下次心跳再试
+                        print(f"  [{worker_id}] ⚠️  心跳失败: {str(e)[:80]}")
+                        continue
+                    if not alive:
+                        print(f"  [{worker_id}] ⚠️  {job['video_id']} 的租约已丢失")
+                        return
+
+            heartbeat_thread = threading.Thread(target=keep_alive, daemon=True)
+            heartbeat_thread.start()
+            try:
+                # 直接用下载函数写出的路径，不再按番号去输出目录里模糊查找（mide-938 会误中 mide-938nggn）
+                path = video_crawler.download_by_video_url(job['url'])
+                # 没拿到下载链接算失败，不能登记到共享片库（否则所有主机都会永久跳过它）
+                if path is None:
+                    raise Exception('获取下载链接失败')
+            except Exception as e:
+                state = queue.fail(job['id'], worker_id, str(e))
+                print(f"[{worker_id}] ✗ {job['video_id']} 失败（{state}）: {str(e)[:100]}")
+            else:
+                queue.report_finished(job['video_id'], socket.gethostname(), path, os.path.getsize(path))
+                queue.complete(job['id'], worker_id)
+                print(f"[{worker_id}] ✓ {job['video_id']} 完成")
+            finally:
+                done.set()
+                heartbeat_thread.join()
+
+            stop_event.wait(download_interval)
+    finally:
+        fetch_backends.release_thread_resources()
+
+
+def serve(workers: int = 1, exit_when_empty: bool = False) -> None:
+    """
+    启动下载服务：K 个工作循环并发消费任务队列（阻塞，直到 Ctrl+C 或队列为空）
+    """
+    queue = get_job_queue()
+    stop_event = threading.Event()
+
+    print("=" * 80)
+    print(f"🚀 下载服务启动: {workers} 个工作循环，队列 {queue.path}")
+    print_queue_status(queue)
+    print("=" * 80)
+
+    threads = []
+    for index in range(workers):
+        thread = threading.Thread(target=run_worker, name=f"download-{index + 1}",
+                                  args=(queue, _make_worker_id(index + 1), stop_event, exit_when_empty))
+        thread.start()
+        threads.append(thread)
+
+    try:
+        while any(thread.is_alive() for thread in threads):
+            for thread in threads:
+                thread.join(timeout=1)
+    except KeyboardInterrupt:
+        print("\n收到中断信号，等待正在下载的任务结束（未完成的任务租约到期后会被重新领取）...")
+        stop_event.set()
+        for thread in threads:
+            thread.join()
+
+    print("\n✓ 下载服务已停止")
+    print_queue_status(queue)
+
+
+def print_queue_status(queue=None) -> None:
+    """打印队列状态"""
+    queue = queue or get_job_queue()
+    stats = queue.get_stats()
+    print(f"任务队列: 待处理 {stats['pending']} | 执行中 {stats['running']} | "
+          f"完成 {stats['done']} | 失败 {stats['failed']}")
+    for job in queue.list_jobs('running', limit=10):
+        print(f"  ▶ {job['video_id']:<20} {job['lease_owner']}  "
+              f"租约剩余 {max(0, job['lease_expires'] - time.time()):.0f} 秒")
+    for job in queue.list_jobs('failed', limit=10):
+        print(f"  ✗ {job['video_id']:<20} {(job['last_error'] or '')[:60]}")
+
+
+if __name__ == '__main__':
+    print_queue_status()
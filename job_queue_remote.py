@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+下载任务队列的 TCP 后端
+队列服务（`python main.py serve --listen HOST:PORT`）持有 SQLite 队列，
+其他主机上的工作循环通过 RemoteJobQueue 领取任务、续约、上报结果和登记共享片库。
+接口与 job_queue.JobQueue 相同，工作循环不感知后端差异。
+
+协议：每个连接发送一行 JSON 请求，返回一行 JSON 响应
+    {"op": "claim", "args": {"worker_id": "..."}, "token": "..."}  ->  {"ok": true, "result": {...}}
+"""
+
+import json
+import socket
+import socketserver
+import threading
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+from config import CONF
+import job_queue
+
+# 默认监听端口
+DEFAULT_PORT = 8765
+
+# 允许远程调用的队列方法
+REMOTE_METHODS = (
+    'enqueue', 'claim', 'heartbeat', 'complete', 'fail', 'retry_failed',
+    'get_stats', 'list_jobs', 'report_finished', 'get_library_ids',
+)
+
+
+def parse_address(address: str):
+    """解析 tcp://host:port 或 host:port"""
+    if '://' not in address:
+        address = 'tcp://' + address
+    parts = urlsplit(address)
+    return parts.hostname or '127.0.0.1', parts.port or DEFAULT_PORT
+
+
+class RemoteJobQueue:
+    """通过 TCP 访问队列服务的客户端（接口同 job_queue.JobQueue）"""
+
+    def __init__(self, address: str, token: Optional[str] = None, timeout: float = 30):
+        self.host, self.port = parse_address(address)
+        self.path = f"tcp://{self.host}:{self.port}"
+        self.token = token if token is not None else CONF.get('job_queue_token', '')
+        self.timeout = timeout
+
+    def _call(self, op: str, **args):
+        payload = {'op': op, 'args': args, 'token': self.token}
+        with socket.create_connection((self.host, self.port), timeout=self.timeout) as sock:
+            sock.sendall(json.dumps(payload, ensure_ascii=False).encode('utf-8') + b'\n')
+            chunks = []
+            while True:
+                chunk = sock.recv(65536)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                if chunk.endswith(b'\n'):
+                    break
+
+        response = json.loads(b''.join(chunks).decode('utf-8'))
+        if not response.get('ok'):
+            raise Exception(f"Queue server error: {response.get('error', 'unknown error')}")
+        return response.get('result')
+
+    def enqueue(self, url: str, priority: int = 0, source: str = '',
+                max_attempts: int = job_queue.MAX_ATTEMPTS) -> bool:
+        return self._call('enqueue', url=url, priority=priority, source=source, max_attempts=max_attempts)
+
+    def claim(self, worker_id: str, lease_seconds: float = job_queue.LEASE_SECONDS) -> Optional[Dict]:
+        return self._call('claim', worker_id=worker_id, lease_seconds=lease_seconds)
+
+    def heartbeat(self, job_id: int, worker_id: str, lease_seconds: float = job_queue.LEASE_SECONDS) -> bool:
+        return self._call('heartbeat', job_id=job_id, worker_id=worker_id, lease_seconds=lease_seconds)
+
+    def complete(self, job_id: int, worker_id: str) -> bool:
+        return self._call('complete', job_id=job_id, worker_id=worker_id)
+
+    def fail(self, job_id: int, worker_id: str, error: str) -> str:
+        return self._call('fail', job_id=job_id, worker_id=worker_id, error=error)
+
+    def retry_failed(self) -> int:
+        return self._call('retry_failed')
+
+    def get_stats(self) -> Dict[str, int]:
+        return self._call('get_stats')
+
+    def list_jobs(self, state: Optional[str] = None, limit: int = 20) -> List[Dict]:
+        return self._call('list_jobs', state=state, limit=limit)
+
+    def report_finished(self, video_id: str, host: str, path: Optional[str] = None,
+                        size: Optional[int] = None) -> None:
+        return self._call('report_finished', video_id=video_id, host=host, path=path, size=size)
+
+    def get_library_ids(self) -> List[str]:
+        return self._call('get_library_ids')
+
+
+class _QueueRequestHandler(socketserver.StreamRequestHandler):
+    """处理单个客户端请求"""
+
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline().decode('utf-8'))
+            response = self.server.queue_server.dispatch(request)
+        except Exception as e:
+            response = {'ok': False, 'error': str(e)[:500]}
+        self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8') + b'\n')
+
+
+class _ThreadingQueueServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class QueueServer:
+    """
+    队列服务：把本机 SQLite 队列通过 TCP 提供给其他主机
+    （SQLite 的 BEGIN IMMEDIATE 保证并发领取不会重复分配）
+    """
+
+    def __init__(self, address: str = f'0.0.0.0:{DEFAULT_PORT}', queue: Optional[job_queue.JobQueue] = None,
+                 token: Optional[str] = None):
+        self.host, self.port = parse_address(address)
+        self.queue = queue or job_queue.JobQueue()
+        self.token = token if token is not None else CONF.get('job_queue_token', '')
+        self.server = None
+
+    def dispatch(self, request: Dict) -> Dict:
+        """分发请求"""
+        if self.token and request.get('token') != self.token:
+            return {'ok': False, 'error': 'invalid token'}
+
+        op = request.get('op')
+        if op not in REMOTE_METHODS:
+            return {'ok': False, 'error': f'unknown op: {op}'}
+        return {'ok': True, 'result': getattr(self.queue, op)(**request.get('args', {}))}
+
+    def start(self) -> None:
+        """在后台线程启动（用于测试）"""
+        self.server = _ThreadingQueueServer((self.host, self.port), _QueueRequestHandler)
+        self.server.queue_server = self
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self) -> None:
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def serve(self) -> None:
+        """前台运行（阻塞，直到 Ctrl+C）"""
+        self.server = _ThreadingQueueServer((self.host, self.port), _QueueRequestHandler)
+        self.server.queue_server = self
+
+        print("=" * 80)
+        print(f"🚀 下载队列服务启动: tcp://{self.host}:{self.port}（队列 {self.queue.path}）")
+        if not self.token:
+            print("⚠️  未设置 job_queue_token，任何能连上该端口的主机都可以操作队列")
+        job_queue.print_queue_status(self.queue)
+        print("=" * 80)
+
+        try:
+            self.server.serve_forever()
+        except KeyboardInterrupt:
+            print("\n收到中断信号")
+        finally:
+            self.server.server_close()
+            print("✓ 队列服务已停止")
+
+
+if __name__ == '__main__':
+    # 本机自测：启动一个临时队列服务，两个「主机」的工作者通过 TCP 领取任务，
+    # 其中一个领取后不再续约（模拟宕机），它的任务租约到期后被另一个领取
+    import os
+    import tempfile
+    import time
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'jobs.db')
+    server = QueueServer('127.0.0.1:0', queue=job_queue.JobQueue(db_path), token='')
+    server.start()
+    client = RemoteJobQueue(f'127.0.0.1:{server.port}', token='')
+
+    for vid in ('abc-001', 'abc-002'):
+        client.enqueue(f'https://jable.tv/videos/{vid}/')
+
+    dead = client.claim('host-a:1', lease_seconds=0.5)
+    alive = client.claim('host-b:1', lease_seconds=60)
+    print(f"host-a 领取 {dead['video_id']}（随后宕机），host-b 领取 {alive['video_id']}")
+    client.complete(alive['id'], 'host-b:1')
+    client.report_finished(alive['video_id'], 'host-b')
+
+    time.sleep(0.6)
+    moved = client.claim('host-b:1', lease_seconds=60)
+    print(f"host-b 接管 {moved['video_id']}（第 {moved['attempts']} 次尝试）")
+    client.complete(moved['id'], 'host-b:1')
+    print(f"队列: {client.get_stats()}，共享片库: {client.get_library_ids()}")
+    server.stop()
@@ -2,8 +2,35 @@
 # coding: utf-8
 
 import argparse
-from executor import process_subscription, process_videos, process_hot
-import analytics_manager
+import sys
+
+# 各子命令只在执行时导入自己需要的模块（executor / analytics_manager 会间接加载
+# bs4、requests、Playwright 等重量级依赖），--help 和 subscription --get 可以秒级返回
+
+
+def process_videos(args):
+    """处理视频下载命令"""
+    import executor
+    executor.process_videos(args)
+
+
+def process_subscription(args):
+    """处理订阅命令"""
+    import executor
+    executor.process_subscription(args)
+
+
+def process_hot(args):
+    """处理热门视频下载命令"""
+    import executor
+    executor.process_hot(args)
+
+
+def process_serve(args):
+    """处理下载服务命令"""
+    import executor
+    executor.process_serve(args)
+
 
 parser = argparse.ArgumentParser(description="jable downloader and analytics")
 
@@ -13,6 +40,9 @@ video_parser = sub_parser.add_parser("videos", help="download video by urls")
 video_parser.add_argument("urls", metavar='N', type=str, nargs='+',
                           help="jable video urls to download")
 
+video_parser.add_argument("--enqueue", action='store_true',
+                          help="only add to the download job queue (run `serve` to download)")
+
 video_parser.set_defaults(func=process_videos)
 
 models_parser = sub_parser.add_parser("subscription",
@@ -27,6 +57,10 @@ models_parser.add_argument("--sync-videos", action='store_true',
                            help="download all subscription related videos")
 models_parser.add_argument("--ids", type=int, metavar='N', nargs='+', default=[],
                            help="specify subscription ids to use to sync videos")
+models_parser.add_argument("--enqueue", action='store_true',
+                           help="with --sync-videos: only add the plan to the download job queue (run `serve` to download)")
+models_parser.add_argument("--dry-run", action='store_true',
+                           help="with --sync-videos: refresh indexes and print the download plan without downloading")
 
 models_parser.set_defaults(func=process_subscription)
 
@@ -38,37 +72,65 @@ hot_parser.add_argument("--top", type=int, default=4,
 hot_parser.add_argument("--min-likes", type=int, default=2000,
                         help="minimum likes threshold (default: 2000)")
 
+hot_parser.add_argument("--enqueue", action='store_true',
+                        help="only add to the download job queue (run `serve` to download)")
+
 hot_parser.set_defaults(func=process_hot)
 
+serve_parser = sub_parser.add_parser("serve",
+                                     help="run download workers consuming the persistent job queue")
+serve_parser.add_argument("--workers", type=int, default=1,
+                          help="number of concurrent download workers (default: 1)")
+serve_parser.add_argument("--exit-when-empty", action='store_true',
+                          help="exit once the queue has no claimable jobs")
+serve_parser.add_argument("--listen", type=str, metavar='HOST:PORT', default=None,
+                          help="run the shared queue server for workers on other hosts (e.g. 0.0.0.0:8765)")
+serve_parser.add_argument("--status", action='store_true',
+                          help="show queue status and exit")
+serve_parser.add_argument("--retry-failed", action='store_true',
+                          help="reset failed jobs to pending and exit")
+
+serve_parser.set_defaults(func=process_serve)
+
 # ==================== 热门影片分析命令 ====================
 
 def process_analyze_init(args):
     """处理初始化命令"""
+    import analytics_manager
+
     analytics_manager.initialize_hot_videos_analysis(
         db_path=args.db,
         max_pages=args.max_pages,
-        top_n_for_actors=args.top_actors
+        top_n_for_actors=args.top_actors,
+        actors_via_models=not args.per_video_actors
     )
 
 
 def process_analyze_update(args):
     """处理每日更新命令"""
+    import analytics_manager
+
     analytics_manager.daily_update_hot_videos(
         db_path=args.db,
         max_pages=args.max_pages,
-        top_n_for_new_actors=args.top_actors
+        top_n_for_new_actors=args.top_actors,
+        actors_via_models=not args.per_video_actors
     )
 
 
 def process_report(args):
     """处理榜单生成命令"""
+    import analytics_manager
+
     if args.send:
         # 生成并发送到 Telegram
         analytics_manager.send_growth_report_to_telegram(
             date=args.date,
             prev_date=args.prev_date,
             top_n=args.top,
-            db_path=args.db
+            db_path=args.db,
+            windows=args.windows,
+            rising=args.rising
         )
     else:
         # 只生成榜单
@@ -76,7 +138,9 @@ def process_report(args):
             date=args.date,
             prev_date=args.prev_date,
             top_n=args.top,
-            db_path=args.db
+            db_path=args.db,
+            windows=args.windows,
+            rising=args.rising
         )
 
 
@@ -95,6 +159,8 @@ init_parser.add_argument("--max-pages", type=int, default=None,
                         help="max pages to crawl (default: all pages)")
 init_parser.add_argument("--top-actors", type=int, default=200,
                         help="fetch actors info for top N videos (default: 200)")
+init_parser.add_argument("--per-video-actors", action='store_true',
+                        help="fetch every video page for actors instead of mapping them from model listing pages")
 init_parser.set_defaults(func=process_analyze_init)
 
 # analyze update：每日更新
@@ -106,6 +172,8 @@ update_parser.add_argument("--max-pages", type=int, default=None,
                           help="max pages to crawl (default: all pages)")
 update_parser.add_argument("--top-actors", type=int, default=200,
                           help="fetch actors info for new top N videos (default: 200)")
+update_parser.add_argument("--per-video-actors", action='store_true',
+                          help="fetch every video page for actors instead of mapping them from model listing pages")
 update_parser.set_defaults(func=process_analyze_update)
 
 # report 命令：生成榜单
@@ -121,13 +189,51 @@ report_parser.add_argument("--top", type=int, default=50,
                           help="number of items in report (default: 50)")
 report_parser.add_argument("--send", action='store_true',
                           help="send report to Telegram")
+report_parser.add_argument("--windows", type=int, metavar='N', nargs='+', default=[],
+                          help="also build N-day growth boards, e.g. --windows 7 30 (uses numpy if installed)")
+report_parser.add_argument("--rising", action='store_true',
+                          help="also build a 'rising fastest' board (last 7 days vs the 7 days before; needs numpy)")
 report_parser.set_defaults(func=process_report)
 
 
+# ==================== 页面获取守护进程 ====================
+
+def process_daemon(args):
+    """处理守护进程命令"""
+    import fetch_daemon
+
+    # --status / --stop 用退出码表示守护进程是否在运行（供脚本判断是否需要启动）
+    if args.stop:
+        sys.exit(0 if fetch_daemon.stop_daemon() else 1)
+    elif args.status:
+        sys.exit(0 if fetch_daemon.print_daemon_status() else 1)
+    else:
+        fetch_daemon.FetchDaemon(max_age_hours=args.max_age).serve(warmup=not args.no_warmup)
+
+
+# daemon 命令：常驻浏览器，供其他命令复用
+daemon_parser = sub_parser.add_parser("daemon",
+                                      help="run a local fetch daemon that keeps a warm browser for other commands")
+daemon_parser.add_argument("--status", action='store_true',
+                           help="show daemon status")
+daemon_parser.add_argument("--stop", action='store_true',
+                           help="stop the running daemon")
+daemon_parser.add_argument("--max-age", type=float, default=24,
+                           help="restart the browser after N hours (default: 24)")
+daemon_parser.add_argument("--no-warmup", action='store_true',
+                           help="do not open the site on startup")
+daemon_parser.set_defaults(func=process_daemon)
+
+
 if __name__ == '__main__':
     args = parser.parse_args()
     if not hasattr(args, 'func'):
         parser.print_help()
         exit()
 
-    args.func(args)
+    try:
+        args.func(args)
+    finally:
+        # 所有工作线程共享的浏览器只在运行结束时关闭一次（没有用到浏览器时什么都不做）
+        if 'fetch_backends' in sys.modules:
+            sys.modules['fetch_backends'].shutdown_backends()
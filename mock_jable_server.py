@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+本地回放服务器
+从 fixture_store 录制的夹具回放 /hot/N/、/models/<id>/?from=N、/videos/<id>/ 等页面，
+可配置响应延迟、Cloudflare 验证页和错误注入。爬虫通过 site_base_url（或环境变量 JABLE_SITE_URL）
+指向它后，整条爬取路径（后端选择、限速、重试、解析、入库）都可以离线、可复现地测速
+
+注入是确定性的：每个请求是否返回验证页/错误只取决于 --seed、页面和该页面被请求的次数，
+与并发顺序无关，同样的参数重复运行得到同样的请求结果
+
+使用：
+    python mock_jable_server.py --fixtures ./fixtures --port 8780 --latency 0.8 --jitter 0.4
+    python mock_jable_server.py --challenge-rate 0.05 --error-rate 0.02 --seed 7
+    JABLE_SITE_URL=http://127.0.0.1:8780 python main.py analyze update --db /tmp/bench.db
+"""
+
+import json
+import random
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from typing import Dict, Optional, Tuple
+
+import fixture_store
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8780
+
+# 统计接口（不属于站点路径）
+STATS_PATH = '/__mock__/stats'
+
+# Cloudflare 验证页（包含 cloudflare_waiter.CHALLENGE_MARKERS 中的标记）
+CHALLENGE_HTML = '''<!DOCTYPE html>
+<html lang="en-US"><head><title>Just a moment...</title></head>
+<body><div id="challenge-running">Verify you are human by completing the action below.</div></body>
+</html>'''
+
+ROUTES = ('hot', 'models', 'videos')
+
+
+def route_of(key: str) -> str:
+    """页面所属的路由（hot / models / videos / other）"""
+    first = key.strip('/').split('/')[0].split('?')[0]
+    return first if first in ROUTES else 'other'
+
+
+def alias_keys(key: str) -> Tuple[str, ...]:
+    """同一页面的等价写法：/hot/1/ 即 /hot/，?from=1 即不带分页参数的第一页"""
+    path, _, query = key.partition('?')
+    keys = [key]
+    if path == '/hot/1/':
+        keys.append('/hot/')
+    if query == 'from=1':
+        keys.append(path)
+    elif not query and path.startswith('/models/'):
+        keys.append(f'{path}?from=1')
+    return tuple(keys)
+
+
+class _MockRequestHandler(BaseHTTPRequestHandler):
+    """处理单个页面请求"""
+
+    def do_GET(self):
+        mock = self.server.mock_server
+        key = fixture_store.fixture_key(f'http://{mock.host}{self.path}')
+
+        if key.rstrip('/') == STATS_PATH:
+            self._send(200, json.dumps(mock.get_stats(), ensure_ascii=False), 'application/json')
+            return
+
+        status, body, delay = mock.respond(key)
+        if delay > 0:
+            time.sleep(delay)
+        self._send(status, body)
+
+    def _send(self, status: int, body: str, content_type: str = 'text/html'):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', f'{content_type}; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        # 每个请求的访问日志由统计代替
+        pass
+
+
+class _ThreadingMockServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class MockJableServer:
+    """从夹具目录回放站点页面的 HTTP 服务"""
+
+    def __init__(self, fixture_dir: Optional[str] = None, host: str = DEFAULT_HOST,
+                 port: int = DEFAULT_PORT, latency: float = 0.0, jitter: float = 0.0,
+                 replay_latency: bool = False, challenge_rate: float = 0.0,
+                 error_rate: float = 0.0, error_status: int = 503, seed: int = 0):
+        """
+        Args:
+            fixture_dir: 夹具目录（None 表示 fixture_store.get_fixture_dir()）
+            host / port: 监听地址，port 为 0 时自动分配
+            latency: 每个响应的固定延迟（秒）
+            jitter: 在固定延迟上再加 0~jitter 秒的随机延迟
+            replay_latency: 使用录制时后端的实际耗时作为固定延迟（没有记录的页面使用 latency）
+            challenge_rate: 返回 Cloudflare 验证页（403）的概率
+            error_rate: 返回错误状态码的概率
+            error_status: 注入的错误状态码
+            seed: 注入和抖动的随机种子
+        """
+        self.fixture_dir = fixture_dir or fixture_store.get_fixture_dir()
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.replay_latency = replay_latency
+        self.challenge_rate = challenge_rate
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.seed = seed
+        self.manifest = fixture_store.load_manifest(self.fixture_dir)
+        self.server = None
+
+        self._lock = threading.Lock()
+        self._request_counts: Dict[str, int] = {}
+        self._stats = {route: {'requests': 0, 'served': 0, 'missing': 0, 'challenges': 0, 'errors': 0}
+                       for route in ROUTES + ('other',)}
+
+    @property
+    def base_url(self) -> str:
+        return f'http://{self.host}:{self.port}'
+
+    def _next_roll(self, key: str) -> random.Random:
+        """该页面第 n 次请求对应的随机数发生器（与并发顺序无关）"""
+        with self._lock:
+            count = self._request_counts.get(key, 0)
+            self._request_counts[key] = count + 1
+        return random.Random(f'{self.seed}:{key}:{count}')
+
+    def _count(self, route: str, field: str) -> None:
+        with self._lock:
+            self._stats[route][field] += 1
+
+    def respond(self, key: str) -> Tuple[int, str, float]:
+        """
+        决定一个请求的响应
+
+        Returns:
+            (状态码, 响应内容, 响应前等待的秒数)
+        """
+        route = route_of(key)
+        rng = self._next_roll(key)
+        self._count(route, 'requests')
+
+        entry = next((self.manifest[k] for k in alias_keys(key) if k in self.manifest), None)
+        delay = self.latency
+        if self.replay_latency and entry and entry.get('seconds') is not None:
+            delay = entry['seconds']
+        delay += rng.uniform(0, self.jitter) if self.jitter else 0.0
+
+        # 先抽签再查夹具，同一请求序列的注入结果不受夹具增减影响
+        challenged = rng.random() < self.challenge_rate
+        failed = rng.random() < self.error_rate
+        if challenged:
+            self._count(route, 'challenges')
+            return 403, CHALLENGE_HTML, delay
+        if failed:
+            self._count(route, 'errors')
+            return self.error_status, f'<html><body>HTTP {self.error_status}</body></html>', delay
+
+        html = fixture_store.load(entry['key'], self.fixture_dir) if entry else None
+        if html is None:
+            self._count(route, 'missing')
+            return 404, '<html><body>404 Not Found</body></html>', delay
+
+        self._count(route, 'served')
+        return 200, html, delay
+
+    def get_stats(self) -> Dict[str, Dict]:
+        """各路由的请求统计（只包含有请求的路由）"""
+        with self._lock:
+            return {route: dict(stats) for route, stats in self._stats.items() if stats['requests']}
+
+    def print_stats(self) -> None:
+        print(f"\n{'路由':<8} {'请求':>6} {'回放':>6} {'缺失':>6} {'验证页':>6} {'错误':>6}")
+        print("-" * 48)
+        for route, stats in self.get_stats().items():
+            print(f"/{route:<7} {stats['requests']:>6} {stats['served']:>6} {stats['missing']:>6} "
+                  f"{stats['challenges']:>6} {stats['errors']:>6}")
+
+    def start(self) -> None:
+        """在后台线程启动（用于基准和测试）"""
+        self.server = _ThreadingMockServer((self.host, self.port), _MockRequestHandler)
+        self.server.mock_server = self
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self) -> None:
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def serve(self) -> None:
+        """前台运行（阻塞，直到 Ctrl+C）"""
+        self.server = _ThreadingMockServer((self.host, self.port), _MockRequestHandler)
+        self.server.mock_server = self
+        self.port = self.server.server_address[1]
+
+        print("=" * 80)
+        print(f"🚀 本地回放服务器启动: {self.base_url}（夹具 {self.fixture_dir}，共 {len(self.manifest)} 个页面）")
+        print(f"   延迟 {'录制耗时' if self.replay_latency else f'{self.latency:.2f}s'} + 0~{self.jitter:.2f}s，"
+              f"验证页 {self.challenge_rate:.0%}，错误 {self.error_rate:.0%}（HTTP {self.error_status}），"
+              f"种子 {self.seed}")
+        print(f"   爬虫指向它: JABLE_SITE_URL={self.base_url} python main.py ...")
+        print(f"   请求统计: {self.base_url}{STATS_PATH}")
+        print("=" * 80)
+
+        try:
+            self.server.serve_forever()
+        except KeyboardInterrupt:
+            print("\n收到中断信号")
+        finally:
+            self.server.server_close()
+            self.print_stats()
+            print("✓ 回放服务器已停止")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="replay recorded jable.tv pages from a local HTTP server")
+    parser.add_argument("--fixtures", default=None,
+                        help=f"fixture directory (default: fixture_dir or {fixture_store.DEFAULT_FIXTURE_DIR})")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"listen host (default: {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"listen port (default: {DEFAULT_PORT})")
+    parser.add_argument("--latency", type=float, default=0.0, help="fixed delay per response in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random delay of 0..JITTER seconds")
+    parser.add_argument("--replay-latency", action="store_true",
+                        help="delay each page by the backend latency recorded with it")
+    parser.add_argument("--challenge-rate", type=float, default=0.0,
+                        help="probability of serving a Cloudflare challenge page (403)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="probability of an injected error")
+    parser.add_argument("--error-status", type=int, default=503, help="status code of injected errors (default: 503)")
+    parser.add_argument("--seed", type=int, default=0, help="seed for injection and jitter (default: 0)")
+    args = parser.parse_args()
+
+    MockJableServer(args.fixtures, args.host, args.port, latency=args.latency, jitter=args.jitter,
+                    replay_latency=args.replay_latency, challenge_rate=args.challenge_rate,
+                    error_rate=args.error_rate, error_status=args.error_status, seed=args.seed).serve()
+
+
+if __name__ == '__main__':
+    main()
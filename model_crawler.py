@@ -1,49 +1,49 @@
-from bs4 import BeautifulSoup
+import hashlib
+import time
 
+from config import CONF
+import fetch_pool
+import page_parser
 import utils
 
+# 增量模式依赖列表页按发布时间从新到旧排列；超过该天数做一次完整抓取，修正可能的遗漏
+DEFAULT_FULL_REFRESH_DAYS = 7
+
 
 def input_url_validator(tag_url):
     if "from=" in tag_url or "videos/" in tag_url:
         raise Exception("input url is not valid. url cannot contain page number")
 
 
-def get_model_names_and_last_page_num(url):
-    content = utils.scrapingant_requests_get(url)
-    print(url)
-    last_page_num = 1
-    soup = BeautifulSoup(content, 'html.parser')
-    model_name_item = soup.find('h2', class_='h3-md mb-1')
-    if model_name_item:
-        model_name = model_name_item.get_text()
-   # model_name_item = soup.select('#list_videos_common_videos_list > section > div > div > div > h2')
-   # if model_name_item:
-   #     model_name = model_name_item[0].text
+def parse_listing_page(url, content):
+    """
+    一次解析列表页，取出订阅名、总页数、视频总数和本页视频 ID（按页面顺序）
+
+    Returns:
+        (model_name, last_page_num, total_video_num, page_video_ids)
+    """
+    record = page_parser.parse_page(content)
+
+    if record.heading:
+        model_name = record.heading
     elif "jable.tv/search/" in url:
         model_name = url.replace("https://jable.tv/search/", "")[:-1]
     else:
         raise Exception("cannot get name of subscription")
-    page_items = soup.select('.pagination>.page-item>.page-link')
-    last_item = page_items[-1].get('data-parameters') if page_items else []
-    if last_item:
-        page_num = last_item.split(":")[-1]
-        if page_num.isdigit():
-            last_page_num = int(last_item.split(":")[-1])
-
-    return model_name, last_page_num
 
+    return model_name, record.last_page, record.total_videos, record.video_ids
 
-def get_model_total_video_num(url):
-    content = utils.scrapingant_requests_get(url)
 
-    soup = BeautifulSoup(content, 'html.parser')
+def get_model_names_and_last_page_num(url):
+    content = utils.scrapingant_requests_get(url, kind='list')
+    print(url)
+    model_name, last_page_num, _, _ = parse_listing_page(url, content)
+    return model_name, last_page_num
 
-    total_num = 0
-    foo = soup.select('span.inactive-color')
-    if foo:
-        if foo[0].text.split()[0].isdigit():
-            total_num = int(foo[0].text.split()[0])
 
+def get_model_total_video_num(url):
+    content = utils.scrapingant_requests_get(url, kind='list')
+    _, _, total_num, _ = parse_listing_page(url, content)
     return total_num
 
 
@@ -72,40 +72,147 @@ def get_page_url(base_url, page_num):
     return page_url
 
 
-def get_all_video_ids(url, cached_ids_set=None):
-    tag_name, last_page_num = get_model_names_and_last_page_num(url)
+def parse_page_video_ids(content):
+    """解析列表页上的视频 ID（按页面顺序，最新的在前）"""
+    return page_parser.parse_page(content).video_ids
 
-    total_video_num = 0
-    if cached_ids_set and last_page_num > 10:
-        total_video_num = get_model_total_video_num(url)
 
-    if cached_ids_set and len(cached_ids_set) == total_video_num:
-        print("远端无更新，索引和本地缓存一致，跳过抓取索引")
-        return cached_ids_set
+def page_fingerprint(page_video_ids):
+    """列表页指纹：只取视频 ID 序列，不受广告、推荐位等页面噪声影响"""
+    return hashlib.sha1(','.join(page_video_ids).encode('utf-8')).hexdigest()
 
-    video_ids = set()
-    for page_num in range(1, last_page_num + 1):
-        page_url = get_page_url(url, page_num)
-        print("\r抓取 %s 第 %s 页 共 %s 页" % (tag_name, page_num, last_page_num), end="", flush=True)
 
-        try:
-            content = utils.scrapingant_requests_get(page_url, retry=20)
+def _is_watermark_usable(watermark, cached_ids_set):
+    """水位线存在、未过期，且它记录的最新视频确实在缓存索引中（否则索引可能没保存成功）"""
+    if not watermark or watermark.get('newest_id') not in cached_ids_set:
+        return False
+    max_age = CONF.get('index_full_refresh_days', DEFAULT_FULL_REFRESH_DAYS) * 86400
+    return time.time() - watermark.get('full_refresh_at', 0) < max_age
 
-            soup = BeautifulSoup(content, 'html.parser')
-            a_tags = soup.select('div.img-box>a')
-            for a_tag in a_tags:
-                if a_tag.get('href'):
-                    video_ids.add(a_tag['href'].split('/')[-2])
 
-            need_break = is_query_over(video_ids, total_video_num, cached_ids_set)
-            if need_break:
-                video_ids |= cached_ids_set
-                break
+def get_new_video_ids_incremental(url, tag_name, last_page_num, first_page_ids, cached_ids_set):
+    """
+    增量模式：从最新的一页往后读，遇到整页都已在缓存中（或包含上次记录的最新视频）的页就停止
 
+    Returns:
+        合并后的视频 ID 集合；水位线不可用或中途抓取失败时返回 None（改用完整抓取）
+    """
+    watermark = utils.get_index_watermark(url)
+    if not _is_watermark_usable(watermark, cached_ids_set):
+        return None
+
+    if watermark.get('fingerprint') == page_fingerprint(first_page_ids):
+        print("%s 首页未变化，沿用缓存索引（%s 个）" % (tag_name, len(cached_ids_set)))
+        return cached_ids_set
+
+    newest_id = watermark['newest_id']
+    new_ids = set()
+    page_ids = first_page_ids
+    page_num = 1
+    while True:
+        new_ids |= set(page_ids) - cached_ids_set
+        if not page_ids or set(page_ids) <= cached_ids_set or newest_id in page_ids:
+            break
+        page_num += 1
+        if page_num > last_page_num:
+            break
+        print("\r增量抓取 %s 第 %s 页" % (tag_name, page_num), end="", flush=True)
+        try:
+            content = utils.scrapingant_requests_get(get_page_url(url, page_num), kind='list')
         except Exception as e:
-            print(f"\n⚠️  第 {page_num} 页抓取失败: {str(e)[:100]}")
-            print(f"   继续抓取下一页...")
+            print(f"\n⚠️  增量抓取第 {page_num} 页失败，改用完整抓取: {str(e)[:100]}")
+            return None
+        page_ids = parse_page_video_ids(content)
+
+    print("\n%s 增量更新: 读取 %s 页，新增 %s 个影片" % (tag_name, page_num, len(new_ids)))
+    # 首页没有解析出视频时不更新水位线，下次仍按旧水位线判断
+    if first_page_ids:
+        utils.update_index_watermark(url, first_page_ids[0], page_fingerprint(first_page_ids),
+                                     full_refresh_at=watermark.get('full_refresh_at'))
+    return cached_ids_set | new_ids
+
+
+def _save_full_watermark(url, first_page_ids):
+    if first_page_ids:
+        utils.update_index_watermark(url, first_page_ids[0], page_fingerprint(first_page_ids),
+                                     full_refresh_at=time.time())
+
+
+def get_all_video_ids(url, cached_ids_set=None, incremental=True, workers=None):
+    """
+    获取订阅链接下的所有视频 ID
+
+    有缓存索引时优先用增量模式（通常只读 1~2 页）；首次抓取、水位线过期或增量失败时完整抓取所有分页。
+    首页只请求一次，订阅名、总页数、视频总数和第一页的视频都从同一次解析中取得
+
+    Args:
+        url: 订阅链接（模特/标签/搜索页）
+        cached_ids_set: 缓存的视频 ID 集合
+        incremental: 是否允许增量模式
+        workers: 分页并发数（None 则使用 fetch_workers 配置）
+    """
+    content = utils.scrapingant_requests_get(url, kind='list')
+    print(url)
+    tag_name, last_page_num, total_video_num, first_page_ids = parse_listing_page(url, content)
+
+    if cached_ids_set and incremental:
+        video_ids = get_new_video_ids_incremental(url, tag_name, last_page_num, first_page_ids, cached_ids_set)
+        if video_ids is not None:
+            return video_ids
+
+    if cached_ids_set and len(cached_ids_set) == total_video_num:
+        print("远端无更新，索引和本地缓存一致，跳过抓取索引")
+        _save_full_watermark(url, first_page_ids)
+        return cached_ids_set
+
+    def fetch_page_ids(page_num):
+        # 单页的总耗时由 retry_policy 的 page 策略（deadline）约束，不再靠加大重试次数
+        content = utils.scrapingant_requests_get(get_page_url(url, page_num), kind='list')
+        return set(parse_page_video_ids(content))
+
+    # 第一页已经在上面拿到，不再重复请求
+    video_ids = set(first_page_ids)
+    failed_pages = []
+    query_over = is_query_over(video_ids, total_video_num, cached_ids_set)
+    if query_over:
+        video_ids |= cached_ids_set
+
+    # 并发抓取所有分页，结果到达即合并；满足 is_query_over 后停止派发剩余页
+    pool = fetch_pool.FetchPool(fetch_page_ids, workers=workers, name='model-page')
+    done = 1
+    pages = range(2, last_page_num + 1) if not query_over else []
+    for page_num, page_ids, error in pool.run(pages):
+        done += 1
+        print("\r抓取 %s 已完成 %s 页 共 %s 页" % (tag_name, done, last_page_num), end="", flush=True)
+        if error is not None:
+            print(f"\n⚠️  第 {page_num} 页抓取失败: {str(error)[:100]}")
+            failed_pages.append(page_num)
             continue
 
-    print('%s => 获取到 %s 个影片' % (tag_name, len(video_ids)))
+        video_ids |= page_ids
+        if is_query_over(video_ids, total_video_num, cached_ids_set):
+            video_ids |= cached_ids_set
+            query_over = True
+            pool.stop()
+
+    # 对失败的页单独重试一轮，仍然失败的页明确报告出来
+    if failed_pages and not query_over:
+        print(f"\n重试 {len(failed_pages)} 个失败页: {sorted(failed_pages)}")
+        still_failed = []
+        for page_num, page_ids, error in fetch_pool.fetch_all(fetch_page_ids, sorted(failed_pages),
+                                                             workers=workers, name='model-retry'):
+            if error is not None:
+                still_failed.append(page_num)
+            else:
+                video_ids |= page_ids
+        if still_failed:
+            print(f"⚠️  {tag_name} 仍有 {len(still_failed)} 页抓取失败: {sorted(still_failed)}，索引可能不完整")
+        else:
+            failed_pages = []
+
+    # 完整抓取成功后记录水位线，之后的同步走增量模式
+    if first_page_ids and (query_over or not failed_pages):
+        _save_full_watermark(url, first_page_ids)
+
+    print('\n%s => 获取到 %s 个影片' % (tag_name, len(video_ids)))
     return video_ids
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+页面解析层
+每个 HTML 文档只用 lxml（C 实现）解析一次，用预编译的 XPath 取出所有字段，
+返回不可变的 PageRecord：视频卡片（ID、标题、观看数、点赞数、封面）、演员、m3u8、封面、分页等
+
+各模块原来的解析函数（extract_videos_from_page / get_total_pages / get_video_full_name /
+get_cover / parse_listing_page ...）都保留为基于 parse_page() 的薄包装；同一个文档被多个包装
+函数使用时（例如视频页先取标题、下载完再取封面），parse_page 的缓存保证只解析一次
+"""
+
+import re
+from functools import lru_cache
+from typing import List, NamedTuple, Optional, Tuple
+
+import lxml.html
+from lxml import etree
+
+
+def _has_class(name: str) -> str:
+    """XPath 条件：class 属性中包含 name 这个类（等价于 CSS 的 .name）"""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+# 预编译的 XPath（每个表达式只编译一次）
+_CARDS = etree.XPath(f"//div[{_has_class('video-img-box')}]")
+_CARD_LINK = etree.XPath(".//a[contains(@href, '/videos/')]/@href")
+_CARD_TITLE = etree.XPath(f".//h6[{_has_class('title')}]//a")
+_CARD_STATS = etree.XPath(f".//p[{_has_class('sub-title')}]")
+_CARD_IMAGE = etree.XPath(f".//div[{_has_class('img-box')}]//img")
+_ACTOR_LINKS = etree.XPath(f"//div[{_has_class('models')}]//a[{_has_class('model')}]")
+_ACTOR_NAME_SPAN = etree.XPath(".//span[@data-original-title]")
+_HOT_PAGE_LINKS = etree.XPath(f"//ul[{_has_class('pagination')}]//li//a[contains(@href, '/hot/')]")
+_LISTING_PAGE_LINKS = etree.XPath(
+    f"//*[{_has_class('pagination')}]/*[{_has_class('page-item')}]/*[{_has_class('page-link')}]")
+_HEADING = etree.XPath("//h2[@class='h3-md mb-1']")
+_TOTAL_VIDEOS = etree.XPath(f"//span[{_has_class('inactive-color')}]")
+_META_CONTENTS = etree.XPath("//meta/@content")
+
+_UTF8_PARSER = lxml.html.HTMLParser(encoding='utf-8')
+
+WHITESPACE_PATTERN = re.compile(r'\s+')
+HOT_PAGE_NUMBER_PATTERN = re.compile(r'/hot/(\d+)/')
+M3U8_PATTERN = re.compile(r'https://[^\s"\'<>]+\.m3u8(?:\?[^\s"\'<>]*)?')
+
+# 同一文档被多个包装函数解析时复用结果
+PARSE_CACHE_SIZE = 8
+
+
+class VideoCard(NamedTuple):
+    """列表页上的一个视频卡片"""
+    video_id: str
+    title: str
+    url: str
+    views: int
+    likes: int
+    cover: str
+
+
+class Actor(NamedTuple):
+    """视频页上的一个演员"""
+    actor_id: str
+    actor_name: str
+
+
+class PageRecord(NamedTuple):
+    """一个页面解析出的全部字段（页面上没有的字段为空值）"""
+    videos: Tuple[VideoCard, ...]
+    heading: str
+    last_page: int
+    total_videos: int
+    actors: Tuple[Actor, ...]
+    m3u8: Optional[str]
+    cover: Optional[str]
+    meta_contents: Tuple[str, ...]
+
+    @property
+    def video_ids(self) -> List[str]:
+        """列表页上的视频 ID（按页面顺序去重）"""
+        return list(dict.fromkeys(video.video_id for video in self.videos))
+
+
+EMPTY_RECORD = PageRecord((), '', 1, 0, (), None, None, ())
+
+
+def _text(element) -> str:
+    return element.text_content().strip()
+
+
+def _parse_stats(sub_title) -> Tuple[int, int]:
+    """统计行每行一个数字（数字内可能有空格，例如 1 664 256）：第一个是观看数，第二个是点赞数"""
+    numbers = []
+    for line in sub_title.text_content().strip().split('\n'):
+        num_str = WHITESPACE_PATTERN.sub('', line)
+        if num_str.isdigit():
+            numbers.append(int(num_str))
+    return (numbers[0], numbers[1]) if len(numbers) >= 2 else (0, 0)
+
+
+def _parse_card(card) -> Optional[VideoCard]:
+    hrefs = _CARD_LINK(card)
+    video_url = hrefs[0] if hrefs else ''
+    video_id = video_url.split('/')[-2] if '/' in video_url else ''
+    if not video_id:
+        return None
+
+    titles = _CARD_TITLE(card)
+    stats = _CARD_STATS(card)
+    views, likes = _parse_stats(stats[0]) if stats else (0, 0)
+    images = _CARD_IMAGE(card)
+    cover = (images[0].get('data-src') or images[0].get('src') or '') if images else ''
+
+    return VideoCard(video_id, _text(titles[0]) if titles else '', video_url, views, likes, cover)
+
+
+def _parse_actor(link) -> Optional[Actor]:
+    href = link.get('href', '')
+    if not href or '/models/' not in href:
+        return None
+    actor_id = href.split('/')[-2]
+    if not actor_id:
+        return None
+
+    # 演员名依次取 data-original-title、title 属性、链接文本
+    spans = _ACTOR_NAME_SPAN(link)
+    actor_name = spans[0].get('data-original-title', '') if spans else ''
+    if not actor_name and spans:
+        actor_name = spans[0].get('title', '')
+    if not actor_name:
+        actor_name = _text(link)
+    return Actor(actor_id, actor_name) if actor_name else None
+
+
+def _last_page(root) -> int:
+    """总页数：热门页用 /hot/N/ 链接（优先"最後"链接），其他列表页用最后一个分页按钮的 data-parameters"""
+    hot_links = _HOT_PAGE_LINKS(root)
+    if hot_links:
+        max_page = 1
+        for link in hot_links:
+            match = HOT_PAGE_NUMBER_PATTERN.search(link.get('href', ''))
+            if not match:
+                continue
+            text = _text(link)
+            if '最後' in text or '»' in text:
+                return int(match.group(1))
+            max_page = max(max_page, int(match.group(1)))
+        return max_page
+
+    page_links = _LISTING_PAGE_LINKS(root)
+    parameters = page_links[-1].get('data-parameters') if page_links else None
+    if parameters:
+        page_num = parameters.split(':')[-1]
+        if page_num.isdigit():
+            return int(page_num)
+    return 1
+
+
+def _total_videos(root) -> int:
+    spans = _TOTAL_VIDEOS(root)
+    words = _text(spans[0]).split() if spans else []
+    return int(words[0]) if words and words[0].isdigit() else 0
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_page(html: str) -> PageRecord:
+    """
+    解析一个页面（列表页或视频页），取出所有字段
+
+    Args:
+        html: 页面 HTML
+
+    Returns:
+        PageRecord（空文档或无法解析时返回 EMPTY_RECORD）
+    """
+    if not html or not html.strip():
+        return EMPTY_RECORD
+    try:
+        try:
+            root = lxml.html.fromstring(html)
+        except ValueError:
+            # 带 XML 编码声明的文档不能以 str 解析
+            root = lxml.html.fromstring(html.encode('utf-8'), parser=_UTF8_PARSER)
+    except (etree.ParserError, ValueError):
+        return EMPTY_RECORD
+
+    videos = tuple(video for video in map(_parse_card, _CARDS(root)) if video)
+    actors = tuple(actor for actor in map(_parse_actor, _ACTOR_LINKS(root)) if actor)
+    headings = _HEADING(root)
+    meta_contents = tuple(content for content in _META_CONTENTS(root) if content)
+    m3u8 = M3U8_PATTERN.search(html)
+
+    return PageRecord(
+        videos=videos,
+        heading=_text(headings[0]) if headings else '',
+        last_page=_last_page(root),
+        total_videos=_total_videos(root),
+        actors=actors,
+        m3u8=m3u8.group(0).strip('"\'') if m3u8 else None,
+        cover=next((content for content in meta_contents if 'preview.jpg' in content), None),
+        meta_contents=meta_contents,
+    )
+
+
+def find_full_name(record: PageRecord, video_id: str) -> Optional[str]:
+    """
+    从视频页的 meta 中找出包含完整视频 ID 的标题
+
+    视频 ID 必须作为完整单词出现（前后不是字母、数字或横线），
+    例如 mide-938nggn 不应该匹配 mide-938
+
+    Returns:
+        匹配的 meta 内容，没有时返回 None
+    """
+    video_id_lower = video_id.lower()
+
+    def is_valid_id_char(c):
+        return c.isalnum() or c == '-'
+
+    for content in record.meta_contents:
+        content_lower = content.lower()
+        idx = content_lower.find(video_id_lower)
+        if idx < 0:
+            continue
+        before_char = content_lower[idx - 1] if idx > 0 else ' '
+        after_idx = idx + len(video_id_lower)
+        after_char = content_lower[after_idx] if after_idx < len(content_lower) else ' '
+        if not (is_valid_id_char(before_char) or is_valid_id_char(after_char)):
+            return content
+    return None
+
+
+if __name__ == '__main__':
+    # 测试：解析保存的演员列表页
+    import os
+
+    fixture = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'debug_model_page.html')
+    with open(fixture, 'r', encoding='utf-8') as f:
+        record = parse_page(f.read())
+
+    print(f"标题: {record.heading}")
+    print(f"总页数: {record.last_page}  视频总数: {record.total_videos}")
+    for video in record.videos[:3]:
+        print(f"  {video.video_id:<15} 👁️  {video.views:>9,}  👍 {video.likes:>6,}  {video.title[:30]}")
+    print(f"共 {len(record.videos)} 个视频")
+    print("\n✓ 页面解析模块测试完成")
@@ -2,19 +2,92 @@
 """
 进度跟踪模块
 支持断点续传，记录爬取进度
+
+进度保存在 SQLite 中（每个任务一行），页面状态用位图表示：
+- 更新一页只改一行（位图 + 计数），不再每页重写整个 JSON 文件
+- 判断页面是否完成是按位运算，不再在列表里线性查找
+- 超过保留天数的旧任务自动清理
+- 每个跟踪器只打开一个连接（WAL），建表只在初始化时执行一次，更新一页只是一次小事务
+首次使用时自动导入旧版 progress.json 中保留期内的任务
 """
 
 import json
 import os
-from datetime import datetime
+import sqlite3
+import threading
+from datetime import datetime, timedelta
 from typing import Dict, Optional, List
 
+# 默认进度数据库路径
+DEFAULT_PROGRESS_PATH = './progress.db'
+
+# 旧版 JSON 进度文件（仅用于迁移）
+LEGACY_PROGRESS_FILE = './progress.json'
+
+# 任务保留天数
+DEFAULT_KEEP_DAYS = 30
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS tasks (
+        task_id TEXT PRIMARY KEY,
+        task_type TEXT NOT NULL,
+        task_date TEXT NOT NULL,
+        start_time TEXT NOT NULL,
+        last_update TEXT NOT NULL,
+        total_pages INTEGER NOT NULL,
+        completed_bits BLOB NOT NULL,
+        failed_bits BLOB NOT NULL,
+        completed_count INTEGER NOT NULL DEFAULT 0,
+        failed_count INTEGER NOT NULL DEFAULT 0,
+        current_page INTEGER NOT NULL DEFAULT 0,
+        status TEXT NOT NULL,
+        videos_count INTEGER NOT NULL DEFAULT 0,
+        actors_count INTEGER NOT NULL DEFAULT 0,
+        error TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_tasks_date ON tasks(task_date);
+
+    CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    );
+'''
+
+
+# ==================== 位图 ====================
+
+def _bitmap(total_pages: int) -> bytearray:
+    """创建能容纳 total_pages 页的空位图（页码从 1 开始）"""
+    return bytearray((max(total_pages, 0) + 7) // 8)
+
+
+def _test_bit(bits: bytearray, page_num: int) -> bool:
+    index = page_num - 1
+    return 0 <= index < len(bits) * 8 and bool(bits[index >> 3] & (1 << (index & 7)))
+
+
+def _set_bit(bits: bytearray, page_num: int, value: bool) -> None:
+    index = page_num - 1
+    if index < 0:
+        return
+    if index >= len(bits) * 8:
+        bits.extend(bytes((index >> 3) + 1 - len(bits)))
+    if value:
+        bits[index >> 3] |= 1 << (index & 7)
+    else:
+        bits[index >> 3] &= ~(1 << (index & 7)) & 0xFF
+
+
+def _pages(bits: bytearray) -> List[int]:
+    """位图中置位的页码列表"""
+    return [i + 1 for i in range(len(bits) * 8) if bits[i >> 3] & (1 << (i & 7))]
+
 
 class ProgressTracker:
     """
     进度跟踪器
 
-    记录格式：
+    任务记录（get_task() 返回的格式）：
     {
         "task_id": "analyze_init_2025-10-25",
         "task_type": "init",  # init 或 update
@@ -32,30 +105,92 @@ class ProgressTracker:
     }
     """
 
-    def __init__(self, progress_file: str = './progress.json'):
+    def __init__(self, progress_file: str = DEFAULT_PROGRESS_PATH, keep_days: int = DEFAULT_KEEP_DAYS):
         """
         初始化进度跟踪器
 
         Args:
-            progress_file: 进度文件路径
+            progress_file: 进度数据库路径
+            keep_days: 任务保留天数，更早的任务在初始化时清理
         """
         self.progress_file = progress_file
-        self.progress = self._load_progress()
-
-    def _load_progress(self) -> Dict:
-        """加载进度文件"""
-        if os.path.exists(self.progress_file):
-            try:
-                with open(self.progress_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except:
-                return {}
-        return {}
-
-    def _save_progress(self):
-        """保存进度文件"""
-        with open(self.progress_file, 'w', encoding='utf-8') as f:
-            json.dump(self.progress, f, indent=2, ensure_ascii=False)
+        self.keep_days = keep_days
+        # 当前进程中任务的页面状态 {task_id: [completed_bits, failed_bits]}
+        self._bits: Dict[str, List[bytearray]] = {}
+
+        # 整个跟踪器共用一个连接（爬取线程和主线程都可能更新进度，由锁串行化）
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(progress_file, timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        # WAL + NORMAL：每次提交不再 fsync，进程崩溃也不会损坏数据库
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+
+        with self._lock:
+            if progress_file == DEFAULT_PROGRESS_PATH:
+                self._migrate_legacy_json(self._conn)
+            self._prune(self._conn)
+
+    def close(self) -> None:
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+    def _migrate_legacy_json(self, conn: sqlite3.Connection) -> None:
+        """导入旧版 progress.json 中保留期内的任务（只执行一次）"""
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_json_migrated'").fetchone():
+            return
+
+        with conn:
+            if os.path.exists(LEGACY_PROGRESS_FILE):
+                try:
+                    with open(LEGACY_PROGRESS_FILE, 'r', encoding='utf-8') as f:
+                        legacy = json.load(f)
+                except (OSError, ValueError):
+                    legacy = {}
+
+                for task in legacy.values():
+                    completed = _bitmap(task['total_pages'])
+                    failed = _bitmap(task['total_pages'])
+                    for page_num in task.get('completed_pages', []):
+                        _set_bit(completed, page_num, True)
+                    for page_num in task.get('failed_pages', []):
+                        _set_bit(failed, page_num, True)
+                    stats = task.get('stats') or {}
+                    conn.execute('''
+                        INSERT OR IGNORE INTO tasks (task_id, task_type, task_date, start_time, last_update,
+                            total_pages, completed_bits, failed_bits, completed_count, failed_count,
+                            current_page, status, videos_count, actors_count, error)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ''', (task['task_id'], task['task_type'], task['start_time'][:10], task['start_time'],
+                          task['last_update'], task['total_pages'], bytes(completed), bytes(failed),
+                          len(_pages(completed)), len(_pages(failed)), task.get('current_page', 0),
+                          task.get('status', 'in_progress'), stats.get('videos_count', 0),
+                          stats.get('actors_count', 0), task.get('error')))
+
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('legacy_json_migrated', ?)",
+                         (datetime.now().strftime('%Y-%m-%d %H:%M:%S'),))
+
+    def _prune(self, conn: sqlite3.Connection) -> None:
+        """清理超过保留天数的任务"""
+        cutoff = (datetime.now() - timedelta(days=self.keep_days)).strftime('%Y-%m-%d')
+        with conn:
+            conn.execute('DELETE FROM tasks WHERE task_date < ?', (cutoff,))
+
+    def _load_bits(self, conn: sqlite3.Connection, task_id: str) -> Optional[List[bytearray]]:
+        """读取任务的页面位图（每个任务只从数据库读一次）"""
+        if task_id not in self._bits:
+            row = conn.execute('SELECT completed_bits, failed_bits FROM tasks WHERE task_id = ?',
+                               (task_id,)).fetchone()
+            if not row:
+                return None
+            self._bits[task_id] = [bytearray(row['completed_bits']), bytearray(row['failed_bits'])]
+        return self._bits[task_id]
+
+    @staticmethod
+    def _now() -> str:
+        return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
     def start_task(self, task_type: str, total_pages: int) -> str:
         """
@@ -70,26 +205,45 @@ class ProgressTracker:
         """
         today = datetime.now().strftime('%Y-%m-%d')
         task_id = f"analyze_{task_type}_{today}"
+        now = self._now()
+        bits = [_bitmap(total_pages), _bitmap(total_pages)]
+
+        with self._lock, self._conn:
+            self._conn.execute('''
+                INSERT OR REPLACE INTO tasks (task_id, task_type, task_date, start_time, last_update,
+                    total_pages, completed_bits, failed_bits, status)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'in_progress')
+            ''', (task_id, task_type, today, now, now, total_pages, bytes(bits[0]), bytes(bits[1])))
+            self._bits[task_id] = bits
+        print(f"✓ 任务已启动: {task_id}")
+        return task_id
 
-        self.progress[task_id] = {
-            'task_id': task_id,
-            'task_type': task_type,
-            'start_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'last_update': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'total_pages': total_pages,
-            'completed_pages': [],
-            'failed_pages': [],
-            'current_page': 0,
-            'status': 'in_progress',
+    def _get_task_by_id(self, task_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute('SELECT * FROM tasks WHERE task_id = ?', (task_id,)).fetchone()
+        if not row:
+            return None
+
+        completed_bits, failed_bits = self._bits.get(
+            task_id, (bytearray(row['completed_bits']), bytearray(row['failed_bits'])))
+        task = {
+            'task_id': row['task_id'],
+            'task_type': row['task_type'],
+            'start_time': row['start_time'],
+            'last_update': row['last_update'],
+            'total_pages': row['total_pages'],
+            'completed_pages': _pages(completed_bits),
+            'failed_pages': _pages(failed_bits),
+            'current_page': row['current_page'],
+            'status': row['status'],
             'stats': {
-                'videos_count': 0,
-                'actors_count': 0
+                'videos_count': row['videos_count'],
+                'actors_count': row['actors_count']
             }
         }
-
-        self._save_progress()
-        print(f"✓ 任务已启动: {task_id}")
-        return task_id
+        if row['error']:
+            task['error'] = row['error']
+        return task
 
     def get_task(self, task_type: str) -> Optional[Dict]:
         """
@@ -102,37 +256,53 @@ class ProgressTracker:
             任务进度字典，如果不存在返回 None
         """
         today = datetime.now().strftime('%Y-%m-%d')
-        task_id = f"analyze_{task_type}_{today}"
-        return self.progress.get(task_id)
+        return self._get_task_by_id(f"analyze_{task_type}_{today}")
 
     def update_page(self, task_id: str, page_num: int, success: bool = True):
         """
-        更新页面完成状态
+        更新页面完成状态（只改该任务的一行）
 
         Args:
             task_id: 任务ID
             page_num: 页码
             success: 是否成功
         """
-        if task_id not in self.progress:
-            return
-
-        task = self.progress[task_id]
-
-        if success:
-            if page_num not in task['completed_pages']:
-                task['completed_pages'].append(page_num)
-            # 从失败列表中移除（如果之前失败过）
-            if page_num in task['failed_pages']:
-                task['failed_pages'].remove(page_num)
-        else:
-            if page_num not in task['failed_pages']:
-                task['failed_pages'].append(page_num)
-
-        task['current_page'] = page_num
-        task['last_update'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-
-        self._save_progress()
+        with self._lock:
+            conn = self._conn
+            bits = self._load_bits(conn, task_id)
+            if bits is None:
+                return
+            completed, failed = bits
+
+            completed_delta = failed_delta = 0
+            if success:
+                if not _test_bit(completed, page_num):
+                    _set_bit(completed, page_num, True)
+                    completed_delta = 1
+                # 从失败列表中移除（如果之前失败过）
+                if _test_bit(failed, page_num):
+                    _set_bit(failed, page_num, False)
+                    failed_delta = -1
+            elif not _test_bit(failed, page_num):
+                _set_bit(failed, page_num, True)
+                failed_delta = 1
+
+            with conn:
+                conn.execute('''
+                    UPDATE tasks SET completed_bits = ?, failed_bits = ?,
+                        completed_count = completed_count + ?, failed_count = failed_count + ?,
+                        current_page = ?, last_update = ?
+                    WHERE task_id = ?
+                ''', (bytes(completed), bytes(failed), completed_delta, failed_delta,
+                      page_num, self._now(), task_id))
+
+    def _update_task(self, task_id: str, **fields) -> bool:
+        """更新任务的若干字段，任务不存在时返回 False"""
+        assignments = ', '.join(f"{name} = ?" for name in fields)
+        with self._lock, self._conn:
+            cursor = self._conn.execute(f'UPDATE tasks SET {assignments} WHERE task_id = ?',
+                                        list(fields.values()) + [task_id])
+            return cursor.rowcount > 0
 
     def update_stats(self, task_id: str, videos_count: int, actors_count: int):
         """
@@ -143,14 +313,7 @@ class ProgressTracker:
             videos_count: 视频数量
             actors_count: 演员数量
         """
-        if task_id not in self.progress:
-            return
-
-        self.progress[task_id]['stats'] = {
-            'videos_count': videos_count,
-            'actors_count': actors_count
-        }
-        self._save_progress()
+        self._update_task(task_id, videos_count=videos_count, actors_count=actors_count)
 
     def complete_task(self, task_id: str):
         """
@@ -159,13 +322,9 @@ class ProgressTracker:
         Args:
             task_id: 任务ID
         """
-        if task_id not in self.progress:
+        if not self._update_task(task_id, status='completed', last_update=self._now()):
             return
 
-        self.progress[task_id]['status'] = 'completed'
-        self.progress[task_id]['last_update'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        self._save_progress()
-
         print(f"✓ 任务已完成: {task_id}")
 
     def fail_task(self, task_id: str, error: str):
@@ -176,13 +335,7 @@ class ProgressTracker:
             task_id: 任务ID
             error: 错误信息
         """
-        if task_id not in self.progress:
-            return
-
-        self.progress[task_id]['status'] = 'failed'
-        self.progress[task_id]['error'] = error
-        self.progress[task_id]['last_update'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        self._save_progress()
+        self._update_task(task_id, status='failed', error=error, last_update=self._now())
 
     def get_pending_pages(self, task_id: str) -> List[int]:
         """
@@ -194,15 +347,15 @@ class ProgressTracker:
         Returns:
             待处理页码列表
         """
-        if task_id not in self.progress:
+        task = self._get_task_by_id(task_id)
+        if not task:
             return []
 
-        task = self.progress[task_id]
-        total_pages = task['total_pages']
-        completed = set(task['completed_pages'])
+        with self._lock:
+            completed = self._load_bits(self._conn, task_id)[0]
 
         # 返回未完成的页码
-        return [i for i in range(1, total_pages + 1) if i not in completed]
+        return [i for i in range(1, task['total_pages'] + 1) if not _test_bit(completed, i)]
 
     def get_resume_info(self, task_type: str) -> Optional[Dict]:
         """
@@ -246,12 +399,11 @@ class ProgressTracker:
         Args:
             task_id: 任务ID
         """
-        if task_id not in self.progress:
+        task = self._get_task_by_id(task_id)
+        if not task:
             print(f"⚠️  任务不存在: {task_id}")
             return
 
-        task = self.progress[task_id]
-
         print("\n" + "="*80)
         print("任务进度")
         print("="*80)
@@ -282,7 +434,7 @@ class ProgressTracker:
 
 if __name__ == '__main__':
     # 测试
-    tracker = ProgressTracker('./test_progress.json')
+    tracker = ProgressTracker('./test_progress.db')
 
     # 模拟任务
     task_id = tracker.start_task('init', 10)
@@ -300,8 +452,9 @@ if __name__ == '__main__':
     print(f"\n恢复信息: {resume_info}")
 
     # 清理测试文件
-    import os
-    if os.path.exists('./test_progress.json'):
-        os.remove('./test_progress.json')
+    tracker.close()
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists('./test_progress.db' + suffix):
+            os.remove('./test_progress.db' + suffix)
 
     print("\n✓ 进度跟踪模块测试完成")
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+跨进程共享的按站点限速器
+分析爬取、订阅同步、热门下载经常被 cron 同时启动，各自的固定间隔叠加后会超过站点容忍的频率。
+这里用一个小 SQLite 文件保存每个站点的令牌桶，所有进程的页面获取都从同一个桶里取令牌，
+合计请求速率保持在限流阈值之下，而单个任务不必各自保守地降速
+"""
+
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+from config import CONF
+
+# 令牌桶数据库路径，可通过 config.json 的 rate_limit_path 覆盖
+DEFAULT_LIMIT_PATH = './.rate_limits.db'
+
+# 各站点的默认限速：rate 为每秒补充的令牌数，burst 为桶容量
+# 默认不限速：还没有站点限流阈值的实测数据，热门页的翻页节奏由 adaptive_pacer 按验证/延迟信号调整；
+# 多个任务同时运行需要合计限速时在 config.json 的 rate_limits 中配置，例如 {"jable.tv": {"rate": 2, "burst": 5}}
+DEFAULT_RATE_LIMITS: Dict[str, Dict] = {}
+
+_stats_lock = threading.Lock()
+LIMITER_STATS = {
+    'acquired': 0,
+    'throttled': 0,
+    'total_wait': 0.0,
+}
+
+
+def get_limit(host: str) -> Optional[Dict]:
+    """
+    获取站点的限速配置（子域名使用主域名的配置）
+
+    Returns:
+        {'key': 桶名, 'rate': ..., 'burst': ...}；不限速返回 None
+    """
+    limits = dict(DEFAULT_RATE_LIMITS)
+    limits.update(CONF.get('rate_limits', {}))
+
+    host = host.lower().split(':')[0]
+    for key, limit in limits.items():
+        if host == key or host.endswith('.' + key):
+            if not limit or not limit.get('rate'):
+                return None
+            return {'key': key, 'rate': float(limit['rate']), 'burst': float(limit.get('burst', 1))}
+    return None
+
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(CONF.get('rate_limit_path', DEFAULT_LIMIT_PATH), timeout=30,
+                           isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS buckets (
+            host TEXT PRIMARY KEY,
+            tokens REAL NOT NULL,
+            updated_at REAL NOT NULL
+        )
+    ''')
+    return conn
+
+
+def _reserve(key: str, rate: float, burst: float) -> float:
+    """
+    从令牌桶预订一个令牌，返回需要等待的秒数
+
+    令牌不足时允许余额变为负数（相当于排队），等待时间按欠下的令牌数计算，
+    因此多个进程同时请求时会依次错开，而不需要轮询
+    """
+    conn = _connect()
+    try:
+        # BEGIN IMMEDIATE 在读之前就拿到写锁，保证跨进程的读-改-写是原子的
+        conn.execute('BEGIN IMMEDIATE')
+        now = time.time()
+        row = conn.execute('SELECT tokens, updated_at FROM buckets WHERE host = ?', (key,)).fetchone()
+        if row:
+            tokens = min(burst, row[0] + (now - row[1]) * rate)
+        else:
+            tokens = burst
+
+        tokens -= 1
+        conn.execute('INSERT OR REPLACE INTO buckets (host, tokens, updated_at) VALUES (?, ?, ?)',
+                     (key, tokens, now))
+        conn.execute('COMMIT')
+    except Exception:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+
+    return max(0.0, -tokens / rate)
+
+
+def acquire(url: str) -> float:
+    """
+    请求某个 URL 之前获取令牌（必要时阻塞等待）
+
+    Args:
+        url: 即将请求的 URL
+
+    Returns:
+        实际等待的秒数；该站点未配置限速时返回 0
+    """
+    limit = get_limit(urlsplit(url).netloc)
+    if not limit:
+        return 0.0
+
+    try:
+        wait = _reserve(limit['key'], limit['rate'], limit['burst'])
+    except sqlite3.Error as e:
+        # 限速器不可用时不阻塞抓取
+        print(f"  [RateLimit] ⚠️  限速器不可用: {str(e)[:80]}")
+        return 0.0
+
+    with _stats_lock:
+        LIMITER_STATS['acquired'] += 1
+        if wait > 0:
+            LIMITER_STATS['throttled'] += 1
+            LIMITER_STATS['total_wait'] += wait
+
+    if wait > 0:
+        time.sleep(wait)
+    return wait
+
+
+def get_limiter_stats() -> Dict:
+    """返回本次运行的限速统计"""
+    with _stats_lock:
+        return dict(LIMITER_STATS)
+
+
+def print_limiter_stats() -> None:
+    """打印本次运行的限速统计"""
+    stats = get_limiter_stats()
+    if not stats['acquired']:
+        return
+    print(f"  共享限速: {stats['acquired']} 次请求，其中 {stats['throttled']} 次等待，"
+          f"共等待 {stats['total_wait']:.1f} 秒")
+
+
+if __name__ == '__main__':
+    # 简单自测：按每秒 0.5 个令牌、容量 3 连续获取 5 个令牌，观察排队等待
+    CONF.setdefault('rate_limits', {}).setdefault('jable.tv', {'rate': 0.5, 'burst': 3})
+    for i in range(5):
+        waited = acquire('https://jable.tv/hot/')
+        print(f"第 {i + 1} 次: 等待 {waited:.2f} 秒")
+    print_limiter_stats()
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+统一的重试/退避模块
+指数退避 + 随机抖动，支持 Retry-After、按操作的总耗时预算（deadline），
+区分永久性错误（不重试）和临时性错误，并统计每类操作在工作和等待上花的时间
+"""
+
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Optional
+
+from config import CONF
+
+
+class PermanentError(Exception):
+    """永久性错误（如 HTTP 404/410），重试没有意义"""
+
+
+class TransientError(Exception):
+    """临时性错误，可以重试；retry_after 为服务端要求的等待秒数"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(Exception):
+    """操作的总耗时预算已用完"""
+
+
+# 永久性 HTTP 状态码
+PERMANENT_STATUS_CODES = {400, 401, 404, 405, 410, 451}
+
+
+class RetryPolicy:
+    """
+    重试策略
+
+    Args:
+        attempts: 最多尝试次数
+        base_delay: 第一次重试前的等待（秒），之后按 2 的幂增长
+        max_delay: 单次等待上限（秒）
+        deadline: 整个操作（含所有重试和等待）的总耗时预算（秒），None 表示不限制
+        jitter: 抖动比例，实际等待在 [delay * (1 - jitter), delay] 之间
+    """
+
+    def __init__(self, attempts: int = 5, base_delay: float = 1.0, max_delay: float = 60.0,
+                 deadline: Optional[float] = None, jitter: float = 0.5):
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.jitter = jitter
+
+    def with_attempts(self, attempts: int) -> 'RetryPolicy':
+        """复制一份策略并修改尝试次数（兼容原有函数的 retry 参数）"""
+        return RetryPolicy(attempts, self.base_delay, self.max_delay, self.deadline, self.jitter)
+
+    def delay_for(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """第 attempt 次失败后应等待的秒数"""
+        if retry_after is not None:
+            return min(max(retry_after, 0.0), self.max_delay)
+        delay = min(self.base_delay * (2 ** (attempt - 1)), self.max_delay)
+        return random.uniform(delay * (1 - self.jitter), delay)
+
+
+# 各类操作的默认策略
+DEFAULT_POLICIES = {
+    # 普通 HTTP 请求（m3u8、密钥、封面）
+    'http': RetryPolicy(attempts=5, base_delay=2, max_delay=30, deadline=180),
+    # 视频片段：单个片段最多花 120 秒
+    'segment': RetryPolicy(attempts=5, base_delay=1, max_delay=15, deadline=120),
+    # 页面获取（跨所有后端），单个页面最多花 5 分钟
+    'page': RetryPolicy(attempts=5, base_delay=5, max_delay=60, deadline=300),
+    # 单个浏览器后端内部的重试
+    'browser': RetryPolicy(attempts=3, base_delay=3, max_delay=30, deadline=240),
+    # ScrapingAnt API
+    'scrapingant': RetryPolicy(attempts=5, base_delay=15, max_delay=120, deadline=900),
+}
+
+
+def get_policy(op: str) -> RetryPolicy:
+    """
+    获取操作的重试策略
+    可通过 config.json 的 retry_policies 覆盖，例如 {"page": {"deadline": 600}}
+    """
+    policy = DEFAULT_POLICIES.get(op, DEFAULT_POLICIES['http'])
+    override = CONF.get('retry_policies', {}).get(op)
+    if not override:
+        return policy
+    return RetryPolicy(
+        attempts=override.get('attempts', policy.attempts),
+        base_delay=override.get('base_delay', policy.base_delay),
+        max_delay=override.get('max_delay', policy.max_delay),
+        deadline=override.get('deadline', policy.deadline),
+        jitter=override.get('jitter', policy.jitter),
+    )
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析 Retry-After 头：秒数或 HTTP 日期"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def check_response(response) -> None:
+    """
+    按 HTTP 状态码分类响应：2xx 直接返回，永久性错误抛 PermanentError，
+    其余抛 TransientError（带 Retry-After）
+    """
+    status = response.status_code
+    if 200 <= status < 300:
+        return
+    if status in PERMANENT_STATUS_CODES:
+        raise PermanentError(f"HTTP {status}: {response.url}")
+    raise TransientError(f"HTTP {status}: {response.url}",
+                         retry_after=parse_retry_after(response.headers.get('Retry-After')))
+
+
+# ==================== 统计 ====================
+
+_metrics_lock = threading.Lock()
+RETRY_METRICS: Dict[str, Dict] = {}
+
+
+def _record(op: str, **values) -> None:
+    with _metrics_lock:
+        metrics = RETRY_METRICS.setdefault(op, {
+            'calls': 0, 'attempts': 0, 'retries': 0, 'failures': 0,
+            'work_seconds': 0.0, 'sleep_seconds': 0.0,
+        })
+        for key, value in values.items():
+            metrics[key] += value
+
+
+def get_retry_metrics() -> Dict[str, Dict]:
+    """返回各操作的重试统计快照"""
+    with _metrics_lock:
+        return {op: dict(m) for op, m in RETRY_METRICS.items()}
+
+
+def print_retry_metrics() -> None:
+    """打印各操作在工作和等待上花的时间"""
+    metrics = get_retry_metrics()
+    if not any(m['retries'] for m in metrics.values()):
+        return
+    print(f"\n{'操作':<12} {'调用':>6} {'重试':>6} {'失败':>6} {'工作耗时':>10} {'等待耗时':>10}")
+    print("-" * 60)
+    for op, m in sorted(metrics.items()):
+        print(f"{op:<12} {m['calls']:>6} {m['retries']:>6} {m['failures']:>6} "
+              f"{m['work_seconds']:>9.1f}s {m['sleep_seconds']:>9.1f}s")
+
+
+# ==================== 执行 ====================
+
+# 剩余预算不足这么多秒时不再开始新的尝试
+MIN_ATTEMPT_SECONDS = 1.0
+
+# 当前线程中正在执行的 retry_call 的截止时间（嵌套调用时逐层入栈）
+_deadline_local = threading.local()
+
+
+def remaining_time(timeout: float) -> float:
+    """
+    单次尝试可用的超时：timeout 与当前线程所有进行中的 retry_call 剩余预算中的最小值
+    尝试内部的请求/页面加载超时都应经过它，整个操作才不会超过 deadline
+
+    Args:
+        timeout: 尝试自身的超时（秒）
+
+    Returns:
+        实际使用的超时（秒）
+    """
+    deadlines = getattr(_deadline_local, 'stack', None)
+    if not deadlines:
+        return timeout
+    # 不返回 0：Playwright 把 0 当作不限时
+    return max(min(timeout, min(deadlines) - time.time()), 0.01)
+
+def retry_call(func: Callable, op: str = 'http', policy: Optional[RetryPolicy] = None,
+               label: str = '', on_retry: Optional[Callable[[int, Exception, float], None]] = None):
+    """
+    按策略执行 func()，失败时退避重试
+
+    Args:
+        func: func(attempt)，attempt 为当前是第几次尝试（从 1 开始）
+        op: 操作类型，用于选择默认策略和统计
+        policy: 重试策略，None 则使用 get_policy(op)
+        label: 日志前缀
+        on_retry: 每次准备重试时的回调 (attempt, error, delay)，默认打印日志
+
+    Returns:
+        func 的返回值
+
+    Raises:
+        PermanentError: 永久性错误，立即抛出
+        DeadlineExceeded: 总耗时预算不足以进行下一次尝试
+        最后一次尝试的异常
+    """
+    policy = policy or get_policy(op)
+    start = time.time()
+    _record(op, calls=1)
+
+    # 截止时间入栈，尝试内部通过 remaining_time() 把超时限制在剩余预算内
+    stack = _deadline_local.__dict__.setdefault('stack', [])
+    stack.append(start + policy.deadline if policy.deadline is not None else float('inf'))
+    try:
+        return _retry_loop(func, op, policy, label, on_retry)
+    finally:
+        stack.pop()
+
+
+def _retry_loop(func: Callable, op: str, policy: RetryPolicy, label: str,
+                on_retry: Optional[Callable[[int, Exception, float], None]]):
+    last_error = None
+    for attempt in range(1, policy.attempts + 1):
+        # 剩余预算（含外层 retry_call 的）已不够一次尝试，不再开始
+        if remaining_time(float('inf')) < MIN_ATTEMPT_SECONDS:
+            _record(op, failures=1)
+            raise DeadlineExceeded(
+                f"{label or op}: deadline exceeded before attempt {attempt}"
+                + (f": {str(last_error)[:200]}" if last_error else '')) from last_error
+
+        attempt_start = time.time()
+        try:
+            result = func(attempt)
+            _record(op, attempts=1, work_seconds=time.time() - attempt_start)
+            return result
+        except PermanentError:
+            _record(op, attempts=1, failures=1, work_seconds=time.time() - attempt_start)
+            raise
+        except Exception as e:
+            _record(op, attempts=1, work_seconds=time.time() - attempt_start)
+
+            if attempt == policy.attempts:
+                _record(op, failures=1)
+                raise
+
+            last_error = e
+            delay = policy.delay_for(attempt, getattr(e, 'retry_after', None))
+            # 等待之后剩下的预算不够一次尝试，就不必再等
+            if remaining_time(float('inf')) - delay < MIN_ATTEMPT_SECONDS:
+                _record(op, failures=1)
+                raise DeadlineExceeded(
+                    f"{label or op}: deadline exceeded after {attempt} attempts: {str(e)[:200]}") from e
+
+            if on_retry:
+                on_retry(attempt, e, delay)
+            else:
+                prefix = f"  [{label}] " if label else "    "
+                print(f"{prefix}⚠ 失败 (尝试 {attempt}/{policy.attempts}): {str(e)[:80]}")
+                print(f"{prefix}⏳ {delay:.1f}秒后重试...")
+
+            _record(op, retries=1, sleep_seconds=delay)
+            time.sleep(delay)
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+订阅同步规划
+原来每个订阅单独处理：刷新自己的链接、算自己的下载列表、下载完再处理下一个，
+同一个模特链接出现在多个交集订阅里时会被重复刷新。这里先做一次全局规划：
+1. 所有订阅中不重复的链接各刷新一次（每个链接的分页并发抓取）
+2. 按订阅求交集，合并所有订阅需要的视频，扣除本地已有和屏蔽列表
+3. 生成一个去重、按优先级排序的全局下载队列
+规划结果可以先 --dry-run 查看，再真正开始下载
+"""
+
+import time
+from typing import Dict, List, Optional
+
+from config import CONF
+import video_index_store
+
+BASE_VIDEO_URL = "https://jable.tv/videos/"
+
+
+def subscription_key(sub: List[Dict]) -> str:
+    """订阅的唯一标识（链接排序后拼接）"""
+    return '|'.join(sorted(item['url'] for item in sub))
+
+
+def subscription_name(sub: List[Dict]) -> str:
+    return '-'.join(item['name'] for item in sub)
+
+
+def refresh_indexes(all_subs: List[List[Dict]], workers: Optional[int] = None) -> Dict[str, Optional[str]]:
+    """
+    刷新所有订阅中出现的链接（每个链接只刷新一次）
+    链接逐个刷新，并发由每个链接内部的分页获取池提供，总线程数不超过 workers
+
+    Args:
+        all_subs: 所有订阅
+        workers: 并发数（None 则使用 fetch_workers 配置）
+
+    Returns:
+        {url: 错误信息}，刷新成功的链接值为 None；失败的链接沿用索引库中的旧数据
+    """
+    import model_crawler
+
+    urls = list(dict.fromkeys(item['url'] for sub in all_subs for item in sub))
+    total_refs = sum(len(sub) for sub in all_subs)
+    print(f"刷新订阅索引: {len(urls)} 个不重复链接（订阅中共引用 {total_refs} 次）")
+
+    results = {}
+    for url in urls:
+        try:
+            cached_video_ids = video_index_store.get_video_ids(url)
+            remote_video_ids = model_crawler.get_all_video_ids(url, cached_video_ids, workers=workers)
+            changes = video_index_store.update_video_ids(url, remote_video_ids)
+        except Exception as e:
+            print(f"\n⚠️  刷新失败，沿用缓存索引: {url} ({str(e)[:100]})")
+            results[url] = str(e)
+            continue
+        if changes['added'] or changes['removed']:
+            print(f"\n  {url}: 新增 {changes['added']}，移除 {changes['removed']}")
+        results[url] = None
+    return results
+
+
+class SyncPlan:
+    """
+    全局同步计划
+
+    Attributes:
+        queue: 按优先级排好的下载队列 [{'video_id', 'url', 'subs', 'first_seen', 'is_new'}]
+        subs: 每个订阅的统计 {key: {'name', 'remote', 'local', 'needed', 'new'}}
+        refresh_errors: 刷新失败的链接
+    """
+
+    def __init__(self):
+        self.queue: List[Dict] = []
+        self.subs: Dict[str, Dict] = {}
+        self.refresh_errors: Dict[str, str] = {}
+
+    def pending_keys(self) -> Dict[str, int]:
+        """每个订阅还有多少个视频在队列中"""
+        pending = {key: 0 for key in self.subs}
+        for item in self.queue:
+            for key in item['subs']:
+                pending[key] += 1
+        return pending
+
+    def print_report(self, limit: int = 20) -> None:
+        """打印同步计划"""
+        print("\n" + "=" * 80)
+        print("同步计划")
+        print("=" * 80)
+        print(f"{'订阅':<40} {'远端':>8} {'已有':>8} {'待下载':>8} {'新增':>6}")
+        print("-" * 80)
+        for info in self.subs.values():
+            print(f"{info['name'][:40]:<40} {info['remote']:>8} {info['local']:>8} "
+                  f"{info['needed']:>8} {info['new']:>6}")
+
+        needed_total = sum(info['needed'] for info in self.subs.values())
+        print("-" * 80)
+        print(f"全局下载队列: {len(self.queue)} 个视频"
+              f"（各订阅合计 {needed_total} 个，去重节省 {needed_total - len(self.queue)} 个）")
+        if self.refresh_errors:
+            print(f"⚠️  {len(self.refresh_errors)} 个链接刷新失败，使用了缓存索引")
+
+        if self.queue:
+            print(f"\n队列前 {min(limit, len(self.queue))} 个:")
+            for index, item in enumerate(self.queue[:limit], 1):
+                tags = []
+                if item['is_new']:
+                    tags.append('新')
+                if len(item['subs']) > 1:
+                    tags.append(f"{len(item['subs'])}个订阅")
+                print(f"  {index:>3}. {item['video_id']:<20} {' '.join(tags)}")
+        print("=" * 80)
+
+
+def build_plan(all_subs: List[List[Dict]], ignore_video_ids: set,
+               refresh: bool = True, workers: Optional[int] = None) -> SyncPlan:
+    """
+    生成全局同步计划
+
+    Args:
+        all_subs: 订阅列表
+        ignore_video_ids: 本地已有 + 屏蔽的视频 ID
+        refresh: 是否先刷新索引
+        workers: 刷新索引的并发数
+
+    Returns:
+        SyncPlan
+    """
+    plan = SyncPlan()
+    if refresh:
+        plan.refresh_errors = {url: error for url, error in refresh_indexes(all_subs, workers).items() if error}
+
+    items: Dict[str, Dict] = {}
+    for sub in all_subs:
+        key = subscription_key(sub)
+        urls = [item['url'] for item in sub]
+        remote = video_index_store.get_intersection_first_seen(urls)
+        last_sync = video_index_store.get_last_sync(key)
+
+        needed = {video_id: seen for video_id, seen in remote.items() if video_id not in ignore_video_ids}
+        new_count = 0
+        for video_id, seen in needed.items():
+            is_new = last_sync is not None and seen > last_sync
+            new_count += is_new
+            item = items.setdefault(video_id, {
+                'video_id': video_id,
+                'url': BASE_VIDEO_URL + video_id + '/',
+                'subs': [],
+                'first_seen': seen,
+                'is_new': False,
+            })
+            item['subs'].append(key)
+            item['first_seen'] = max(item['first_seen'], seen)
+            item['is_new'] = item['is_new'] or is_new
+
+        plan.subs[key] = {
+            'name': subscription_name(sub),
+            'remote': len(remote),
+            'local': len(remote) - len(needed),
+            'needed': len(needed),
+            'new': new_count,
+        }
+
+    # 优先级：上次同步以来新增的 > 被多个订阅需要的 > 最近进入索引的
+    plan.queue = sorted(items.values(),
+                        key=lambda item: (not item['is_new'], -len(item['subs']), -item['first_seen'],
+                                          item['video_id']))
+    return plan
+
+
+def execute_plan(plan: SyncPlan, download_interval: Optional[float] = None) -> None:
+    """
+    按队列顺序下载；某个订阅的视频全部处理完后记录同步时间
+
+    Args:
+        plan: 同步计划
+        download_interval: 每个视频之间的间隔（秒），None 则使用 downloadInterval 配置
+    """
+    import video_crawler
+
+    if download_interval is None:
+        download_interval = CONF.get("downloadInterval", 1)
+
+    pending = plan.pending_keys()
+    failed_keys = set()
+
+    # 没有待下载视频的订阅直接记为已同步
+    for key, count in pending.items():
+        if count == 0:
+            video_index_store.mark_synced(key)
+
+    total = len(plan.queue)
+    for index, item in enumerate(plan.queue):
+        print("\n全局队列共 %s 个 / 剩余 %s 个: %s" % (total, total - index, item['video_id']))
+        try:
+            # 没拿到下载链接时返回 None，同样算失败，不能推进订阅的同步时间
+            if video_crawler.download_by_video_url(item['url']) is None:
+                print(f"\n✗ {item['video_id']} 获取下载链接失败")
+                failed_keys.update(item['subs'])
+        except Exception as e:
+            print(f"\n✗ {item['video_id']} 下载失败: {str(e)[:100]}")
+            failed_keys.update(item['subs'])
+
+        for key in item['subs']:
+            pending[key] -= 1
+            if pending[key] == 0 and key not in failed_keys:
+                video_index_store.mark_synced(key)
+                print("订阅 %s 同步完成" % plan.subs[key]['name'])
+
+        if index < total - 1:
+            time.sleep(download_interval)
+
+
+def enqueue_plan(plan: SyncPlan) -> int:
+    """
+    把同步计划加入持久化下载队列（保持队列顺序作为优先级），由下载服务执行
+
+    入队即视为已同步：任务持久保存，不会因进程退出而丢失
+    """
+    import job_queue
+
+    added = job_queue.enqueue_urls([item['url'] for item in plan.queue], source='subscription')
+    for key in plan.subs:
+        video_index_store.mark_synced(key)
+    return added
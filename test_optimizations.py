@@ -132,7 +132,8 @@ def test_checkpoint_resume():
     import os
 
     # 使用测试文件
-    test_file = './test_checkpoint.json'
+    test_file = './test_checkpoint.db'
+    tracker = None
 
     try:
         tracker = ProgressTracker(test_file)
@@ -171,8 +172,12 @@ def test_checkpoint_resume():
 
     finally:
         # 清理测试文件
+        if tracker is not None:
+            tracker.close()
         if os.path.exists(test_file):
-            os.remove(test_file)
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(test_file + suffix):
+                    os.remove(test_file + suffix)
             print(f"  ✓ 清理测试文件")
 
 
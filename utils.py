@@ -7,16 +7,19 @@
 这是完整的 utils.py 替代版本，包含所有必要的函数
 """
 
-import json
 import os
 from pathlib import Path
 import re
 import requests
-import time
 from urllib import parse
 
+from cloudflare_waiter import wait_until_ready
 from config import CONF
+import fetch_backends
+import retry_policy
+import video_index_store
 
+# 订阅索引已迁移到 video_index_store（SQLite），旧文件只在首次使用时导入
 video_index_cache_filename = "./jable_index_cache.json"
 
 HEADERS = CONF.get("headers")
@@ -25,12 +28,8 @@ logged = False
 
 
 def get_video_ids_map_from_cache():
-    cache = {}
-    if os.path.exists(video_index_cache_filename):
-        with open(video_index_cache_filename, 'r', encoding='utf-8') as f:
-            cache = json.load(f)
-
-    return cache
+    """兼容旧接口：返回 {url: [video_id, ...]}"""
+    return video_index_store.get_index_map()
 
 
 def _add_proxy(query_param, retry_index, ignore_proxy):
@@ -40,61 +39,83 @@ def _add_proxy(query_param, retry_index, ignore_proxy):
             query_param['proxies'] = proxies_config
 
 
-def requests_with_retry(url, headers=HEADERS, timeout=20, retry=5, ignore_proxy=False):
-    query_param = {
-        'headers': headers,
-        'timeout': timeout
-    }
+def requests_with_retry(url, headers=HEADERS, timeout=20, retry=5, ignore_proxy=False, op='http'):
+    """
+    带重试的 GET 请求
 
-    for i in range(1, retry+1):
+    重试由 retry_policy 统一处理：指数退避 + 抖动，遵守 Retry-After，
+    404/410 等永久性错误不重试，整个请求受 op 对应策略的总耗时预算约束
+
+    Args:
+        url: 请求 URL
+        headers: 请求头
+        timeout: 单次请求超时（秒）
+        retry: 最多尝试次数
+        ignore_proxy: 首次请求不走代理（节省代理流量），失败后再使用代理
+        op: 重试策略类型（http / segment）
+    """
+    policy = retry_policy.get_policy(op).with_attempts(retry)
+
+    def attempt_get(attempt):
+        query_param = {
+            'headers': headers,
+            'timeout': retry_policy.remaining_time(timeout)
+        }
+        _add_proxy(query_param, attempt, ignore_proxy)
         try:
-            _add_proxy(query_param, i, ignore_proxy)
             response = requests.get(url, **query_param)
-        except Exception as e:
-            if i == 1 and ignore_proxy:
-                continue
-            if i < retry:
-                wait_time = min(10 * i, 30)
-                print(f"    ⚠ 请求失败 (尝试 {i}/{retry}): {str(e)[:80]}")
-                print(f"    ⏳ {wait_time}秒后重试...")
-                time.sleep(wait_time)
-            else:
-                print(f"    ✗ 请求最终失败: {str(e)[:80]}")
-            continue
+        except requests.RequestException:
+            if attempt > 1 or not ignore_proxy:
+                raise
+            # 不走代理失败，立即改用代理重试，不计入退避等待
+            _add_proxy(query_param, 2, ignore_proxy)
+            response = requests.get(url, **query_param)
 
-        if str(response.status_code).startswith('2'):
-            return response
-        else:
+        try:
+            retry_policy.check_response(response)
+        except retry_policy.PermanentError:
             # 对于永久性错误（404, 410），不重试
-            if response.status_code in [404, 410]:
-                if response.status_code == 410:
-                    print(f"    ✗ HTTP 410 Gone: 资源已过期或永久消失")
-                    print(f"    💡 提示: 链接可能包含时间戳已过期，或服务器时间不准确")
-                else:
-                    print(f"    ✗ HTTP 404: 资源不存在")
-                raise Exception(f"HTTP {response.status_code}: {url}")
+            if response.status_code == 410:
+                print(f"    ✗ HTTP 410 Gone: 资源已过期或永久消失")
+                print(f"    💡 提示: 链接可能包含时间戳已过期，或服务器时间不准确")
+            else:
+                print(f"    ✗ HTTP {response.status_code}: 资源不存在")
+            raise
+        return response
 
-            # 对于其他错误，重试
-            if i < retry:
-                wait_time = min(10 * i, 30)
-                print(f"    ⚠ HTTP错误 (尝试 {i}/{retry}): 状态码 {response.status_code}")
-                print(f"    ⏳ {wait_time}秒后重试...")
-                time.sleep(wait_time)
-            continue
-    raise Exception("%s exceed max retry time %s." % (url, retry))
+    try:
+        return retry_policy.retry_call(attempt_get, op=op, policy=policy)
+    except retry_policy.PermanentError:
+        raise
+    except Exception as e:
+        print(f"    ✗ 请求最终失败: {str(e)[:80]}")
+        raise Exception("%s exceed max retry time %s." % (url, retry)) from e
 
 
-def scrapingant_requests_get(url, retry=5) -> str:
+def scrapingant_requests_get(url, retry=5, kind='default', use_cache=True) -> str:
+    """
+    获取页面 HTML（历史函数名，保留兼容）
+
+    实际通过 fetch_backends 的后端注册表获取：守护进程、ScrapingAnt、
+    本地 Playwright 等后端按 kind 对应的策略依次尝试，失败的后端会被熔断
+
+    Args:
+        url: 页面 URL
+        retry: 重试轮数
+        kind: 调用场景（list / video / default）
+        use_cache: 是否使用页面缓存（html_cache）
+    """
     global logged
-    if not CONF.get('sa_token'):
-        if not logged:
-            logged = True
-            print("You need to go to https://app.scrapingant.com/ website to\n apply for a token and fill it in the sa_token field")
-            print("Use local Playwright as a replacement.\n")
-        print("  [Playwright] 正在获取视频页面信息...")
-        # 传递 retry 参数
-        return get_response_from_playwright(url, retry=retry)
+    if not CONF.get('sa_token') and not logged:
+        logged = True
+        print("You need to go to https://app.scrapingant.com/ website to\n apply for a token and fill it in the sa_token field")
+        print("Use local Playwright as a replacement.\n")
 
+    return fetch_backends.fetch(url, kind=kind, retry=retry, use_cache=use_cache)
+
+
+def scrapingant_api_get(url, retry=5) -> str:
+    """通过 ScrapingAnt API 获取页面 HTML"""
     query_param = {
         "timeout": 180
     }
@@ -110,26 +131,45 @@ def scrapingant_requests_get(url, retry=5) -> str:
     if proxies_config and 'http' in proxies_config and 'https' in proxies_config:
         query_param['proxies'] = proxies_config
 
-    for i in range(1, retry+1):
-        try:
-            response = requests.get(reqUrl, **query_param)
-        except Exception as e:
-            if i == retry:
-                print("Unexpected Error: %s" % e)
-            time.sleep(120 * i)
-            continue
-
-        if str(response.status_code).startswith('2'):
-            return response.text
-        else:
-            time.sleep(120 * i)
-            continue
-    raise Exception("%s exceed max retry time %s" % (url, retry))
+    def attempt_get(attempt):
+        response = requests.get(reqUrl, **dict(query_param, timeout=retry_policy.remaining_time(180)))
+        # ScrapingAnt 的 4xx 多为额度/限流，按临时错误处理（遵守 Retry-After）
+        if not str(response.status_code).startswith('2'):
+            raise retry_policy.TransientError(
+                f"ScrapingAnt HTTP {response.status_code}",
+                retry_after=retry_policy.parse_retry_after(response.headers.get('Retry-After')))
+        return response.text
+
+    policy = retry_policy.get_policy('scrapingant').with_attempts(retry)
+    try:
+        return retry_policy.retry_call(attempt_get, op='scrapingant', policy=policy, label='ScrapingAnt')
+    except Exception as e:
+        print("Unexpected Error: %s" % e)
+        raise Exception("%s exceed max retry time %s" % (url, retry)) from e
 
 
 def update_video_ids_cache(data):
-    with open(video_index_cache_filename, 'w', encoding='utf8') as f:
-        json.dump(data, f, ensure_ascii=False)
+    """兼容旧接口：按链接增量写入索引"""
+    for url, video_ids in data.items():
+        video_index_store.update_video_ids(url, video_ids)
+
+
+def get_index_watermark(url):
+    """读取订阅链接的水位线，没有时返回 None"""
+    return video_index_store.get_watermark(url)
+
+
+def update_index_watermark(url, newest_id, fingerprint, full_refresh_at=None):
+    """
+    更新订阅链接的水位线
+
+    Args:
+        url: 订阅链接
+        newest_id: 首页最新的视频 ID
+        fingerprint: 首页视频 ID 序列的指纹
+        full_refresh_at: 上次完整抓取的时间戳
+    """
+    video_index_store.update_watermark(url, newest_id, fingerprint, full_refresh_at)
 
 
 def get_local_video_list(path="./"):
@@ -177,123 +217,91 @@ def get_response_from_playwright_simple(url, retry=3):
     headless_mode = CONF.get('playwright_headless', True)
     system_chrome_path = CONF.get('chrome_path', None)
 
-    for attempt in range(1, retry + 1):
-        try:
-            with sync_playwright() as p:
-                # 最简单的启动配置
-                launch_options = {
-                    'headless': headless_mode,
-                }
-
-                # 如果配置了系统浏览器，使用系统浏览器
-                if attempt == 1 and system_chrome_path:
-                    print(f"  [Simple] 检测到 chrome_path 配置: {system_chrome_path}")
-                    if os.path.exists(system_chrome_path):
-                        launch_options['executable_path'] = system_chrome_path
-                        print(f"  [Simple] ✓ 使用系统浏览器: {system_chrome_path}")
-                    else:
-                        print(f"  [Simple] ⚠️  chrome_path 路径不存在，将使用 Playwright 自带浏览器")
-                elif attempt == 1:
-                    print(f"  [Simple] 未配置 chrome_path，使用 Playwright 自带浏览器")
-
-                # 启动浏览器
-                if attempt == 1:
-                    mode_text = "无头模式" if headless_mode else "有头模式"
-                    print(f"  [Simple] 启动浏览器 ({mode_text})...")
-                    print(f"  [Simple] 原始模式：不做任何伪装")
-
-                browser = p.chromium.launch(**launch_options)
-
-                if attempt == 1:
-                    print(f"  [Simple] 浏览器版本: {browser.version}")
-
-                try:
-                    # 最简单的上下文配置 - 只配置代理
-                    context_options = {}
-
-                    if proxy:
-                        context_options['proxy'] = {'server': proxy}
-                        if attempt == 1:
-                            print(f"  [Simple] 使用代理: {proxy}")
-
-                    context = browser.new_context(**context_options)
-
-                    # 设置基础的 Referer（如果 URL 有参数）
-                    # 这样访问 ?from=1 时会带上 Referer，模拟真实的页面导航
-                    from urllib.parse import urlparse, parse_qs
-                    parsed = urlparse(url)
-                    if parsed.query:  # 如果有查询参数
-                        # 基础 URL（不带参数）作为 Referer
-                        base_url = f"{parsed.scheme}://{parsed.netloc}{parsed.path}"
-                        context.set_extra_http_headers({
-                            'Referer': base_url
-                        })
-                        if attempt == 1:
-                            print(f"  [Simple] 设置 Referer: {base_url}")
-
-                    # 创建页面
-                    page = context.new_page()
-
-                    # 直接访问 URL - 不做任何额外操作
-                    if attempt == 1:
-                        print(f"  [Simple] 正在访问: {url}")
+    def attempt_fetch(attempt):
+        with sync_playwright() as p:
+            # 最简单的启动配置
+            launch_options = {
+                'headless': headless_mode,
+            }
+
+            # 如果配置了系统浏览器，使用系统浏览器
+            if attempt == 1 and system_chrome_path:
+                print(f"  [Simple] 检测到 chrome_path 配置: {system_chrome_path}")
+                if os.path.exists(system_chrome_path):
+                    launch_options['executable_path'] = system_chrome_path
+                    print(f"  [Simple] ✓ 使用系统浏览器: {system_chrome_path}")
+                else:
+                    print(f"  [Simple] ⚠️  chrome_path 路径不存在，将使用 Playwright 自带浏览器")
+            elif attempt == 1:
+                print(f"  [Simple] 未配置 chrome_path，使用 Playwright 自带浏览器")
 
-                    # 使用 domcontentloaded 更快，不等待所有资源加载
-                    # 增加超时到 120 秒，避免网络慢时超时
-                    page.goto(url, wait_until='domcontentloaded', timeout=120000)
+            # 启动浏览器
+            if attempt == 1:
+                mode_text = "无头模式" if headless_mode else "有头模式"
+                print(f"  [Simple] 启动浏览器 ({mode_text})...")
+                print(f"  [Simple] 原始模式：不做任何伪装")
 
-                    # 等待页面加载完成
-                    if attempt == 1:
-                        print(f"  [Simple] 页面加载完成")
+            browser = p.chromium.launch(**launch_options)
 
-                    # 简单等待一下确保内容加载
-                    page.wait_for_timeout(3000)
+            if attempt == 1:
+                print(f"  [Simple] 浏览器版本: {browser.version}")
 
-                    # 获取页面内容
-                    html = page.content()
+            try:
+                # 最简单的上下文配置 - 只配置代理
+                context_options = {}
 
-                    # 检查是否遇到 Cloudflare
-                    if 'Just a moment' in html or 'Verify you are human' in html or '請稍候' in html:
-                        if attempt == 1:
-                            print(f"  [Simple] 检测到 Cloudflare 验证页面")
-
-                        # 简单等待 - 不做任何模拟
-                        if attempt == 1:
-                            print(f"  [Simple] 等待 Cloudflare 自动验证...")
+                if proxy:
+                    context_options['proxy'] = {'server': proxy}
+                    if attempt == 1:
+                        print(f"  [Simple] 使用代理: {proxy}")
+
+                context = browser.new_context(**context_options)
+
+                # 设置基础的 Referer（如果 URL 有参数）
+                # 这样访问 ?from=1 时会带上 Referer，模拟真实的页面导航
+                from urllib.parse import urlparse, parse_qs
+                parsed = urlparse(url)
+                if parsed.query:  # 如果有查询参数
+                    # 基础 URL（不带参数）作为 Referer
+                    base_url = f"{parsed.scheme}://{parsed.netloc}{parsed.path}"
+                    context.set_extra_http_headers({
+                        'Referer': base_url
+                    })
+                    if attempt == 1:
+                        print(f"  [Simple] 设置 Referer: {base_url}")
 
-                        max_wait = 60  # 增加到 60 秒
-                        for i in range(max_wait):
-                            page.wait_for_timeout(1000)
-                            html = page.content()
+                # 创建页面
+                page = context.new_page()
 
-                            if 'Just a moment' not in html and 'Verify you are human' not in html and '請稍候' not in html:
-                                print(f"  [Simple] ✓ Cloudflare 验证通过 (等待 {i+1} 秒)")
-                                break
+                # 直接访问 URL - 不做任何额外操作
+                if attempt == 1:
+                    print(f"  [Simple] 正在访问: {url}")
 
-                            if (i + 1) % 10 == 0:
-                                print(f"  [Simple] 仍在等待... ({i+1}/{max_wait}秒)")
+                # 使用 domcontentloaded 更快，不等待所有资源加载
+                # 增加超时到 120 秒，避免网络慢时超时
+                page.goto(url, wait_until='domcontentloaded', timeout=retry_policy.remaining_time(120) * 1000)
 
-                        # 最后再取一次内容
-                        html = page.content()
+                # 等待页面加载完成
+                if attempt == 1:
+                    print(f"  [Simple] 页面加载完成")
 
-                    if attempt == 1:
-                        print(f"  [Simple] 完成！HTML 长度: {len(html)}")
+                # 等待页面就绪：遇到 Cloudflare 验证时由导航/选择器事件驱动，
+                # 页面一旦可用立即返回，不再固定等待和按秒轮询
+                html, _ = wait_until_ready(page, label='Simple')
 
-                    return html
+                if attempt == 1:
+                    print(f"  [Simple] 完成！HTML 长度: {len(html)}")
 
-                finally:
-                    browser.close()
+                return html
 
-        except Exception as e:
-            print(f"  [Simple] 错误 (尝试 {attempt}/{retry}): {str(e)[:200]}")
-            if attempt == retry:
-                raise Exception(f"Simple request failed after {retry} attempts: {str(e)}")
-            # 递增等待时间：第1次失败等5秒，第2次等10秒，第3次等15秒...
-            wait_time = 5 * attempt
-            print(f"  [Simple] 等待 {wait_time} 秒后重试...")
-            time.sleep(wait_time)
+            finally:
+                browser.close()
 
-    raise Exception(f"Simple request failed: {url}")
+    policy = retry_policy.get_policy('browser').with_attempts(retry)
+    try:
+        return retry_policy.retry_call(attempt_fetch, op='browser', policy=policy, label='Simple')
+    except Exception as e:
+        raise Exception(f"Simple request failed after {retry} attempts: {str(e)}") from e
 
 
 # 兼容性：提供和原来一样的函数名
@@ -6,80 +6,213 @@
 2. 禁用图片、CSS、字体等资源加载
 3. 移除不必要的固定等待
 4. 降低超时时间
-5. 支持并发爬取
+5. 支持并发爬取：所有线程共享一个浏览器和上下文（Cookie、Cloudflare 验证结果只需一份），每个线程一个页面。
+   Playwright 同步 API 的对象不能跨线程使用，所以浏览器作为独立进程启动，各线程通过 CDP 各自连接
 """
 
+import json
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
 import time
-from playwright.sync_api import sync_playwright, Browser, BrowserContext, Page
+import urllib.request
+from playwright.sync_api import sync_playwright, Page
 from typing import Optional
 
 import config
+from cloudflare_waiter import wait_until_ready
+import retry_policy
 
 CONF = config.CONF
 
-# 全局浏览器实例（复用）
-_playwright = None
-_browser: Optional[Browser] = None
-_context: Optional[BrowserContext] = None
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
 
+# 所有线程共享的浏览器进程（generation 在每次关闭后加一，旧的线程连接据此作废）
+_shared_lock = threading.Lock()
+_shared = {
+    'process': None,
+    'endpoint': None,
+    'user_data_dir': None,
+    'generation': 0,
+}
 
-def get_browser_instance():
-    """
-    获取或创建浏览器实例（复用）
-    """
-    global _playwright, _browser, _context
-
-    if _browser is None:
-        _playwright = sync_playwright().start()
-
-        chrome_path = CONF.get('chrome_path', None)
-        use_system_chrome = False
-
-        if chrome_path:
-            import os
-            if os.path.exists(chrome_path):
-                use_system_chrome = True
-                print(f"  [Fast] ✓ 使用系统浏览器: {chrome_path}")
-            else:
-                print(f"  [Fast] ⚠️  chrome_path 路径不存在，使用 Playwright 自带浏览器")
-
-        # 启动浏览器
-        if use_system_chrome:
-            _browser = _playwright.chromium.launch(
-                headless=False,
-                executable_path=chrome_path
-            )
+# 每个线程自己的 CDP 连接和页面（playwright / browser / context / page / generation）
+_local = threading.local()
+
+
+def _free_port() -> int:
+    """取一个空闲的本地端口"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _launch_shared_browser(playwright) -> None:
+    """启动共享的浏览器进程并等待调试端口就绪（调用方持有 _shared_lock）"""
+    chrome_path = CONF.get('chrome_path', None)
+    executable = playwright.chromium.executable_path
+
+    if chrome_path:
+        if os.path.exists(chrome_path):
+            executable = chrome_path
+            print(f"  [Fast] ✓ 使用系统浏览器: {chrome_path}")
         else:
-            _browser = _playwright.chromium.launch(headless=False)
+            print(f"  [Fast] ⚠️  chrome_path 路径不存在，使用 Playwright 自带浏览器")
+
+    port = _free_port()
+    user_data_dir = tempfile.mkdtemp(prefix='jable_chrome_')
+    process = subprocess.Popen([
+        executable,
+        f'--remote-debugging-port={port}',
+        f'--user-data-dir={user_data_dir}',
+        f'--user-agent={USER_AGENT}',
+        '--window-size=1920,1080',
+        '--no-first-run',
+        '--no-default-browser-check',
+        'about:blank',
+    ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    endpoint = f'http://127.0.0.1:{port}'
+    deadline = time.time() + 30
+    while True:
+        try:
+            with urllib.request.urlopen(f'{endpoint}/json/version', timeout=2):
+                break
+        except OSError:
+            if process.poll() is not None or time.time() > deadline:
+                process.kill()
+                shutil.rmtree(user_data_dir, ignore_errors=True)
+                raise Exception(f"浏览器启动失败: {executable}")
+            time.sleep(0.2)
+
+    _shared['process'] = process
+    _shared['endpoint'] = endpoint
+    _shared['user_data_dir'] = user_data_dir
+    print(f"  [Fast] ✓ 浏览器已启动（所有线程共享此实例）")
+
+
+def _disconnect_local() -> None:
+    """断开当前线程的连接（浏览器进程已关闭时忽略错误）"""
+    for name in ('page', 'browser'):
+        obj = getattr(_local, name, None)
+        if obj is not None:
+            try:
+                obj.close()
+            except Exception:
+                pass
+            setattr(_local, name, None)
+    _local.context = None
+    if getattr(_local, 'playwright', None) is not None:
+        _local.playwright.stop()
+        _local.playwright = None
+
+
+def get_browser_instance(storage_state: Optional[str] = None):
+    """
+    获取当前线程到共享浏览器的连接（没有共享浏览器时先启动）
 
-        print(f"  [Fast] ✓ 浏览器已启动（将复用此实例）")
+    Args:
+        storage_state: 浏览器状态文件（Cookie 等），仅在启动浏览器时加载到共享上下文，
+                       用于复用之前通过的 Cloudflare 验证（None 则使用守护进程的状态文件）
 
-        # 创建上下文
-        _context = _browser.new_context(
-            viewport={'width': 1920, 'height': 1080},
-            user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        )
+    Returns:
+        (当前线程的浏览器连接, 共享的上下文)
+    """
+    process = _shared['process']
+    if (getattr(_local, 'browser', None) is not None and _local.generation == _shared['generation']
+            and process is not None and process.poll() is None):
+        return _local.browser, _local.context
+
+    # 浏览器已被关闭、重启过或意外退出，丢弃旧连接
+    _disconnect_local()
+    _local.playwright = sync_playwright().start()
+
+    with _shared_lock:
+        if _shared['process'] is not None and _shared['process'].poll() is not None:
+            print("  [Fast] ⚠️  浏览器进程已退出，重新启动")
+            shutil.rmtree(_shared['user_data_dir'], ignore_errors=True)
+            _shared.update(process=None, endpoint=None, user_data_dir=None,
+                           generation=_shared['generation'] + 1)
+        launched = _shared['process'] is None
+        if launched:
+            _launch_shared_browser(_local.playwright)
+        _local.generation = _shared['generation']
+        _local.browser = _local.playwright.chromium.connect_over_cdp(_shared['endpoint'])
+        # 浏览器的默认上下文，所有连接看到的都是同一个
+        _local.context = _local.browser.contexts[0]
+
+        if launched:
+            if storage_state is None:
+                import fetch_daemon
+                storage_state = fetch_daemon.DEFAULT_STATE_FILE
+            if os.path.exists(storage_state):
+                with open(storage_state, 'r', encoding='utf-8') as f:
+                    _local.context.add_cookies(json.load(f).get('cookies', []))
+                print(f"  [Fast] ✓ 已加载浏览器状态: {storage_state}")
+
+    return _local.browser, _local.context
+
+
+def _get_page() -> Page:
+    """当前线程的页面（每个线程一个，跨请求复用）"""
+    _, context = get_browser_instance()
+    page = getattr(_local, 'page', None)
+    if page is None or page.is_closed():
+        page = _local.page = context.new_page()
+        page.set_viewport_size({'width': 1920, 'height': 1080})
+        # 禁用不必要的资源加载（图片、CSS、字体等）
+        page.route("**/*", lambda route: (
+            route.abort() if route.request.resource_type in ["image", "stylesheet", "font", "media"]
+            else route.continue_()
+        ))
+    return page
+
+
+def save_browser_state(path: str) -> bool:
+    """
+    保存共享上下文的浏览器状态（Cookie、localStorage）
 
-    return _browser, _context
+    Args:
+        path: 状态文件路径
 
+    Returns:
+        是否保存成功（当前线程未连接浏览器时返回 False）
+    """
+    context = getattr(_local, 'context', None)
+    if context is None or _local.generation != _shared['generation']:
+        return False
+    context.storage_state(path=path)
+    return True
 
-def close_browser_instance():
+
+def release_thread_browser():
     """
-    关闭浏览器实例
+    断开当前线程到共享浏览器的连接（工作线程退出时调用，浏览器继续供其他线程使用）
     """
-    global _playwright, _browser, _context
+    _disconnect_local()
 
-    if _context:
-        _context.close()
-        _context = None
 
-    if _browser:
-        _browser.close()
-        _browser = None
+def close_browser_instance():
+    """
+    关闭共享的浏览器（未启动时什么都不做），其他线程下次使用时重新连接
+    """
+    _disconnect_local()
 
-    if _playwright:
-        _playwright.stop()
-        _playwright = None
+    with _shared_lock:
+        process = _shared['process']
+        if process is None:
+            return
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        shutil.rmtree(_shared['user_data_dir'], ignore_errors=True)
+        _shared.update(process=None, endpoint=None, user_data_dir=None,
+                       generation=_shared['generation'] + 1)
 
     print("  [Fast] ✓ 浏览器已关闭")
 
@@ -89,7 +222,7 @@ def fast_requests_get(url: str, retry: int = 3) -> str:
     快速获取页面内容（优化版）
 
     优化点：
-    1. 复用浏览器实例
+    1. 复用浏览器实例和当前线程的页面
     2. 禁用图片、CSS、字体等资源
     3. 移除固定等待
     4. 降低超时时间
@@ -101,67 +234,29 @@ def fast_requests_get(url: str, retry: int = 3) -> str:
     Returns:
         页面 HTML 内容
     """
-    for attempt in range(1, retry + 1):
-        try:
-            # 获取浏览器实例（复用）
-            browser, context = get_browser_instance()
-
-            # 创建新页面
-            page = context.new_page()
-
-            # 禁用不必要的资源加载（图片、CSS、字体等）
-            page.route("**/*", lambda route: (
-                route.abort() if route.request.resource_type in ["image", "stylesheet", "font", "media"]
-                else route.continue_()
-            ))
-
-            if attempt == 1:
-                print(f"  [Fast] 正在访问: {url}")
-
-            # 使用 domcontentloaded 策略，30秒超时
-            page.goto(url, wait_until='domcontentloaded', timeout=30000)
-
-            if attempt == 1:
-                print(f"  [Fast] ✓ 页面加载完成")
-
-            # 移除固定等待 - 直接获取内容
-            html = page.content()
-
-            # 检查是否遇到 Cloudflare
-            if 'Just a moment' in html or 'Verify you are human' in html or '請稍候' in html:
-                if attempt == 1:
-                    print(f"  [Fast] 检测到 Cloudflare 验证，等待...")
-
-                # 等待 Cloudflare 验证
-                max_wait = 30  # 最多等待 30 秒
-                for i in range(max_wait):
-                    time.sleep(1)
-                    html = page.content()
-
-                    if 'Just a moment' not in html and 'Verify you are human' not in html and '請稍候' not in html:
-                        print(f"  [Fast] ✓ Cloudflare 验证通过 ({i+1}秒)")
-                        break
-
-                    if (i + 1) % 10 == 0:
-                        print(f"  [Fast] 仍在等待... ({i+1}/{max_wait}秒)")
-
-            # 关闭页面（但保留浏览器）
-            page.close()
+    def attempt_fetch(attempt):
+        # 当前线程的页面（共享浏览器和上下文）
+        page = _get_page()
 
-            return html
+        if attempt == 1:
+            print(f"  [Fast] 正在访问: {url}")
 
-        except Exception as e:
-            print(f"  [Fast] ✗ 错误 (尝试 {attempt}/{retry}): {str(e)[:100]}")
+        # 使用 domcontentloaded 策略，30秒超时（不超过剩余的重试预算）
+        page.goto(url, wait_until='domcontentloaded', timeout=retry_policy.remaining_time(30) * 1000)
 
-            if attempt == retry:
-                raise Exception(f"Fast request failed after {retry} attempts: {str(e)}")
+        if attempt == 1:
+            print(f"  [Fast] ✓ 页面加载完成")
 
-            # 重试前等待
-            wait_time = 3 * attempt
-            print(f"  [Fast] 等待 {wait_time} 秒后重试...")
-            time.sleep(wait_time)
+        # 移除固定等待 - 页面就绪即返回；遇到 Cloudflare 验证时
+        # 由选择器/导航事件驱动，验证通过的瞬间返回
+        html, _ = wait_until_ready(page, label='Fast')
+        return html
 
-    raise Exception(f"Fast request failed: {url}")
+    policy = retry_policy.get_policy('browser').with_attempts(retry)
+    try:
+        return retry_policy.retry_call(attempt_fetch, op='browser', policy=policy, label='Fast')
+    except Exception as e:
+        raise Exception(f"Fast request failed after {retry} attempts: {str(e)}") from e
 
 
 # 测试对比
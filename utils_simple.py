@@ -15,6 +15,7 @@ import requests
 import time
 from urllib import parse
 
+from cloudflare_waiter import wait_until_ready
 from config import CONF
 
 video_index_cache_filename = "./jable_index_cache.json"
@@ -238,35 +239,9 @@ def get_response_from_playwright_simple(url, retry=3):
                     if attempt == 1:
                         print(f"  [Simple] 页面加载完成")
 
-                    # 简单等待一下确保内容加载
-                    page.wait_for_timeout(3000)
-
-                    # 获取页面内容
-                    html = page.content()
-
-                    # 检查是否遇到 Cloudflare
-                    if 'Just a moment' in html or 'Verify you are human' in html or '請稍候' in html:
-                        if attempt == 1:
-                            print(f"  [Simple] 检测到 Cloudflare 验证页面")
-
-                        # 简单等待 - 不做任何模拟
-                        if attempt == 1:
-                            print(f"  [Simple] 等待 Cloudflare 自动验证...")
-
-                        max_wait = 60  # 增加到 60 秒
-                        for i in range(max_wait):
-                            page.wait_for_timeout(1000)
-                            html = page.content()
-
-                            if 'Just a moment' not in html and 'Verify you are human' not in html and '請稍候' not in html:
-                                print(f"  [Simple] ✓ Cloudflare 验证通过 (等待 {i+1} 秒)")
-                                break
-
-                            if (i + 1) % 10 == 0:
-                                print(f"  [Simple] 仍在等待... ({i+1}/{max_wait}秒)")
-
-                        # 最后再取一次内容
-                        html = page.content()
+                    # 等待页面就绪：遇到 Cloudflare 验证时由导航/选择器事件驱动，
+                    # 页面一旦可用立即返回，不再固定等待和按秒轮询
+                    html, _ = wait_until_ready(page, label='Simple')
 
                     if attempt == 1:
                         print(f"  [Simple] 完成！HTML 长度: {len(html)}")
@@ -2,15 +2,13 @@ import concurrent.futures
 import io
 import os
 import pathlib
-import re
 import shutil
 import time
 from functools import partial
 
 import m3u8
 from Crypto.Cipher import AES
-from bs4 import BeautifulSoup
-
+import page_parser
 import utils
 from config import CONF
 
@@ -27,33 +25,8 @@ BUFFER_SIZE = 1024 * 1024 * 20  # 20MB
 MAX_WORKER = 8
 
 def get_video_full_name(video_id, html_str):
-    soup = BeautifulSoup(html_str, "html.parser")
-    video_full_name = video_id
-
-    for meta in soup.find_all("meta"):
-        meta_content = meta.get("content")
-        if not meta_content:
-            continue
-        # 精确匹配：video_id 必须在 meta_content 中作为完整单词出现
-        # 支持分隔符：空格、横线、下划线等
-        meta_lower = meta_content.lower()
-        video_id_lower = video_id.lower()
-
-        # 检查是否包含完整的 video_id（不是作为子串）
-        # 例如：mide-938nggn 不应该匹配 mide-938
-        if video_id_lower in meta_lower:
-            # 确保匹配的是完整的 ID，检查前后字符
-            idx = meta_lower.find(video_id_lower)
-            before_char = meta_lower[idx-1] if idx > 0 else ' '
-            after_idx = idx + len(video_id_lower)
-            after_char = meta_lower[after_idx] if after_idx < len(meta_lower) else ' '
-
-            # 视频 ID 的合法字符：字母、数字、横线
-            # 前后字符不应该是这些字符（避免部分匹配）
-            is_valid_id_char = lambda c: c.isalnum() or c == '-'
-            if not (is_valid_id_char(before_char) or is_valid_id_char(after_char)):
-                video_full_name = meta_content
-                break
+    # meta 中包含完整视频 ID 的标题（mide-938nggn 不会匹配 mide-938），找不到时用视频 ID
+    video_full_name = page_parser.find_full_name(page_parser.parse_page(html_str), video_id) or video_id
 
     if len(video_full_name.encode()) > 248:
         video_full_name = video_full_name[:50]
@@ -66,17 +39,12 @@ def get_video_full_name(video_id, html_str):
 
 
 def get_cover(html_str, folder_path):
-    soup = BeautifulSoup(html_str, "html.parser")
     cover_name = f"{os.path.basename(folder_path)}.jpg"
     cover_path = os.path.join(folder_path, cover_name)
-    for meta in soup.find_all("meta"):
-        meta_content = meta.get("content")
-        if not meta_content:
-            continue
-        if "preview.jpg" not in meta_content:
-            continue
+    cover_url = page_parser.parse_page(html_str).cover
+    if cover_url:
         try:
-            r = utils.requests_with_retry(meta_content)
+            r = utils.requests_with_retry(cover_url)
             with open(cover_path, "wb") as cover_fh:
                 r.raw.decode_content = True
                 for chunk in r.iter_content(chunk_size=1024):
@@ -120,31 +88,38 @@ def mv_video_and_download_cover(output_dir, video_id, video_full_name, html_str)
 
 
 def download_by_video_url(url):
+    """
+    下载一个视频
+
+    Returns:
+        视频文件路径（新下载的或本地已存在的），没有拿到下载链接而跳过时返回 None；下载出错时抛出异常
+    """
     video_id = url.split('/')[-2]
     start_time = time.time()  # 记录开始时间
 
     output_dir = prepare_output_dir()
 
     print(f"[1/5] 正在访问视频页面: {video_id}")
-    page_str = utils.scrapingant_requests_get(url, retry=5)
+    # 视频页里的 m3u8 链接带会过期的令牌，下载时必须拿新页面，不读页面缓存
+    page_str = utils.scrapingant_requests_get(url, retry=5, kind='video', use_cache=False)
 
     print(f"[2/5] 正在解析视频信息...")
     video_full_name = get_video_full_name(video_id, page_str)
 
-    all_filenames = [file.name for file in pathlib.Path(output_dir).rglob('*.mp4')]
-    if video_full_name + '.mp4' in all_filenames or video_id + '.mp4' in all_filenames:
-        print(video_full_name + " 已经存在，跳过下载")
-        return
+    existing_names = (video_full_name + '.mp4', video_id + '.mp4')
+    for file in pathlib.Path(output_dir).rglob('*.mp4'):
+        if file.name in existing_names:
+            print(video_full_name + " 已经存在，跳过下载")
+            return str(file)
 
     print(f"[3/5] 开始下载: {video_full_name}")
 
     # 使用非贪婪匹配，避免匹配过多内容
     # 匹配 https://...任意字符.../.m3u8 (可能带查询参数)
-    result = re.search(r'https://[^\s"\'<>]+\.m3u8(?:\?[^\s"\'<>]*)?', page_str)
-    if not result:
+    m3u8url = page_parser.parse_page(page_str).m3u8
+    if not m3u8url:
         print("✗ 获取下载链接失败，跳过")
-        return
-    m3u8url = result[0].strip('"\'')  # 去除可能的引号
+        return None
     print(f"  ✓ 找到视频源")
     print(f"     URL: {m3u8url}")
 
@@ -243,7 +218,9 @@ def download_by_video_url(url):
         else:
             video_path = os.path.join(output_dir, video_full_name + '.mp4')
 
-        file_size = os.path.getsize(video_path) if os.path.exists(video_path) else None
+        if not os.path.exists(video_path):
+            raise Exception(f'未找到下载的视频文件: {video_path}')
+        file_size = os.path.getsize(video_path)
         duration = time.time() - start_time
 
         print(f"✓ 下载完成: {video_full_name}")
@@ -252,6 +229,8 @@ def download_by_video_url(url):
         if TELEGRAM_AVAILABLE:
             send_download_success_notification(video_id, video_full_name, file_size, duration)
 
+        return video_path
+
     except Exception as e:
         duration = time.time() - start_time
         error_msg = str(e)[:200]
@@ -270,7 +249,7 @@ def scrape(ci, url, headers=None):
         # 使用传入的 headers，如果没有则使用默认的
         if headers is None:
             headers = CONF.get("headers", {})
-        response = utils.requests_with_retry(url, headers=headers, retry=5, ignore_proxy=ignore_proxy)
+        response = utils.requests_with_retry(url, headers=headers, retry=5, ignore_proxy=ignore_proxy, op='segment')
     except Exception as e:
         print(e)
         return None
@@ -283,7 +262,7 @@ def scrape(ci, url, headers=None):
                 print(f"数据长度异常: {url}, 长度: {len(content_ts)}, 不是16的倍数")
                 # 尝试重新下载一次
                 try:
-                    response = utils.requests_with_retry(url, headers=headers, retry=3, ignore_proxy=ignore_proxy)
+                    response = utils.requests_with_retry(url, headers=headers, retry=3, ignore_proxy=ignore_proxy, op='segment')
                     content_ts = response.content
                     if len(content_ts) % 16 != 0:
                         print(f"重试后数据仍然异常: {url}, 长度: {len(content_ts)}")
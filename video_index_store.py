@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+订阅索引存储
+用 SQLite 保存「订阅链接 -> 视频 ID」的成员关系（含首次出现时间）和增量水位线，
+取代每次整体读写的 jable_index_cache.json：
+- 写入按链接增量进行（只插入新增、删除消失的 ID），每个链接一个事务
+- 多链接订阅的交集、「上次同步以来新增」都在一条查询里完成
+首次使用时自动从 jable_index_cache.json / jable_index_watermark.json 导入
+"""
+
+import json
+import os
+import sqlite3
+import time
+from typing import Dict, Iterable, List, Optional, Set
+
+from config import CONF
+
+# 索引数据库路径，可通过 config.json 的 video_index_path 覆盖
+DEFAULT_INDEX_PATH = './jable_index.db'
+
+# 旧版 JSON 文件（仅用于迁移）
+LEGACY_CACHE_FILE = './jable_index_cache.json'
+LEGACY_WATERMARK_FILE = './jable_index_watermark.json'
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS index_urls (
+        url_id INTEGER PRIMARY KEY,
+        url TEXT NOT NULL UNIQUE,
+        updated_at REAL NOT NULL
+    );
+
+    -- 倒排索引：按 (url_id, video_id) 聚簇，按 video_id 反查
+    CREATE TABLE IF NOT EXISTS membership (
+        url_id INTEGER NOT NULL,
+        video_id TEXT NOT NULL,
+        first_seen REAL NOT NULL,
+        PRIMARY KEY (url_id, video_id)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS idx_membership_video ON membership(video_id);
+
+    CREATE TABLE IF NOT EXISTS watermarks (
+        url TEXT PRIMARY KEY,
+        newest_id TEXT NOT NULL,
+        fingerprint TEXT NOT NULL,
+        full_refresh_at REAL NOT NULL,
+        updated_at REAL NOT NULL
+    );
+
+    CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    );
+'''
+
+_migrated = False
+
+
+def get_index_path() -> str:
+    return CONF.get('video_index_path', DEFAULT_INDEX_PATH)
+
+
+def _connect() -> sqlite3.Connection:
+    global _migrated
+    conn = sqlite3.connect(get_index_path(), timeout=30)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.executescript(SCHEMA)
+    if not _migrated:
+        _migrated = True
+        _migrate_legacy_json(conn)
+    return conn
+
+
+def _migrate_legacy_json(conn: sqlite3.Connection) -> None:
+    """从旧版 JSON 文件导入（只执行一次）"""
+    if conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_json_migrated'").fetchone():
+        return
+
+    imported = 0
+    with conn:
+        if os.path.exists(LEGACY_CACHE_FILE):
+            with open(LEGACY_CACHE_FILE, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+            first_seen = os.path.getmtime(LEGACY_CACHE_FILE)
+            for url, video_ids in cache.items():
+                url_id = _get_url_id(conn, url, create=True)
+                conn.executemany(
+                    'INSERT OR IGNORE INTO membership (url_id, video_id, first_seen) VALUES (?, ?, ?)',
+                    [(url_id, video_id, first_seen) for video_id in video_ids])
+                imported += len(video_ids)
+
+        if os.path.exists(LEGACY_WATERMARK_FILE):
+            with open(LEGACY_WATERMARK_FILE, 'r', encoding='utf-8') as f:
+                for url, mark in json.load(f).items():
+                    conn.execute('''
+                        INSERT OR REPLACE INTO watermarks (url, newest_id, fingerprint, full_refresh_at, updated_at)
+                        VALUES (?, ?, ?, ?, ?)
+                    ''', (url, mark['newest_id'], mark['fingerprint'],
+                          mark.get('full_refresh_at', 0), mark.get('updated_at', time.time())))
+
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('legacy_json_migrated', ?)",
+                     (time.strftime('%Y-%m-%d %H:%M:%S'),))
+
+    if imported:
+        print(f"✓ 已将 {LEGACY_CACHE_FILE} 中的 {imported} 条索引导入 {get_index_path()}")
+
+
+def _get_url_id(conn: sqlite3.Connection, url: str, create: bool = False) -> Optional[int]:
+    row = conn.execute('SELECT url_id FROM index_urls WHERE url = ?', (url,)).fetchone()
+    if row:
+        return row[0]
+    if not create:
+        return None
+    return conn.execute('INSERT INTO index_urls (url, updated_at) VALUES (?, ?)',
+                        (url, time.time())).lastrowid
+
+
+# ==================== 成员关系 ====================
+
+def get_video_ids(url: str) -> Set[str]:
+    """读取某个订阅链接的全部视频 ID"""
+    conn = _connect()
+    try:
+        rows = conn.execute('''
+            SELECT m.video_id FROM membership m JOIN index_urls u ON u.url_id = m.url_id
+            WHERE u.url = ?
+        ''', (url,)).fetchall()
+    finally:
+        conn.close()
+    return {row[0] for row in rows}
+
+
+def get_all_urls() -> List[str]:
+    """所有已索引的订阅链接"""
+    conn = _connect()
+    try:
+        return [row[0] for row in conn.execute('SELECT url FROM index_urls ORDER BY url_id')]
+    finally:
+        conn.close()
+
+
+def update_video_ids(url: str, video_ids: Iterable[str]) -> Dict[str, int]:
+    """
+    用最新的远端结果更新某个链接的索引（单个事务，只写变化的部分）
+
+    Returns:
+        {'added': 新增数, 'removed': 删除数}
+    """
+    video_ids = set(video_ids)
+    now = time.time()
+
+    conn = _connect()
+    try:
+        with conn:
+            url_id = _get_url_id(conn, url, create=True)
+            existing = {row[0] for row in conn.execute(
+                'SELECT video_id FROM membership WHERE url_id = ?', (url_id,))}
+
+            added = video_ids - existing
+            removed = existing - video_ids
+            conn.executemany('INSERT INTO membership (url_id, video_id, first_seen) VALUES (?, ?, ?)',
+                             [(url_id, video_id, now) for video_id in added])
+            conn.executemany('DELETE FROM membership WHERE url_id = ? AND video_id = ?',
+                             [(url_id, video_id) for video_id in removed])
+            conn.execute('UPDATE index_urls SET updated_at = ? WHERE url_id = ?', (now, url_id))
+    finally:
+        conn.close()
+
+    return {'added': len(added), 'removed': len(removed)}
+
+
+def get_intersection_first_seen(urls: List[str], since: Optional[float] = None) -> Dict[str, float]:
+    """
+    多链接订阅的交集（同时出现在所有链接中的视频），以及每个视频进入交集的时间
+
+    Args:
+        urls: 订阅的链接列表
+        since: 只返回在该时间戳之后才满足交集条件的视频（即「上次同步以来新增」）
+
+    Returns:
+        {video_id: 进入交集的时间戳}；任一链接没有索引时返回空字典
+    """
+    urls = list(dict.fromkeys(urls))
+    if not urls:
+        return {}
+
+    placeholders = ','.join('?' * len(urls))
+    # 视频在最后一个链接中出现的时间，就是它进入交集的时间
+    sql = f'''
+        SELECT m.video_id, MAX(m.first_seen) FROM membership m JOIN index_urls u ON u.url_id = m.url_id
+        WHERE u.url IN ({placeholders})
+        GROUP BY m.video_id
+        HAVING COUNT(*) = ?
+    '''
+    params = urls + [len(urls)]
+    if since is not None:
+        sql += ' AND MAX(m.first_seen) > ?'
+        params.append(since)
+
+    conn = _connect()
+    try:
+        return {row[0]: row[1] for row in conn.execute(sql, params)}
+    finally:
+        conn.close()
+
+
+def get_intersection(urls: List[str], since: Optional[float] = None) -> Set[str]:
+    """多链接订阅的交集，参数同 get_intersection_first_seen()"""
+    return set(get_intersection_first_seen(urls, since))
+
+
+def get_new_since(urls: List[str], since: float) -> Set[str]:
+    """订阅在 since 之后新增的视频"""
+    return get_intersection(urls, since=since)
+
+
+def get_index_map() -> Dict[str, List[str]]:
+    """导出为旧版 JSON 的结构 {url: [video_id, ...]}（兼容旧接口）"""
+    conn = _connect()
+    try:
+        rows = conn.execute('''
+            SELECT u.url, m.video_id FROM membership m JOIN index_urls u ON u.url_id = m.url_id
+        ''').fetchall()
+    finally:
+        conn.close()
+
+    index_map: Dict[str, List[str]] = {}
+    for url, video_id in rows:
+        index_map.setdefault(url, []).append(video_id)
+    return index_map
+
+
+# ==================== 水位线 ====================
+
+def get_watermark(url: str) -> Optional[Dict]:
+    """读取订阅链接的增量水位线"""
+    conn = _connect()
+    try:
+        row = conn.execute('''
+            SELECT newest_id, fingerprint, full_refresh_at, updated_at FROM watermarks WHERE url = ?
+        ''', (url,)).fetchone()
+    finally:
+        conn.close()
+    if not row:
+        return None
+    return {'newest_id': row[0], 'fingerprint': row[1], 'full_refresh_at': row[2], 'updated_at': row[3]}
+
+
+def update_watermark(url: str, newest_id: str, fingerprint: str, full_refresh_at: Optional[float] = None) -> None:
+    """更新订阅链接的增量水位线"""
+    conn = _connect()
+    try:
+        with conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO watermarks (url, newest_id, fingerprint, full_refresh_at, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (url, newest_id, fingerprint, full_refresh_at or 0, time.time()))
+    finally:
+        conn.close()
+
+
+# ==================== 同步记录 ====================
+
+def get_last_sync(key: str) -> Optional[float]:
+    """读取某个订阅上次同步完成的时间"""
+    conn = _connect()
+    try:
+        row = conn.execute('SELECT value FROM meta WHERE key = ?', (f'last_sync:{key}',)).fetchone()
+    finally:
+        conn.close()
+    return float(row[0]) if row else None
+
+
+def mark_synced(key: str, at: Optional[float] = None) -> None:
+    """记录某个订阅同步完成的时间"""
+    conn = _connect()
+    try:
+        with conn:
+            conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)',
+                         (f'last_sync:{key}', str(at or time.time())))
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    # 打印索引概况
+    for index_url in get_all_urls():
+        mark = get_watermark(index_url)
+        print(f"{index_url}: {len(get_video_ids(index_url))} 个视频"
+              + (f"，最新 {mark['newest_id']}" if mark else ""))